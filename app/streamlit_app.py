@@ -1,20 +1,25 @@
 import streamlit as st
 import sys
 import os
-import pandas as pd 
+import time
 from dotenv import load_dotenv
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from models.groq_model import GroqChatbotRAG
-from models.mistral_model import MistralChatbot
+# Model modülleri ağır bağımlılıklar getirdiği için sadece seçildiklerinde import edilir
+from models.startup import timed, timed_import, startup_report
+from models.datasets import TRAIN_DATASET, load_dataset
+from models import instrumentation as metrics
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+# Verilirse modeller bu süreçte yüklenmez; istekler chat_server.py servisine gönderilir (ince istemci)
+CHAT_SERVICE_URL = os.environ.get("CHAT_SERVICE_URL")
+
 # --- SAYFA AYARLARI ---
 st.set_page_config(
     page_title="Tatlış Chatbot",
@@ -39,17 +44,33 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- ÖLÇÜM (CACHE) ---
+@st.cache_resource
+def setup_metrics():
+    # Sink'ler süreç başına bir kez kurulur (Prometheus portu her rerun'da açılmasın)
+    # CHATBOT_METRICS verilmezse sadece süreç içi histogram tutulur
+    os.environ.setdefault("CHATBOT_METRICS", "histogram")
+    return metrics.configure_from_env()
+
+setup_metrics()
+
 # --- MODEL YÜKLEME (CACHE) ---
 @st.cache_resource
 def load_groq_model():
     try:
+        GroqChatbotRAG = timed_import('models.groq_model').GroqChatbotRAG
         # Veri setini yükle (RAG için gerekli)
-        if os.path.exists('data/train_dataset.xlsx'):
-            df = pd.read_excel('data/train_dataset.xlsx')
-            return GroqChatbotRAG(train_df=df)
-        else:
-            st.error("⚠️ data/train_dataset.xlsx bulunamadı! Groq RAG çalışmayabilir.")
-            return GroqChatbotRAG() # Boş başlat
+        with timed('backends', 'Groq'):
+            if os.path.exists(TRAIN_DATASET):
+                df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+                bot = GroqChatbotRAG(train_df=df)
+                # Önbelleğe alınan bot yeniden başlatmadan güncellensin: dosya değişince sadece yeni satırlar encode edilir
+                if bot.vector_store is not None:
+                    bot.watch_training_data(TRAIN_DATASET)
+                return bot
+            else:
+                st.error("⚠️ data/train_dataset.xlsx bulunamadı! Groq RAG çalışmayabilir.")
+                return GroqChatbotRAG() # Boş başlat
     except Exception as e:
         st.error(f"Groq yüklenirken hata: {e}")
         return None
@@ -57,23 +78,71 @@ def load_groq_model():
 @st.cache_resource
 def load_mistral_model():
     try:
-        # Mistral için de train verisini yükleyelim ki Few-Shot yapabilsin
-        if os.path.exists('data/train_dataset.xlsx'):
-            df = pd.read_excel('data/train_dataset.xlsx')
-            return MistralChatbot(train_df=df)
-        return MistralChatbot()
+        MistralChatbot = timed_import('models.mistral_model').MistralChatbot
+        with timed('backends', 'Mistral'):
+            # Mistral için de train verisini yükleyelim ki Few-Shot yapabilsin
+            if os.path.exists(TRAIN_DATASET):
+                df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+                # Yerel kNN sınıflandırıcı: emin olunan mesajlarda intent için API çağrısı yapılmaz.
+                # Groq'unki varsa aynı model/index kullanılır; onu Groq'un izleyicisi günceller
+                groq_bot = load_groq_model()
+                classifier = groq_bot.intent_classifier if groq_bot is not None else None
+                shared = classifier is not None
+                if not shared:
+                    try:
+                        KNNIntentClassifier = timed_import('models.intent_classifier').KNNIntentClassifier
+                        classifier = KNNIntentClassifier.from_dataframe(df)
+                    except Exception as e:
+                        print(f"Yerel sınıflandırıcı yüklenemedi: {e}")
+                        classifier = None
+                bot = MistralChatbot(train_df=df, intent_classifier=classifier)
+                if classifier is not None and not shared:
+                    bot.watch_training_data(TRAIN_DATASET)
+                return bot
+            return MistralChatbot()
     except Exception as e:
         st.error(f"Mistral yüklenirken hata: {e}")
         return None
 
+@st.cache_resource
+def load_hedged_model():
+    # İki sağlayıcı birlikte: yavaş kalan isteğe hedge, hata verene failover
+    backends = [(name, bot) for name, bot in (("groq", load_groq_model()), ("mistral", load_mistral_model()))
+                if bot is not None]
+    if not backends:
+        return None
+    return timed_import('models.failover').HedgedChatbot(backends)
+
+@st.cache_resource
+def load_remote_model(model: str, route: bool):
+    # Bağlantı havuzu rerun'lar arasında korunsun diye model/rota başına tek istemci
+    return timed_import('models.remote_client').RemoteChatbot(CHAT_SERVICE_URL, model=model, route=route)
+
+@st.cache_resource
+def load_router(model_tag: str, _bot):
+    # Rota istatistikleri rerun'lar arasında korunsun diye model başına tek yönlendirici
+    return timed_import('models.router').IntentRouter(_bot)
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.header("⚙️ Ayarlar")
     
     selected_model_name = st.radio(
         "Model Seçimi:",
-        ["Groq (Llama 3.3)", "Mistral (Open Mistral 7B)"],
-        captions=["Hızlı & RAG Destekli", "Hafif & Hızlı"]
+        ["Groq (Llama 3.3)", "Mistral (Open Mistral 7B)", "Otomatik (Groq + Mistral)"],
+        captions=["Hızlı & RAG Destekli", "Hafif & Hızlı", "Yedekli: yavaş/hatalı sağlayıcıda diğerine geçer"]
+    )
+    
+    single_call_mode = st.toggle(
+        "Tek çağrı modu",
+        value=False,
+        help="Niyet ve yanıt tek API çağrısında alınır (daha düşük gecikme)."
+    )
+    
+    routing_mode = st.toggle(
+        "Akıllı yönlendirme",
+        value=False,
+        help="Selamlaşma/vedalaşma hazır yanıtla, basit sorular küçük modelle, siparişler büyük modelle yanıtlanır."
     )
     
     st.markdown("---")
@@ -96,8 +165,30 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # Modelleri yükle
-groq_bot = load_groq_model()
-mistral_bot = load_mistral_model()
+# Sadece seçili backend kurulur; diğeri ilk seçildiği ana kadar yüklenmez
+if CHAT_SERVICE_URL:
+    # Yönlendirme serviste yapılır (hedged bot yönlendirmeyi desteklemez)
+    remote_model = "hedged" if selected_model_name.startswith("Otomatik") else \
+        ("groq" if "Groq" in selected_model_name else "mistral")
+    active_bot = load_remote_model(remote_model, routing_mode and remote_model != "hedged")
+    current_model_tag = f"{remote_model} @ servis"
+    if routing_mode:
+        single_call_mode = False
+elif selected_model_name.startswith("Otomatik"):
+    active_bot = load_hedged_model()
+    current_model_tag = "Groq + Mistral"
+elif "Groq" in selected_model_name:
+    active_bot = load_groq_model()
+    current_model_tag = "Groq"
+else:
+    active_bot = load_mistral_model()
+    current_model_tag = "Mistral"
+
+# Yönlendirici sadece tek sağlayıcılı botlarda kullanılır (tek çağrı modu yerine geçer)
+if routing_mode and not CHAT_SERVICE_URL and active_bot is not None \
+        and hasattr(active_bot, "predict_intent_with_confidence"):
+    active_bot = load_router(current_model_tag, active_bot)
+    single_call_mode = False
 
 # --- ANA ARAYÜZ ---
 st.title("🧁 Tatlış Chatbot")
@@ -111,6 +202,8 @@ for message in st.session_state.messages:
         # Eğer asistansa ve intent bilgisi varsa göster
         if message["role"] == "assistant" and "intent" in message:
              st.markdown(f'<span class="intent-badge">Intent: {message["intent"]}</span>', unsafe_allow_html=True)
+        if message.get("total_time") is not None:
+             st.caption(f"İlk token: {message.get('ttft') or message['total_time']:.2f} sn · Toplam: {message['total_time']:.2f} sn")
 
 # --- CHAT INPUT & MANTIK ---
 if prompt := st.chat_input("Hangi tatlıyı istersiniz?"):
@@ -124,40 +217,104 @@ if prompt := st.chat_input("Hangi tatlıyı istersiniz?"):
     with st.chat_message("assistant", avatar="🤖"):
         message_placeholder = st.empty()
         
-        # Seçili botu belirle
-        active_bot = None
-        current_model_tag = ""
-        
-        if "Groq" in selected_model_name:
-            active_bot = groq_bot
-            current_model_tag = "Groq"
-        else:
-            active_bot = mistral_bot
-            current_model_tag = "Mistral"
-            
         if active_bot:
-            with st.spinner(f"{current_model_tag} düşünüyor..."):
-                # Sohbet geçmişini modele uygun formata getir (Groq için)
-                history_for_model = [
-                    {"role": m["role"], "content": m["content"]} 
-                    for m in st.session_state.messages 
-                    if m["role"] != "system"
-                ]
-                
-                # Yanıt al
-                # Not: Her iki modelin chat fonksiyonu (response, intent) döndürmeli
-                response_text, intent = active_bot.chat(prompt, conversation_history=history_for_model)
-                
-                # Ekrana bas
+            # Sohbet geçmişini modele uygun formata getir (Groq için)
+            history_for_model = [
+                {"role": m["role"], "content": m["content"]} 
+                for m in st.session_state.messages 
+                if m["role"] != "system"
+            ]
+            
+            start_time = time.perf_counter()
+            first_token_time = None
+            
+            if single_call_mode:
+                # Tek çağrı modu JSON döndürdüğü için akış desteklemez
+                with st.spinner(f"{current_model_tag} düşünüyor..."):
+                    response_text, intent = active_bot.chat(
+                        prompt,
+                        conversation_history=history_for_model,
+                        single_call=True
+                    )
+                first_token_time = time.perf_counter() - start_time
                 message_placeholder.markdown(response_text)
-                st.markdown(f'<span class="intent-badge">Intent: {intent}</span>', unsafe_allow_html=True)
+            else:
+                # Niyet hemen gelir, yanıt parça parça ekrana basılır
+                with st.spinner(f"{current_model_tag} düşünüyor..."):
+                    intent, token_stream = active_bot.stream_chat(
+                        prompt,
+                        conversation_history=history_for_model
+                    )
                 
-                # Geçmişe kaydet
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response_text,
-                    "intent": intent,
-                    "model": current_model_tag
-                })
+                response_text = ""
+                for token in token_stream:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start_time
+                    response_text += token
+                    message_placeholder.markdown(response_text + "▌")
+                response_text = response_text.strip()
+                message_placeholder.markdown(response_text)
+            
+            total_time = time.perf_counter() - start_time
+            metrics.observe(metrics.STAGE_TTFT, first_token_time or total_time)
+            metrics.observe(metrics.STAGE_REQUEST, total_time)
+            st.markdown(f'<span class="intent-badge">Intent: {intent}</span>', unsafe_allow_html=True)
+            st.caption(f"İlk token: {first_token_time or total_time:.2f} sn · Toplam: {total_time:.2f} sn")
+            
+            # Geçmişe kaydet
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": response_text,
+                "intent": intent,
+                "model": current_model_tag,
+                "ttft": first_token_time,
+                "total_time": total_time
+            })
         else:
-            st.error("Seçilen model başlatılamadı.")
\ No newline at end of file
+            st.error("Seçilen model başlatılamadı.")
+
+# --- ÖNBELLEK İSTATİSTİKLERİ ---
+if active_bot is not None and hasattr(active_bot, "cache_stats"):
+    with st.sidebar.expander("📊 Önbellek İstatistikleri"):
+        for name, stats in active_bot.cache_stats().items():
+            st.caption(f"{name}: %{stats['hit_rate'] * 100:.0f} isabet ({stats['hits']}/{stats['hits'] + stats['misses']})")
+        if hasattr(active_bot, "breakers"):
+            hedging = active_bot.stats()
+            st.caption(f"Hedge: {hedging['hedged']} · Failover: {hedging['failovers']} · Kazanan: {hedging['wins']}")
+            st.caption(" · ".join(f"{name}: {state}" for name, state in hedging['circuits'].items()))
+        if hasattr(active_bot, "route_stats"):
+            for tier, route in active_bot.route_stats().items():
+                if route['turns']:
+                    st.caption(f"Rota {tier}: {route['turns']} tur · p50 {route['p50_ms']:.0f} ms · "
+                               f"{route['prompt_tokens_per_turn'] + route['completion_tokens_per_turn']:.0f} token/tur")
+        if hasattr(active_bot, "service_stats"):
+            try:
+                service = active_bot.service_stats()
+                memory = service['memory']
+                st.caption(f"Servis worker {service['worker']}: RSS {memory.get('rss_mb', 0):.0f} MB · "
+                           f"PSS {memory.get('pss_mb', 0):.0f} MB · {sum(service['requests'].values())} istek")
+            except Exception as e:
+                st.caption(f"Servis istatistikleri alınamadı: {e}")
+        if hasattr(active_bot, "history"):
+            history = active_bot.history.stats()
+            st.caption(f"Geçmiş token/tur: {history['baseline_tokens_per_turn']:.0f} (son N mesaj) → "
+                       f"{history['sent_tokens_per_turn']:.0f} (bütçeli)")
+
+# --- AŞAMA SÜRELERİ ---
+histogram = metrics.get_sink(metrics.HistogramSink)
+if histogram is not None:
+    with st.sidebar.expander("📈 Aşama Süreleri"):
+        snapshot = histogram.snapshot()
+        for stage, values in snapshot['stages'].items():
+            st.caption(f"{stage}: p50 {values['p50_ms']:.0f} ms · p95 {values['p95_ms']:.0f} ms ({values['count']})")
+        for stage, values in snapshot['tokens'].items():
+            st.caption(f"{stage} token: {values.get('prompt_tokens', 0)} girdi / {values.get('completion_tokens', 0)} çıktı")
+        for name, value in snapshot['counters'].items():
+            st.caption(f"{name}: {value}")
+
+
+# --- BAŞLANGIÇ SÜRELERİ ---
+with st.sidebar.expander("⏱️ Başlangıç Süreleri"):
+    for category, values in startup_report().items():
+        for name, seconds in sorted(values.items(), key=lambda kv: -kv[1]):
+            st.caption(f"{category} · {name}: {seconds * 1000:.0f} ms")
@@ -6,17 +6,34 @@ import seaborn as sns
 import numpy as np
 from models.groq_model import GroqChatbotRAG
 from models.mistral_model import MistralChatbot
+from models.failover import HedgedChatbot
+from models.router import IntentRouter
+from models.datasets import TRAIN_DATASET, TEST_DATASET, load_dataset
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from models import instrumentation as metrics
 
 load_dotenv()
 
+# Rapor edilen aşamalar (sırasıyla)
+LATENCY_STAGES = [metrics.STAGE_REQUEST, metrics.STAGE_EMBEDDING, metrics.STAGE_SEARCH,
+                  metrics.STAGE_INTENT, metrics.STAGE_GENERATION, metrics.STAGE_SINGLE_CALL]
+
+def _save_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"✓ Kaydedildi: {path}")
+
 def run_benchmark():
     """Her iki modeli test et ve karşılaştır"""
     
     # Veriyi yükle
-    test_df = pd.read_excel('data/test_dataset.xlsx')
-    train_df = pd.read_excel('data/train_dataset.xlsx')
+    test_df = load_dataset(TEST_DATASET, columns=['text', 'intent'])
+    train_df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
     
     print("="*60)
     print("BENCHMARK BAŞLIYOR")
@@ -25,14 +42,16 @@ def run_benchmark():
     # Groq testi
     print("\n1. GROQ MODELİ TEST EDİLİYOR...")
     print("-"*60)
-    groq_bot = GroqChatbotRAG()
-    groq_results = groq_bot.evaluate_model(test_df, train_df, num_few_shot=10)
+    groq_bot = GroqChatbotRAG(train_df=train_df)
+    groq_results = groq_bot.evaluate_model(test_df)
+    _save_json(groq_results, 'results/groq_results.json')
     
     # Mistral testi
     print("\n2. MISTRAL MODELİ TEST EDİLİYOR...")
     print("-"*60)
-    mistral_bot = MistralChatbot()
-    mistral_results = mistral_bot.evaluate_model(test_df, train_df, num_few_shot=10)
+    mistral_bot = MistralChatbot(train_df=train_df)
+    mistral_results = mistral_bot.evaluate_model(test_df)
+    _save_json(mistral_results, 'results/mistral_results.json')
     
     # Karşılaştırma tablosu
     comparison_df = pd.DataFrame({
@@ -108,12 +127,242 @@ def visualize_results(groq_results, mistral_results, comparison_df):
     
     plt.close('all')
 
+def _synthetic_history(messages, index, turns):
+    """index'ten önceki `turns` test mesajını, kalıp asistan yanıtlarıyla sohbet geçmişine çevirir."""
+    history = []
+    for previous in messages[max(0, index - turns):index]:
+        history.append({"role": "user", "content": previous})
+        history.append({"role": "assistant", "content": "Tabii, hemen yardımcı olayım! Menümüzde Fıstıklı Baklava, "
+                                                        "Sütlaç ve San Sebastian Cheesecake var. Başka bir isteğiniz var mı?"})
+    return history
+
+def _prompt_token_split(counters):
+    """Sayaçlardan (ada göre, etiketler toplanarak) sabit önek / değişken / sağlayıcı önbelleği token'ları."""
+    totals = {}
+    for key, value in counters.items():
+        name = key.split("{")[0]
+        totals[name] = totals.get(name, 0) + value
+    return {
+        'prefix_tokens': totals.get(metrics.COUNTER_PROMPT_PREFIX, 0),
+        'variable_tokens': totals.get(metrics.COUNTER_PROMPT_VARIABLE, 0),
+        'provider_cached_tokens': totals.get(metrics.COUNTER_PROMPT_CACHED, 0),
+    }
+
+async def _measure_latency(bot, messages, concurrency, single_call, history_turns=0):
+    """Mesajları en fazla `concurrency` eşzamanlı sohbet isteğiyle gönderir."""
+    recorder = metrics.LatencyRecorder()
+    token = metrics.use_recorder(recorder)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(index, message):
+        history = _synthetic_history(messages, index, history_turns)
+        async with semaphore:
+            with metrics.span(metrics.STAGE_REQUEST):
+                await bot.achat(message, history, single_call=single_call)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_one(i, m) for i, m in enumerate(messages)))
+    finally:
+        metrics.reset_recorder(token)
+        await bot.aclose()
+    return recorder, time.perf_counter() - start
+
+def run_latency_benchmark(model_names=("groq", "mistral"), concurrency=4, num_requests=50,
+                          single_call=False, base_url=None, history_turns=0, route=False):
+    """
+    Uçtan uca sohbet isteklerinin aşama bazlı gecikmesini (p50/p95/p99),
+    verilen eşzamanlılıkta istek/saniye değerini ve istek başına token sayısını ölçer.
+    Önbellekler kapalıdır; her istek tam yolu çalıştırır.
+    base_url verilirse her iki model de bu adrese (ör. stub_llm_server.py) bağlanır.
+    history_turns > 0 ise her istek önceki mesajlardan oluşan bir sohbet geçmişiyle gönderilir
+    ve geçmiş token'ları (eski sabit pencere / bütçeli gönderim) raporlanır.
+    route=True ise Groq/Mistral botları IntentRouter ile sarılır ve rota bazlı sonuçlar raporlanır.
+    """
+    train_df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+    test_df = load_dataset(TEST_DATASET, columns=['text', 'intent'])
+    messages = test_df['text'].astype(str).tolist()[:num_requests]
+
+    factories = {
+        'groq': lambda: GroqChatbotRAG(train_df=train_df, cache_size=0, semantic_threshold=None,
+                                       base_url=base_url),
+        'mistral': lambda: MistralChatbot(train_df=train_df, cache_size=0, server_url=base_url),
+    }
+    # Groq önce, yavaş kalırsa p95 gecikmesinden sonra Mistral'e de gönderilir
+    factories['hedged'] = lambda: HedgedChatbot([('groq', factories['groq']()), ('mistral', factories['mistral']())])
+
+    reports = {}
+    for name in model_names:
+        print("\n" + "="*60)
+        print(f"{name.upper()} GECİKME TESTİ ({len(messages)} istek, eşzamanlılık={concurrency})")
+        print("="*60)
+        bot = factories[name]()
+        if route and not isinstance(bot, HedgedChatbot):
+            bot = IntentRouter(bot)
+        recorder, wall_time = asyncio.run(_measure_latency(bot, messages, concurrency, single_call, history_turns))
+        summary = recorder.summary()
+
+        llm_tokens = summary['tokens'].values()
+        report = {
+            'model': name,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'requests': len(messages),
+            'concurrency': concurrency,
+            'single_call': single_call,
+            'base_url': base_url,
+            'wall_time_seconds': wall_time,
+            'requests_per_second': len(messages) / wall_time if wall_time > 0 else 0.0,
+            'prompt_tokens_per_request': sum(t['prompt_tokens'] for t in llm_tokens) / max(len(messages), 1),
+            'completion_tokens_per_request': sum(t['completion_tokens'] for t in llm_tokens) / max(len(messages), 1),
+            'stages': summary['stages'],
+            'tokens': summary['tokens'],
+            'counters': summary['counters'],
+            'history_turns': history_turns,
+            'prompt': _prompt_token_split(summary['counters']),
+        }
+        if hasattr(bot, 'history'):
+            report['history'] = bot.history.stats()
+        if isinstance(bot, IntentRouter):
+            report['routes'] = bot.route_stats()
+            for tier, r in report['routes'].items():
+                print(f"  rota {tier:<9} n={r['turns']:<4} p50={r['p50_ms']:8.1f}ms  p95={r['p95_ms']:8.1f}ms  "
+                      f"token/tur={r['prompt_tokens_per_turn'] + r['completion_tokens_per_turn']:.0f} "
+                      f"(niyet {r['intent_tokens_per_turn']:.0f})")
+        if isinstance(bot, HedgedChatbot):
+            report['hedging'] = bot.stats()
+            print(f"  Hedge: {report['hedging']['hedged']}  |  failover: {report['hedging']['failovers']}  |  "
+                  f"kazanan: {report['hedging']['wins']}")
+
+        for stage in LATENCY_STAGES:
+            s = summary['stages'].get(stage)
+            if s:
+                print(f"  {stage:<14} n={s['count']:<4} p50={s['p50_ms']:8.1f}ms  "
+                      f"p95={s['p95_ms']:8.1f}ms  p99={s['p99_ms']:8.1f}ms")
+        print(f"  RPS: {report['requests_per_second']:.2f}  |  token/istek: "
+              f"{report['prompt_tokens_per_request']:.0f} prompt + {report['completion_tokens_per_request']:.0f} completion")
+        prompt = report['prompt']
+        if prompt['prefix_tokens']:
+            share = prompt['prefix_tokens'] / max(prompt['prefix_tokens'] + prompt['variable_tokens'], 1)
+            print(f"  Prompt: sabit önek %{share * 100:.0f}  |  sağlayıcı önbelleğinden: "
+                  f"{prompt['provider_cached_tokens'] / max(len(messages), 1):.0f} token/istek")
+        if history_turns and 'history' in report:
+            history = report['history']
+            print(f"  Geçmiş token/tur: {history['baseline_tokens_per_turn']:.0f} (sabit pencere) -> "
+                  f"{history['sent_tokens_per_turn']:.0f} (bütçeli), tüm geçmiş {history['full_tokens_per_turn']:.0f}")
+
+        _save_json(report, f'results/{name}_latency.json')
+        reports[name] = report
+    return reports
+
+async def _measure_intents(bot, messages, batch_size, max_concurrency):
+    """Aynı mesajları önce mesaj başına, sonra toplu prompt ile sınıflandırır."""
+    results = {}
+    modes = (('per_message', lambda: bot.apredict_intents(messages, max_concurrency=max_concurrency,
+                                                          requests_per_second=None)),
+             ('batched', lambda: bot.apredict_intents_batch(messages, batch_size=batch_size,
+                                                            max_concurrency=max_concurrency,
+                                                            requests_per_second=None)))
+    try:
+        for mode, run in modes:
+            recorder = metrics.LatencyRecorder()
+            token = metrics.use_recorder(recorder)
+            start = time.perf_counter()
+            try:
+                predictions = await run()
+            finally:
+                metrics.reset_recorder(token)
+            results[mode] = (predictions, recorder.summary(), time.perf_counter() - start)
+    finally:
+        await bot.aclose()
+    return results
+
+def run_batch_intent_benchmark(model_names=("groq", "mistral"), num_requests=50, batch_size=20,
+                               max_concurrency=4, base_url=None):
+    """
+    Niyet sınıflandırmasını mesaj başına bir LLM çağrısı ile toplu (numaralı JSON) prompt
+    arasında karşılaştırır: etiketlenen mesaj başına çağrı ve token sayısı, doğruluk, süre.
+    Önbellekler ve yerel sınıflandırıcı kapalıdır; her mesaj LLM'e gider.
+    """
+    train_df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+    test_df = load_dataset(TEST_DATASET, columns=['text', 'intent']).head(num_requests)
+    messages = test_df['text'].astype(str).tolist()
+    labels = test_df['intent'].tolist()
+
+    factories = {
+        'groq': lambda: GroqChatbotRAG(train_df=train_df, cache_size=0, semantic_threshold=None,
+                                       intent_threshold=None, base_url=base_url),
+        'mistral': lambda: MistralChatbot(train_df=train_df, cache_size=0, server_url=base_url),
+    }
+
+    reports = {}
+    for name in model_names:
+        print("\n" + "="*60)
+        print(f"{name.upper()} TOPLU NİYET TESTİ ({len(messages)} mesaj, batch={batch_size})")
+        print("="*60)
+        measured = asyncio.run(_measure_intents(factories[name](), messages, batch_size, max_concurrency))
+
+        report = {
+            'model': name,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'messages': len(messages),
+            'batch_size': batch_size,
+            'base_url': base_url,
+        }
+        for mode, (predictions, summary, wall_time) in measured.items():
+            llm_tokens = summary['tokens'].values()
+            calls = sum(t['calls'] for t in llm_tokens)
+            prompt = sum(t['prompt_tokens'] for t in llm_tokens)
+            completion = sum(t['completion_tokens'] for t in llm_tokens)
+            count = max(len(messages), 1)
+            report[mode] = {
+                'wall_time_seconds': wall_time,
+                'accuracy': sum(p == l for p, l in zip(predictions, labels)) / count,
+                'calls_per_message': calls / count,
+                'prompt_tokens_per_message': prompt / count,
+                'completion_tokens_per_message': completion / count,
+                'tokens': summary['tokens'],
+                'counters': summary['counters'],
+            }
+            r = report[mode]
+            print(f"  {mode:<12} çağrı/mesaj={r['calls_per_message']:.2f}  token/mesaj="
+                  f"{r['prompt_tokens_per_message']:.0f} prompt + {r['completion_tokens_per_message']:.1f} completion  "
+                  f"doğruluk={r['accuracy']:.3f}  süre={wall_time:.2f}s")
+
+        _save_json(report, f'results/{name}_batch_intent.json')
+        reports[name] = report
+    return reports
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Doğruluk ve gecikme benchmark'ı")
+    parser.add_argument("--suite", choices=["accuracy", "latency", "batch", "all"], default="all")
+    parser.add_argument("--models", nargs="+", choices=["groq", "mistral", "hedged"],
+                        default=["groq", "mistral"],
+                        help="Gecikme testi yapılacak modeller (hedged: Groq + Mistral yedekli)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=50, help="Gecikme testindeki istek sayısı")
+    parser.add_argument("--single-call", action="store_true", help="Sohbeti tek çağrı modunda ölç")
+    parser.add_argument("--base-url", default=None,
+                        help="Gecikme testinde kullanılacak API adresi (ör. http://127.0.0.1:8765, stub_llm_server.py)")
+    parser.add_argument("--route", action="store_true",
+                        help="Gecikme testinde IntentRouter kullan (hazır yanıt / küçük model / büyük model)")
+    parser.add_argument("--history-turns", type=int, default=0,
+                        help="Gecikme testinde her isteğe eklenecek önceki tur sayısı (geçmiş bütçesini ölçmek için)")
+    parser.add_argument("--batch-size", type=int, default=20,
+                        help="Toplu niyet testinde tek prompt'taki mesaj sayısı")
+    args = parser.parse_args()
+
     # Results klasörünü oluştur
     os.makedirs('results', exist_ok=True)
     
     # Benchmark çalıştır
-    groq_results, mistral_results, comparison = run_benchmark()
+    if args.suite in ("accuracy", "all"):
+        groq_results, mistral_results, comparison = run_benchmark()
+    if args.suite in ("latency", "all"):
+        run_latency_benchmark(args.models, args.concurrency, args.requests, args.single_call, args.base_url,
+                              args.history_turns, args.route)
+    if args.suite == "batch":
+        run_batch_intent_benchmark([m for m in args.models if m != "hedged"], args.requests, args.batch_size,
+                                   args.concurrency, args.base_url)
     
     print("\n" + "="*60)
     print("BENCHMARK TAMAMLANDI!")
@@ -0,0 +1,391 @@
+# chat_server.py
+"""
+GroqChatbotRAG / MistralChatbot'u Streamlit olmadan sunan çok süreçli HTTP sohbet servisi.
+
+- Ana süreç RAG index'ini diske hazırlar, portu açar ve N worker'ı fork eder
+- Worker'lar index'i ve embedding matrisini memory-mapped açar: sayfalar işletim sistemi
+  önbelleğinde tek kopya olarak paylaşılır (--preload ile botlar fork'tan önce yüklenir, copy-on-write)
+- Sunucu durumsuzdur: sohbet geçmişi her istekte istemciden gelir, worker/makine eklenerek ölçeklenir
+
+API (JSON):
+    POST /chat    {"message": "...", "history": [...], "model": "groq", "single_call": false,
+                   "route": false, "stream": false}
+                  -> {"reply", "intent", "model", "worker", "elapsed_ms"}
+                  stream=true ise satır satır JSON (application/x-ndjson): {"intent"}, {"delta"}..., {"done"}
+    POST /intent  {"message": "..."} ya da {"messages": [...]}, "model": "groq"
+                  -> {"intent", "confidence"} ya da {"intents": [{"intent", "confidence"}, ...]}
+    GET  /health  -> {"status": "ok", "worker", "models"}
+    GET  /stats   -> worker'ın bellek (RSS/PSS), istek sayıları ve önbellek istatistikleri
+
+Kullanım:
+    python chat_server.py --workers 4 --port 8000 --models groq mistral
+    CHAT_SERVICE_URL=http://127.0.0.1:8000 streamlit run app/streamlit_app.py
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import multiprocessing as mp
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from models.datasets import TRAIN_DATASET, load_dataset
+
+load_dotenv()
+
+_MEMORY_FIELDS = {"VmRSS": "rss_mb", "RssAnon": "rss_anon_mb", "RssFile": "rss_file_mb", "RssShmem": "rss_shmem_mb"}
+
+
+def memory_stats(pid="self") -> Dict[str, float]:
+    """
+    Sürecin bellek kullanımı (MB, Linux /proc). rss_file_mb memory-mapped index gibi
+    paylaşılabilir sayfaları, pss_mb ise paylaşılan sayfaların bu sürece düşen payını gösterir.
+    """
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key = line.split(":")[0]
+                if key in _MEMORY_FIELDS:
+                    stats[_MEMORY_FIELDS[key]] = int(line.split()[1]) / 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    stats["pss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return stats
+
+
+def _format_memory(stats: Dict[str, float]) -> str:
+    if not stats:
+        return "bellek bilgisi yok"
+    return (f"RSS {stats.get('rss_mb', 0):.0f} MB (anonim {stats.get('rss_anon_mb', 0):.0f}, "
+            f"dosya/mmap {stats.get('rss_file_mb', 0):.0f}), PSS {stats.get('pss_mb', 0):.0f} MB")
+
+
+# --- BOTLAR ---
+
+def load_bots(models: List[str], base_url: Optional[str] = None) -> Dict[str, object]:
+    """İstenen botları kurar. Groq varsa Mistral'in yerel sınıflandırıcısı aynı model/index'i kullanır."""
+    df = load_dataset(TRAIN_DATASET, columns=['text', 'intent']) if os.path.exists(TRAIN_DATASET) else None
+    bots = {}
+    if 'groq' in models:
+        from models.groq_model import GroqChatbotRAG
+        bots['groq'] = GroqChatbotRAG(train_df=df, base_url=base_url)
+    if 'mistral' in models:
+        from models.mistral_model import MistralChatbot
+        classifier = bots['groq'].intent_classifier if 'groq' in bots else None
+        if classifier is None and df is not None:
+            try:
+                from models.intent_classifier import KNNIntentClassifier
+                classifier = KNNIntentClassifier.from_dataframe(df)
+            except Exception as e:
+                print(f"Yerel sınıflandırıcı yüklenemedi: {e}")
+        bots['mistral'] = MistralChatbot(train_df=df, intent_classifier=classifier, server_url=base_url)
+    if len(bots) > 1:
+        from models.failover import HedgedChatbot
+        bots['hedged'] = HedgedChatbot([(name, bots[name]) for name in ('groq', 'mistral')])
+    return bots
+
+
+def prepare_index():
+    """RAG index'ini (gerekirse) oluşturup diske yazar; worker'lar bunu mmap ile açar."""
+    if not os.path.exists(TRAIN_DATASET):
+        return
+    try:
+        from models.intent_classifier import KNNIntentClassifier
+        KNNIntentClassifier.from_dataframe(load_dataset(TRAIN_DATASET, columns=['text', 'intent']))
+    except Exception as e:
+        print(f"Index hazırlanamadı, worker'lar RAG'sız çalışacak: {e}")
+
+
+class ChatService:
+    """Botları HTTP'den bağımsız olarak çağıran katman (istek doğrulama + sayaçlar)."""
+
+    def __init__(self, bots: Dict[str, object], default_model: Optional[str] = None):
+        if not bots:
+            raise ValueError("En az bir bot gerekli")
+        self.bots = bots
+        self.default_model = default_model or next(iter(bots))
+        self.routers = {}
+        self._lock = threading.Lock()
+        self.counts = {'chat': 0, 'stream': 0, 'intent': 0, 'errors': 0}
+        self.started_at = time.time()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def resolve(self, payload: Dict, route: bool = False):
+        name = payload.get("model") or self.default_model
+        bot = self.bots.get(name)
+        if bot is None:
+            raise LookupError(f"Bilinmeyen model: {name} ({', '.join(self.bots)})")
+        if route:
+            if not hasattr(bot, "predict_intent_with_confidence"):
+                raise ValueError(f"{name} yönlendirmeyi desteklemiyor")
+            with self._lock:
+                if name not in self.routers:
+                    from models.router import IntentRouter
+                    self.routers[name] = IntentRouter(bot)
+                bot = self.routers[name]
+        return name, bot
+
+    @staticmethod
+    def _message(payload: Dict) -> str:
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise ValueError("'message' boş olmamalı")
+        return message
+
+    @staticmethod
+    def _history(payload: Dict) -> List[Dict]:
+        history = payload.get("history") or []
+        if not isinstance(history, list):
+            raise ValueError("'history' liste olmalı")
+        return [{"role": m.get("role"), "content": str(m.get("content", ""))}
+                for m in history if isinstance(m, dict) and m.get("role") in ("user", "assistant")]
+
+    def chat(self, payload: Dict) -> Dict:
+        message, history = self._message(payload), self._history(payload)
+        route = bool(payload.get("route"))
+        name, bot = self.resolve(payload, route)
+        self.count('chat')
+        start = time.perf_counter()
+        if route:
+            reply, intent = bot.chat(message, history)
+        else:
+            reply, intent = bot.chat(message, history, single_call=payload.get("single_call"))
+        return {'reply': reply, 'intent': intent, 'model': name, 'worker': os.getpid(),
+                'elapsed_ms': (time.perf_counter() - start) * 1000}
+
+    def stream(self, payload: Dict):
+        message, history = self._message(payload), self._history(payload)
+        name, bot = self.resolve(payload, bool(payload.get("route")))
+        self.count('stream')
+        intent, chunks = bot.stream_chat(message, history)
+        return name, intent, chunks
+
+    def intent(self, payload: Dict) -> Dict:
+        name, bot = self.resolve(payload)
+        if not hasattr(bot, "predict_intent_with_confidence"):
+            raise ValueError(f"{name} niyet tahmini sunmuyor")
+        self.count('intent')
+        if "messages" in payload:
+            messages = payload.get("messages")
+            if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+                raise ValueError("'messages' metin listesi olmalı")
+            if hasattr(bot, "predict_intents_batch"):
+                # Toplu prompt yolu: LLM'e gidenler tek istekte etiketlenir; güven,
+                # LLM yolundaki gibi etiketin geçerliliğinden türetilir
+                results = [(i, 1.0 if i in bot.intents else 0.0) for i in bot.predict_intents_batch(messages)]
+            else:
+                results = [bot.predict_intent_with_confidence(m) for m in messages]
+            return {'intents': [{'intent': i, 'confidence': c} for i, c in results], 'model': name}
+        intent, confidence = bot.predict_intent_with_confidence(self._message(payload))
+        return {'intent': intent, 'confidence': confidence, 'model': name}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts)
+        stats = {'worker': os.getpid(), 'uptime_seconds': time.time() - self.started_at,
+                 'memory': memory_stats(), 'requests': counts, 'models': {}}
+        for name, bot in self.bots.items():
+            model_stats = {}
+            if hasattr(bot, "cache_stats"):
+                model_stats['cache'] = bot.cache_stats()
+            if hasattr(bot, "history"):
+                model_stats['history'] = bot.history.stats()
+            if hasattr(bot, "breakers"):
+                model_stats['hedging'] = bot.stats()
+            if name in self.routers:
+                model_stats['routes'] = self.routers[name].route_stats()
+            stats['models'][name] = model_stats
+        return stats
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: ince istemciler bağlantıyı yeniden kullanır
+    service: ChatService = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_line(self, payload: Dict):
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("İstek gövdesi JSON nesnesi olmalı")
+        return payload
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path in ("", "/health"):
+            self._send_json(200, {'status': 'ok', 'worker': os.getpid(), 'models': list(self.service.bots)})
+        elif path == "/stats":
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {'error': f"Bilinmeyen yol: {self.path}"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path not in ("/chat", "/intent"):
+            self._send_json(404, {'error': f"Bilinmeyen yol: {self.path}"})
+            return
+        try:
+            payload = self._read_json()
+            if path == "/intent":
+                self._send_json(200, self.service.intent(payload))
+            elif payload.get("stream"):
+                self._stream(payload)
+            else:
+                self._send_json(200, self.service.chat(payload))
+        except LookupError as e:
+            self._send_json(404, {'error': str(e)})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.service.count('errors')
+            print(f"İstek hatası ({path}): {e}")
+            self._send_json(500, {'error': str(e)})
+
+    def _stream(self, payload: Dict):
+        name, intent, chunks = self.service.stream(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_line({'intent': intent, 'model': name, 'worker': os.getpid()})
+            for chunk in chunks:
+                self._write_line({'delta': chunk})
+            self._write_line({'done': True})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # İstemci akışı yarıda bıraktı
+            self.close_connection = True
+
+
+# --- SÜREÇ YÖNETİMİ ---
+
+def _serve(server: ThreadingHTTPServer, bots: Optional[Dict[str, object]], args) -> None:
+    """Worker: botları (preload edilmediyse) kurar ve ortak soketten istek kabul eder."""
+    if bots is None:
+        bots = load_bots(args.models, args.base_url)
+    ChatHandler.service = ChatService(bots, args.models[0])
+    ChatHandler.quiet = not args.verbose
+    print(f"Worker {os.getpid()} hazır: {_format_memory(memory_stats())}", flush=True)
+    server.serve_forever()
+
+
+def _report_workers(workers: Dict[int, int]):
+    for pid in sorted(workers):
+        print(f"  worker {pid}: {_format_memory(memory_stats(pid))}", flush=True)
+
+
+def run(args):
+    if not args.preload:
+        # Index ayrı bir süreçte hazırlanır: ana süreç torch/OpenMP başlatmadan fork edebilsin
+        process = mp.get_context("spawn").Process(target=prepare_index)
+        process.start()
+        process.join()
+
+    bots = load_bots(args.models, args.base_url) if args.preload else None
+
+    server = ThreadingHTTPServer((args.host, args.port), ChatHandler)
+    server.daemon_threads = True
+    host, port = server.server_address[:2]
+    print(f"Sohbet servisi: http://{host}:{port} ({args.workers} worker, modeller: {', '.join(args.models)})",
+          flush=True)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        _serve(server, bots, args)
+        return
+
+    workers: Dict[int, int] = {}
+    stopping = threading.Event()
+
+    def _spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _serve(server, bots, args)
+            finally:
+                os._exit(0)
+        workers[pid] = slot
+
+    def _shutdown(signum, frame):
+        stopping.set()
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    for slot in range(args.workers):
+        _spawn(slot)
+
+    if args.report_interval > 0:
+        def _reporter():
+            while not stopping.wait(args.report_interval):
+                _report_workers(workers)
+        threading.Thread(target=_reporter, daemon=True).start()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = workers.pop(pid, None)
+        if slot is not None and not stopping.is_set():
+            # Beklenmedik şekilde kapanan worker yeniden başlatılır
+            print(f"Worker {pid} kapandı (durum {status}), yeniden başlatılıyor", flush=True)
+            _spawn(slot)
+    server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Çok süreçli, Streamlit'siz sohbet servisi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="Fork edilecek worker sayısı")
+    parser.add_argument("--models", nargs="+", choices=["groq", "mistral"], default=["groq", "mistral"],
+                        help="Sunulacak botlar (ilki varsayılan; ikisi birlikte ise 'hedged' de sunulur)")
+    parser.add_argument("--base-url", default=None,
+                        help="Botların bağlanacağı API adresi (ör. stub_llm_server.py için http://127.0.0.1:8765)")
+    parser.add_argument("--preload", action="store_true",
+                        help="Botları fork'tan önce yükle: embedding modeli de copy-on-write paylaşılır "
+                             "(torch fork sonrası thread havuzunu paylaşamayabilir; önce tek worker'la deneyin)")
+    parser.add_argument("--report-interval", type=float, default=0.0,
+                        help="> 0 ise ana süreç worker başına RSS/PSS değerlerini bu aralıkla (sn) yazar")
+    parser.add_argument("--verbose", action="store_true", help="Her isteği logla")
+    run(parser.parse_args())
+    sys.exit(0)
@@ -1,65 +1,38 @@
 # data_preprocessing.py
-import pandas as pd
-import re
 from sklearn.model_selection import train_test_split
+from models.datasets import dataset_columns, iter_dataset_chunks
+from models.preprocessing import standardize_columns, preprocess_chunks
 
-def clean_text(text):
-    """Metni temizle"""
-    # String kontrolü
-    if not isinstance(text, str):
-        text = str(text)
-    
-    # Küçük harfe çevir
-    text = text.lower()
-    
-    # Gereksiz boşlukları temizle
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
-
-def prepare_dataset(filepath):
-    """Veri setini hazırla"""
-    # Veriyi oku
-    df = pd.read_excel(filepath)
-    
-    print(f"Orijinal sütunlar: {df.columns.tolist()}")
-    
+def prepare_dataset(filepath, chunk_size=50000, workers=None, near_dup_threshold=0.8):
+    """
+    Veri setini hazırla.
+    Veri parça parça okunur, vektörel string işlemleriyle (büyük girdilerde süreç
+    havuzunda) temizlenir; birebir ve MinHash ile bulunan yakın tekrarlar atılır.
+    """
     # Sütun isimlerini standartlaştır
     # category -> intent, sentence -> text
-    column_mapping = {}
-    for col in df.columns:
-        col_lower = col.lower().strip()
-        if 'category' in col_lower or 'intent' in col_lower:
-            column_mapping[col] = 'intent'
-        elif 'sentence' in col_lower or 'text' in col_lower:
-            column_mapping[col] = 'text'
-    
-    df = df.rename(columns=column_mapping)
-    
-    print(f"Yeni sütunlar: {df.columns.tolist()}")
+    columns = dataset_columns(filepath)
+    print(f"Orijinal sütunlar: {columns}")
+    column_mapping = standardize_columns(columns)
+    print(f"Yeni sütunlar: {[column_mapping.get(c, c) for c in columns]}")
     
     # Gerekli sütunlar var mı kontrol et
-    if 'intent' not in df.columns or 'text' not in df.columns:
+    if set(column_mapping.values()) != {'intent', 'text'}:
         raise ValueError("Excel'de 'intent' veya 'text' sütunu bulunamadı!")
     
-    # Sadece gerekli sütunları al
-    df = df[['intent', 'text']].copy()
-    
-    # Boş değerleri temizle
-    initial_count = len(df)
-    df = df.dropna()
-    print(f"Boş değer temizlendi: {initial_count} -> {len(df)} satır")
-    
-    # Metinleri temizle
-    df['text'] = df['text'].apply(clean_text)
-    df['intent'] = df['intent'].apply(lambda x: x.lower().strip())
-    
-    # Duplicate kontrolü
-    initial_count = len(df)
-    df = df.drop_duplicates(subset=['text'])
-    duplicates_removed = initial_count - len(df)
-    if duplicates_removed > 0:
-        print(f"Duplicate temizlendi: {duplicates_removed} satır")
+    # Sadece gerekli sütunlar okunur (Arrow önbelleği üzerinden, parça parça)
+    chunks = (
+        chunk.rename(columns=column_mapping)
+        for chunk in iter_dataset_chunks(filepath, columns=list(column_mapping), chunk_size=chunk_size)
+    )
+    df, stats = preprocess_chunks(chunks, workers=workers, near_dup_threshold=near_dup_threshold)
+    
+    print(f"Boş değer temizlendi: {stats['rows_in']} -> {stats['rows_in'] - stats['empty_removed']} satır")
+    if stats['exact_duplicates'] > 0:
+        print(f"Duplicate temizlendi: {stats['exact_duplicates']} satır")
+    if stats['near_duplicates'] > 0:
+        print(f"Yakın tekrar temizlendi: {stats['near_duplicates']} satır (eşik: {near_dup_threshold})")
+    print(f"Hız: {stats['rows_per_second']:.0f} satır/sn, tepe bellek: {stats['peak_memory_mb']:.1f} MB")
     
     print(f"\n✓ Temizlenmiş veri: {len(df)} satır")
     print(f"✓ Intent sayısı: {df['intent'].nunique()}")
@@ -2,9 +2,10 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from models.datasets import RAW_DATASET, load_dataset
 
-# Excel dosyasını oku
-df = pd.read_excel('data/chatbot_dataset.xlsx')
+# Excel dosyasını oku (Arrow önbelleği üzerinden)
+df = load_dataset(RAW_DATASET)
 
 # Sütun isimlerini kontrol et
 print("Sütunlar:", df.columns.tolist())
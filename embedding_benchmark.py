@@ -0,0 +1,143 @@
+# embedding_benchmark.py
+"""
+Embedding backend'lerini (torch, torch-int8, onnx) CPU üzerinde karşılaştırır:
+yükleme süresi, bellek (RSS), sorgu gecikmesi, toplu encode hızı ve
+float32 torch baseline'ına göre retrieval uyumu.
+
+Kullanım: python embedding_benchmark.py [--backends torch torch-int8 onnx] [--k 5]
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+from models.datasets import TRAIN_DATASET, TEST_DATASET, load_dataset
+from models.embeddings import EMBEDDING_BACKENDS, create_embedding_backend
+from models.vector_store import VectorStore, import_faiss
+from models.intent_classifier import KNNIntentClassifier
+
+
+def _rss_mb() -> float:
+    """Mevcut sürecin RSS değeri (MB)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_backend(name, train_texts, test_texts, num_latency_queries):
+    """Backend'i ayrı bir süreçte ölçer (bellek ölçümü diğer backend'lerden etkilenmesin)."""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    backend = create_embedding_backend(name)
+    load_time = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    # Isınma
+    backend.encode(test_texts[:4])
+
+    latencies = []
+    for query in test_texts[:num_latency_queries]:
+        t = time.perf_counter()
+        backend.encode([query])
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    start = time.perf_counter()
+    train_embeddings = backend.encode(train_texts, batch_size=64)
+    batch_time = time.perf_counter() - start
+    test_embeddings = backend.encode(test_texts, batch_size=64)
+
+    return {
+        'backend': name,
+        'load_time_s': load_time,
+        'rss_model_mb': rss_loaded - rss_before,
+        'rss_peak_mb': _rss_mb(),
+        'query_p50_ms': float(np.percentile(latencies, 50)),
+        'query_p95_ms': float(np.percentile(latencies, 95)),
+        'batch_texts_per_s': len(train_texts) / batch_time,
+        'train_embeddings': train_embeddings,
+        'test_embeddings': test_embeddings,
+    }
+
+
+def _neighbors(train_embeddings, test_embeddings, k):
+    index = import_faiss().IndexFlatL2(train_embeddings.shape[1])
+    index.add(np.ascontiguousarray(train_embeddings, dtype='float32'))
+    return index.search(np.ascontiguousarray(test_embeddings, dtype='float32'), k)
+
+
+def run_embedding_benchmark(backends, k=5, num_latency_queries=100):
+    train_df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+    test_df = load_dataset(TEST_DATASET, columns=['text', 'intent'])
+    train_texts = train_df['text'].astype(str).tolist()
+    test_texts = test_df['text'].astype(str).tolist()
+
+    # Baseline her zaman float32 torch
+    backends = ['torch'] + [b for b in backends if b != 'torch']
+
+    results = []
+    ctx = mp.get_context("spawn")
+    for name in backends:
+        print(f"\n→ {name} ölçülüyor...")
+        with ctx.Pool(1) as pool:
+            try:
+                results.append(pool.apply(_measure_backend, (name, train_texts, test_texts, num_latency_queries)))
+            except Exception as e:
+                print(f"  {name} çalıştırılamadı: {e}")
+
+    if not results:
+        print("\nHiçbir backend çalıştırılamadı, karşılaştırma yapılmadı.")
+        return []
+
+    # Komşu örtüşmesi float32 torch'a göre ölçülür; torch çalışmadıysa bu sütunlar atlanır
+    baseline = next((res for res in results if res['backend'] == 'torch'), None)
+    base_idx = None
+    if baseline is not None:
+        _, base_idx = _neighbors(baseline['train_embeddings'], baseline['test_embeddings'], k)
+    else:
+        print("\ntorch baseline'ı yok: örtüşme / top-1 uyumu sütunları atlanıyor.")
+
+    report = []
+    for res in results:
+        distances, idx = _neighbors(res['train_embeddings'], res['test_embeddings'], k)
+
+        store = VectorStore(None, res['train_embeddings'], train_df, '', name)
+        classifier = KNNIntentClassifier(None, store, k=k)
+        preds = [classifier.vote(d, i)[0] for d, i in zip(distances, idx)]
+        knn_accuracy = float(np.mean([p == t for p, t in zip(preds, test_df['intent'])]))
+
+        row = {key: value for key, value in res.items() if not key.endswith('_embeddings')}
+        if base_idx is not None:
+            row[f'overlap_at_{k}'] = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(idx, base_idx)]))
+            row['top1_agreement'] = float(np.mean(idx[:, 0] == base_idx[:, 0]))
+        row['knn_intent_accuracy'] = knn_accuracy
+        report.append(row)
+
+    print("\n" + "="*60)
+    print("EMBEDDING BACKEND KARŞILAŞTIRMASI")
+    print("="*60)
+    print(pd.DataFrame(report).set_index('backend').round(3).to_string())
+
+    os.makedirs('results', exist_ok=True)
+    with open('results/embedding_benchmark.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("\n✓ Sonuçlar kaydedildi: results/embedding_benchmark.json")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100, help="Gecikme ölçümü için sorgu sayısı")
+    args = parser.parse_args()
+
+    run_embedding_benchmark(args.backends, k=args.k, num_latency_queries=args.queries)
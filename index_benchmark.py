@@ -0,0 +1,133 @@
+# index_benchmark.py
+"""
+FAISS index tiplerini (Flat, HNSW, IVF, IVF-PQ) eğitim setinin sentetik olarak
+büyütülmüş kopyaları üzerinde karşılaştırır: kurulum süresi, index boyutu,
+tekil sorgu gecikmesi (p50/p99) ve aynı metrikteki Flat index'e göre recall@k.
+
+Kullanım: python index_benchmark.py [--sizes 10000 100000] [--metric l2|ip] [--k 5]
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from models.vector_store import (
+    VectorStore, DEFAULT_INDEX_DIR, build_index, import_faiss, normalize_rows
+)
+from models.datasets import TRAIN_DATASET, TEST_DATASET, load_dataset
+from models.embeddings import create_embedding_backend
+
+# Karşılaştırılacak konfigürasyonlar (Flat her zaman referans olarak ölçülür)
+BENCHMARK_CONFIGS = [
+    {'type': 'flat'},
+    {'type': 'hnsw', 'hnsw_m': 16, 'ef_search': 32},
+    {'type': 'hnsw', 'hnsw_m': 32, 'ef_search': 64},
+    {'type': 'ivf', 'nlist': 1024, 'nprobe': 8},
+    {'type': 'ivf', 'nlist': 1024, 'nprobe': 32},
+    {'type': 'ivfpq', 'nlist': 1024, 'nprobe': 32, 'pq_m': 16, 'pq_bits': 8},
+    {'type': 'ivfpq', 'nlist': 1024, 'nprobe': 32, 'pq_m': 48, 'pq_bits': 8},
+]
+
+
+def scaled_copies(embeddings: np.ndarray, size: int, noise: float = 0.05, seed: int = 42) -> np.ndarray:
+    """Gerçek embedding'leri tekrarlayıp gauss gürültüsü ekleyerek `size` satıra büyütür."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(embeddings), size=size)
+    scale = noise * float(np.std(embeddings))
+    synthetic = embeddings[picks] + rng.normal(0.0, scale, size=(size, embeddings.shape[1]))
+    originals = min(size, len(embeddings))
+    synthetic[:originals] = embeddings[:originals]
+    return synthetic.astype('float32')
+
+
+def _index_size_mb(index) -> float:
+    return import_faiss().serialize_index(index).nbytes / (1024 * 1024)
+
+
+def _label(config) -> str:
+    params = ', '.join(f"{k}={v}" for k, v in config.items() if k not in ('type', 'metric'))
+    return f"{config['type']}({params})" if params else config['type']
+
+
+def run_index_benchmark(sizes, metric='l2', k=5, num_latency_queries=200, embedding_backend='torch'):
+    train_df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
+    test_df = load_dataset(TEST_DATASET, columns=['text', 'intent'])
+
+    # Gerçek embedding'ler bir kez hesaplanır (index önbelleği varsa oradan okunur)
+    backend = create_embedding_backend(embedding_backend)
+    store = VectorStore.load_or_build(
+        train_df, backend, backend.cache_name, os.path.join(DEFAULT_INDEX_DIR, embedding_backend)
+    )
+    base = np.asarray(store.embeddings, dtype='float32')
+    queries = backend.encode(test_df['text'].astype(str).tolist(), batch_size=64)
+    if metric == 'ip':
+        base = normalize_rows(base)
+        queries = normalize_rows(queries)
+    queries = np.ascontiguousarray(queries, dtype='float32')
+
+    report = []
+    for size in sizes:
+        data = scaled_copies(base, size)
+        if metric == 'ip':
+            data = normalize_rows(data)
+        print(f"\n→ {size} satır, metrik={metric}")
+
+        truth = None
+        for config in BENCHMARK_CONFIGS:
+            config = dict(config, metric=metric)
+            start = time.perf_counter()
+            index = build_index(data, config)
+            build_time = time.perf_counter() - start
+
+            # Isınma + tekil sorgu gecikmesi (sohbet akışındaki kullanım şekli)
+            index.search(queries[:1], k)
+            latencies = []
+            for i in range(min(num_latency_queries, len(queries))):
+                t = time.perf_counter()
+                index.search(queries[i:i + 1], k)
+                latencies.append((time.perf_counter() - t) * 1000)
+
+            _, found = index.search(queries, k)
+            if truth is None:
+                truth = found  # İlk konfigürasyon Flat: referans sonuç
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)])
+
+            row = {
+                'rows': size,
+                'index': _label(config),
+                'build_time_s': build_time,
+                'index_size_mb': _index_size_mb(index),
+                'query_p50_ms': float(np.percentile(latencies, 50)),
+                'query_p99_ms': float(np.percentile(latencies, 99)),
+                f'recall_at_{k}': float(recall),
+            }
+            print(f"  {row['index']:<50} build={build_time:7.2f}s  "
+                  f"p50={row['query_p50_ms']:.3f}ms  recall@{k}={recall:.3f}")
+            report.append(dict(row, config=config))
+
+    print("\n" + "="*60)
+    print("INDEX KARŞILAŞTIRMASI")
+    print("="*60)
+    table = pd.DataFrame([{key: v for key, v in r.items() if key != 'config'} for r in report])
+    print(table.set_index(['rows', 'index']).round(3).to_string())
+
+    os.makedirs('results', exist_ok=True)
+    with open('results/index_benchmark.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("\n✓ Sonuçlar kaydedildi: results/index_benchmark.json")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS index tipi benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000])
+    parser.add_argument("--metric", choices=["l2", "ip"], default="l2")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="Gecikme ölçümü için sorgu sayısı")
+    parser.add_argument("--backend", default="torch", help="Embedding backend'i")
+    args = parser.parse_args()
+
+    run_index_benchmark(args.sizes, metric=args.metric, k=args.k,
+                        num_latency_queries=args.queries, embedding_backend=args.backend)
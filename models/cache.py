@@ -0,0 +1,146 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from models import instrumentation as metrics
+from models.preprocessing import clean_text
+
+# Önbellekte "yok" ile "None değeri" ayrımı için
+MISSING = object()
+
+# Önbellek anahtarları veri setinin geçtiği temizlikle aynı kuralla normalize edilir
+normalize_text = clean_text
+
+
+def make_key(namespace: str, model: str, version: str, text: str) -> str:
+    return f"{namespace}|{model}|{version}|{normalize_text(text)}"
+
+
+class SqliteCacheBackend:
+    """Yeniden başlatmalarda kaybolmayan, sqlite tabanlı ikinci seviye önbellek."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+class TTLCache:
+    """
+    Boyut (LRU) ve süre (TTL) sınırlı, thread-safe önbellek.
+    Opsiyonel backend verilirse kayıtlar diske de yazılır ve oradan geri okunur.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = 3600.0,
+                 backend: Optional[SqliteCacheBackend] = None, name: str = "cache"):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    metrics.increment(metrics.COUNTER_CACHE_HIT, cache=self.name)
+                    return value
+                del self._data[key]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not MISSING:
+                with self._lock:
+                    self.hits += 1
+                metrics.increment(metrics.COUNTER_CACHE_HIT, cache=self.name)
+                self._store(key, value, now + self.ttl)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        metrics.increment(metrics.COUNTER_CACHE_MISS, cache=self.name)
+        return MISSING
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(key, value, expires_at)
+
+    def _store(self, key: str, value: Any, expires_at: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+def create_cache(max_size: int = 2048, ttl: float = 3600.0,
+                 path: Optional[str] = None, name: str = "cache") -> TTLCache:
+    """
+    path verilirse sqlite destekli kalıcı önbellek oluşturur.
+    name, isabet/ıska sayaçlarında `cache` etiketi olarak kullanılır.
+    """
+    backend = SqliteCacheBackend(path) if path else None
+    return TTLCache(max_size=max_size, ttl=ttl, backend=backend, name=name)
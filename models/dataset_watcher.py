@@ -0,0 +1,72 @@
+import os
+import threading
+from typing import Callable, Optional, Tuple
+
+
+class DatasetWatcher:
+    """
+    Eğitim seti dosyasını yoklayarak (polling) izler ve değiştiğinde callback'i çağırır.
+    Dosya yazılırken yarım okunmasın diye mtime/boyut iki yoklama boyunca aynı kalınca
+    değişiklik kabul edilir. Callback hataları yazdırılır, izleme devam eder.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[str], None], interval: float = 2.0):
+        """
+        Args:
+            path: İzlenecek dosya (ör. data/train_dataset.xlsx)
+            on_change: Değişiklikte dosya yoluyla çağrılır (izleme thread'inde)
+            interval: Yoklama aralığı (sn)
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.reloads = 0
+
+        self._seen = self._signature()
+        self._pending: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> bool:
+        """Tek yoklama; callback çağrıldıysa True döner (thread olmadan da kullanılabilir)."""
+        signature = self._signature()
+        if signature is None or signature == self._seen:
+            self._pending = None
+            return False
+        if signature != self._pending:
+            # Yazım sürüyor olabilir: bir sonraki yoklamada aynıysa işlenir
+            self._pending = signature
+            return False
+
+        self._seen, self._pending = signature, None
+        try:
+            self.on_change(self.path)
+        except Exception as e:
+            print(f"Veri seti yeniden yüklenemedi ({self.path}): {e}")
+            return False
+        self.reloads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> "DatasetWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
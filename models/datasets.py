@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from typing import Iterator, List, Optional, Tuple
+
+from models.startup import timed_import
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_DIR = os.path.join(_PROJECT_DIR, "data")
+RAW_DATASET = os.path.join(DATA_DIR, "chatbot_dataset.xlsx")
+TRAIN_DATASET = os.path.join(DATA_DIR, "train_dataset.xlsx")
+TEST_DATASET = os.path.join(DATA_DIR, "test_dataset.xlsx")
+
+# Excel kaynaklarının Arrow (Feather v2) kopyaları burada tutulur
+DEFAULT_CACHE_DIR = os.path.join(DATA_DIR, "dataset_cache")
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _cache_paths(source: str, cache_dir: str):
+    # Aynı isimli farklı klasördeki dosyalar çakışmasın diye tam yolun kısa hash'i eklenir
+    key = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:10]
+    stem = f"{os.path.splitext(os.path.basename(source))[0]}-{key}"
+    return os.path.join(cache_dir, f"{stem}.arrow"), os.path.join(cache_dir, f"{stem}.json")
+
+
+def _read_meta(meta_path: str) -> Optional[dict]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(source: str, meta: Optional[dict], meta_path: str) -> bool:
+    """
+    Önce ucuz kontrol (mtime + boyut), değiştiyse içerik hash'i.
+    Dosya sadece dokunulmuşsa (içerik aynı) meta güncellenir, dönüşüm tekrarlanmaz.
+    """
+    if meta is None:
+        return False
+    stat = os.stat(source)
+    if meta.get('mtime_ns') == stat.st_mtime_ns and meta.get('size') == stat.st_size:
+        return True
+    if meta.get('sha256') != file_sha256(source):
+        return False
+    meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    try:
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    except OSError:
+        pass
+    return True
+
+
+# Excel'den Arrow'a dönüşümde bellekte tutulan en fazla satır
+CONVERT_BATCH_ROWS = 50000
+
+
+class _SchemaMismatch(Exception):
+    """Sonraki bir parça ilk parçadan çıkarılan sütun tiplerine uymadı."""
+
+
+def _text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Karışık tipli object sütunları Arrow'a yazılabilsin diye metne çevrilir
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _excel_batches(source: str) -> Iterator[pd.DataFrame]:
+    """
+    İlk sayfayı openpyxl read_only moduyla satır satır okuyup en fazla
+    CONVERT_BATCH_ROWS satırlık DataFrame'ler verir (çalışma kitabının tamamı belleğe alınmaz).
+    """
+    openpyxl = timed_import('openpyxl')
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        block, yielded = [], False
+        for row in rows:
+            # read_excel gibi tamamen boş satırlar atlanır
+            if all(value is None for value in row):
+                continue
+            block.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            if len(block) >= CONVERT_BATCH_ROWS:
+                yield _text_columns(pd.DataFrame(block, columns=columns))
+                block, yielded = [], True
+        # Hiç satır yoksa da (sadece başlık) boş bir tablo yazılsın
+        if block or not yielded:
+            yield _text_columns(pd.DataFrame(block, columns=columns))
+    finally:
+        workbook.close()
+
+
+def _write_streaming(source: str, tmp_path: str) -> Tuple[int, List[str]]:
+    """
+    Excel'i parça parça Arrow IPC (Feather v2) dosyasına yazar. Sütun tipleri ilk parçadan
+    çıkarılır (tamamen boş sütunlar metin sayılır); uymayan bir parça _SchemaMismatch yükseltir.
+    """
+    pa = timed_import('pyarrow')
+
+    rows, columns, schema, writer = 0, [], None, None
+    sink = pa.OSFile(tmp_path, "wb")
+    try:
+        for df in _excel_batches(source):
+            if schema is None:
+                columns = [str(c) for c in df.columns]
+                inferred = pa.Schema.from_pandas(df, preserve_index=False)
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in inferred])
+                writer = pa.ipc.new_file(sink, schema)
+            try:
+                batch = pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError) as e:
+                raise _SchemaMismatch(str(e))
+            writer.write_batch(batch)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+        sink.close()
+    return rows, columns
+
+
+def _write_in_memory(source: str, tmp_path: str) -> Tuple[int, List[str]]:
+    pa = timed_import('pyarrow')
+    feather = timed_import('pyarrow.feather')
+    df = _text_columns(pd.read_excel(source))
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp_path,
+                          compression="uncompressed")
+    return len(df), [str(c) for c in df.columns]
+
+
+def _convert(source: str, arrow_path: str, meta_path: str):
+    """
+    Excel'i bir kez okuyup sıkıştırmasız Arrow dosyasına yazar (mmap ile okunabilsin).
+    Okuma satır satır yapılır, bellekte en fazla bir parça tutulur; sütun tipi parçalar
+    arasında değişirse (ör. önce sayı sonra metin) tüm dosya bir kez read_excel ile okunur.
+    """
+    stat = os.stat(source)
+    os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+    tmp_path = arrow_path + ".tmp"
+    try:
+        rows, columns = _write_streaming(source, tmp_path)
+    except _SchemaMismatch as e:
+        print(f"Sütun tipleri parçalar arasında tutarsız ({e}), dosya tek seferde okunuyor")
+        rows, columns = _write_in_memory(source, tmp_path)
+    os.replace(tmp_path, arrow_path)
+
+    meta = {
+        'source': os.path.abspath(source),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_sha256(source),
+        'rows': rows,
+        'columns': columns
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _cached_arrow_path(source: str, cache_dir: str) -> str:
+    """Önbellek güncel değilse dönüştürür, Arrow dosyasının yolunu döndürür."""
+    arrow_path, meta_path = _cache_paths(source, cache_dir)
+    if not (os.path.exists(arrow_path) and _is_fresh(source, _read_meta(meta_path), meta_path)):
+        print(f"Veri seti önbelleğe dönüştürülüyor: {os.path.basename(source)}")
+        _convert(source, arrow_path, meta_path)
+    return arrow_path
+
+
+def load_dataset(source: str, columns: Optional[List[str]] = None, memory_map: bool = True,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    Excel veri setini Arrow önbelleği üzerinden okur.
+
+    Args:
+        source: Kaynak .xlsx dosyası
+        columns: Sadece bu sütunlar okunur (None ise hepsi)
+        memory_map: Arrow dosyası memory-mapped açılsın mı
+        cache_dir: Önbellek klasörü (None ise doğrudan read_excel)
+    """
+    if cache_dir is None:
+        return pd.read_excel(source, usecols=columns)
+
+    try:
+        feather = timed_import('pyarrow.feather')
+    except ImportError:
+        print("pyarrow bulunamadı, veri seti doğrudan Excel'den okunuyor.")
+        return pd.read_excel(source, usecols=columns)
+
+    table = feather.read_table(_cached_arrow_path(source, cache_dir), columns=columns, memory_map=memory_map)
+    return table.to_pandas()
+
+
+def dataset_columns(source: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> List[str]:
+    """Veriyi pandas'a çevirmeden sütun isimlerini döndürür."""
+    if cache_dir:
+        try:
+            _cached_arrow_path(source, cache_dir)
+            meta = _read_meta(_cache_paths(source, cache_dir)[1])
+            if meta is not None:
+                return list(meta['columns'])
+        except ImportError:
+            pass
+    return [str(c) for c in pd.read_excel(source, nrows=0).columns]
+
+
+def iter_dataset_chunks(source: str, columns: Optional[List[str]] = None, chunk_size: int = 50000,
+                        cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Iterator[pd.DataFrame]:
+    """
+    Veri setini en fazla chunk_size satırlık DataFrame parçaları halinde verir.
+    Arrow dosyası memory-mapped açıldığı için tüm tablo pandas'a çevrilmez.
+    """
+    try:
+        feather = timed_import('pyarrow.feather') if cache_dir else None
+    except ImportError:
+        feather = None
+
+    if feather is None:
+        df = pd.read_excel(source, usecols=columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].reset_index(drop=True)
+        return
+
+    table = feather.read_table(_cached_arrow_path(source, cache_dir), columns=columns, memory_map=True)
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield batch.to_pandas()
@@ -0,0 +1,79 @@
+import numpy as np
+from typing import Dict, List, Type
+
+from models.startup import timed_import
+from models.vector_store import EMBEDDING_MODEL_NAME
+
+
+class EmbeddingBackend:
+    """
+    Embedding backend arayüzü. SentenceTransformer.encode ile aynı çağrı şeklini
+    destekler, böylece RAG kodu hangi backend'in kullanıldığını bilmek zorunda kalmaz.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
+
+    @property
+    def cache_name(self) -> str:
+        """Index/önbellek anahtarı: farklı backend'lerin vektörleri karışmasın."""
+        return f"{self.model_name}@{self.name}"
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """Varsayılan float32 PyTorch SentenceTransformer."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        super().__init__(model_name)
+        SentenceTransformer = timed_import('sentence_transformers').SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+        return np.asarray(embeddings, dtype='float32')
+
+
+class QuantizedTorchEmbeddingBackend(TorchEmbeddingBackend):
+    """Linear katmanları dinamik int8'e çevrilmiş PyTorch modeli (CPU için)."""
+
+    name = "torch-int8"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        super().__init__(model_name)
+        torch = timed_import('torch')
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEmbeddingBackend(TorchEmbeddingBackend):
+    """
+    ONNX Runtime backend'i (sentence-transformers>=3.2 + optimum[onnxruntime]).
+    Model ilk kullanımda ONNX'e export edilir.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        EmbeddingBackend.__init__(self, model_name)
+        SentenceTransformer = timed_import('sentence_transformers').SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+
+
+EMBEDDING_BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    TorchEmbeddingBackend.name: TorchEmbeddingBackend,
+    QuantizedTorchEmbeddingBackend.name: QuantizedTorchEmbeddingBackend,
+    OnnxEmbeddingBackend.name: OnnxEmbeddingBackend,
+}
+
+
+def create_embedding_backend(name: str = "torch", model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingBackend:
+    """İsmi verilen backend'i oluşturur ("torch", "torch-int8", "onnx")."""
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Bilinmeyen embedding backend: {name} ({', '.join(EMBEDDING_BACKENDS)})")
+    return EMBEDDING_BACKENDS[name](model_name)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.rate_limit import RateLimiter, use_rate_limiter, reset_rate_limiter
+
+
+def build_report(model_name: str, y_true: List[str], y_pred: List[str], intents: List[str],
+                 wall_time: Optional[float] = None) -> Dict:
+    """Tahminlerden metrik raporunu oluşturur ve ekrana basar."""
+    # sklearn sadece değerlendirmede gerekiyor, uygulama açılışını yavaşlatmasın
+    from sklearn.metrics import precision_recall_fscore_support, confusion_matrix, classification_report
+    
+    print("\n" + "="*50)
+    print(f"{model_name.upper()} SONUÇ RAPORU")
+    print("="*50)
+    
+    report = classification_report(y_true, y_pred, zero_division=0)
+    print(report)
+    if wall_time is not None:
+        print(f"Toplam süre: {wall_time:.1f} sn ({len(y_true) / max(wall_time, 1e-9):.1f} örnek/sn)")
+    
+    precision, recall, f1, _ = precision_recall_fscore_support(y_true, y_pred, average='weighted', zero_division=0)
+    accuracy = sum(t == p for t, p in zip(y_true, y_pred)) / len(y_true) if y_true else 0.0
+    
+    return {
+        'model': model_name,
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'confusion_matrix': confusion_matrix(y_true, y_pred, labels=intents).tolist(),
+        'classification_report': report,
+        'predictions': y_pred,
+        'true_labels': y_true,
+        'wall_time_seconds': wall_time
+    }
+
+
+async def evaluate_concurrently(predict_fn: Callable[[Any], Awaitable[str]], items: List[Any],
+                                max_concurrency: int = 8,
+                                requests_per_second: Optional[float] = None,
+                                tokens_per_minute: Optional[float] = None) -> Tuple[List[str], float]:
+    """
+    Öğeleri (metin ya da indeks) eşzamanlı olarak tahmin eder.
+
+    En fazla max_concurrency istek aynı anda uçuştadır; API çağrıları
+    istek/saniye ve token/dakika bütçesine göre sıraya alınır.
+    Tahminler girdi sırasıyla döner, yanında geçen süre (sn) verilir.
+    """
+    limiter = RateLimiter(requests_per_second, tokens_per_minute) \
+        if (requests_per_second or tokens_per_minute) else None
+    token = use_rate_limiter(limiter)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    done = 0
+
+    async def _predict(item):
+        nonlocal done
+        async with semaphore:
+            pred = await predict_fn(item)
+        done += 1
+        if done % 10 == 0: print(f"İşleniyor: {done}/{len(items)}")
+        return pred
+
+    start = time.perf_counter()
+    try:
+        predictions = await asyncio.gather(*(_predict(item) for item in items))
+    finally:
+        reset_rate_limiter(token)
+
+    return list(predictions), time.perf_counter() - start
+
+
+async def predict_in_batches(predict_batch: Callable[[List[Any]], Awaitable[List[Optional[str]]]],
+                             items: List[Any], batch_size: int = 20, max_rounds: int = 2,
+                             max_concurrency: int = 4,
+                             requests_per_second: Optional[float] = None,
+                             tokens_per_minute: Optional[float] = None) -> Tuple[Dict[Any, str], List[Any]]:
+    """
+    Öğeleri batch_size'lık gruplar halinde tahmin eder.
+    predict_batch her öğe için geçerli bir etiket ya da None döndürmelidir;
+    None kalan öğeler sonraki turda (sadece onlar) tekrar sorulur.
+
+    Returns:
+        (öğe -> etiket, max_rounds sonunda hâlâ etiketlenemeyen öğeler)
+    """
+    labels: Dict[Any, str] = {}
+    pending = list(items)
+    for round_no in range(max_rounds):
+        if not pending:
+            break
+        if round_no:
+            print(f"{len(pending)} mesajın etiketi geçersiz/eksik, sadece onlar tekrar soruluyor...")
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        outputs, _ = await evaluate_concurrently(predict_batch, batches, max_concurrency,
+                                                 requests_per_second, tokens_per_minute)
+        for batch, batch_labels in zip(batches, outputs):
+            for item, label in zip(batch, batch_labels):
+                if label is not None:
+                    labels[item] = label
+        pending = [item for item in pending if item not in labels]
+    return labels, pending
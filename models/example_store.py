@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Sequence
+
+CONTEXT_HEADER = "\nReferans Örnekler:\n"
+
+
+def _pack(strings: Sequence[str]):
+    """Metinleri tek bir UTF-8 buffer'a yazar, (buffer, offsets) döndürür."""
+    encoded = [s.encode("utf-8") for s in strings]
+    lengths = [len(b) for b in encoded]
+    dtype = np.int32 if sum(lengths) < np.iinfo(np.int32).max else np.int64
+    offsets = np.zeros(len(encoded) + 1, dtype=dtype)
+    if encoded:
+        np.cumsum(lengths, out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+class ExampleStore:
+    """
+    Eğitim örneklerinin sıkıştırılmış, dizi tabanlı kopyası.
+    - intent'ler bir kez saklanır, satırlar int kodlarla tutulur
+    - metinler tek UTF-8 buffer + offset dizisinde durur
+    Prompt satırları sadece istenen örnekler için üretilir; bağlam üretimi pandas
+    olmadan, dilimleme + birleştirme ile yapılır.
+    """
+
+    def __init__(self, texts: Sequence[str], intents: Sequence[str]):
+        codes, names = pd.factorize(pd.Series(list(intents), dtype=object).astype(str), sort=False)
+        self.intent_names: List[str] = [str(name) for name in names]
+        dtype = np.int16 if len(self.intent_names) < np.iinfo(np.int16).max else np.int32
+        self.intent_codes = codes.astype(dtype)
+
+        self._texts, self._text_offsets = _pack([str(t) for t in texts])
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "ExampleStore":
+        return cls(df['text'].astype(str).tolist(), df['intent'].astype(str).tolist())
+
+    def __len__(self) -> int:
+        return len(self.intent_codes)
+
+    def text(self, i: int) -> str:
+        return self._texts[self._text_offsets[i]:self._text_offsets[i + 1]].decode("utf-8")
+
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def intent(self, i: int) -> str:
+        return self.intent_names[self.intent_codes[i]]
+
+    def intents(self) -> List[str]:
+        return [self.intent_names[c] for c in self.intent_codes]
+
+    def render(self, indices: Iterable[int]) -> str:
+        """Verilen satırların prompt satırlarını (FAISS -1'leri atlayarak) üretip birleştirir."""
+        return CONTEXT_HEADER + "".join(
+            f"- Kullanıcı: '{self.text(i)}' -> Niyet: {self.intent(i)}\n" for i in indices if i >= 0
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({'text': self.texts(), 'intent': self.intents()})
+
+    def nbytes(self) -> int:
+        """Store'un yaklaşık bellek kullanımı (byte)."""
+        return (len(self._texts) + self._text_offsets.nbytes
+                + self.intent_codes.nbytes + sum(len(n) for n in self.intent_names))
+
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    """Karşılaştırma için DataFrame'in (string nesneleri dahil) bellek kullanımı."""
+    return int(df.memory_usage(deep=True).sum())
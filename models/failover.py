@@ -0,0 +1,320 @@
+import time
+import asyncio
+import threading
+import numpy as np
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models import instrumentation as metrics
+
+# True iken botlar API hatalarını "Hata oluştu" metnine çevirmek yerine yükseltir;
+# böylece çoklu backend istemcisi hatayı görüp diğer sağlayıcıya geçebilir
+_propagate_errors: ContextVar = ContextVar("propagate_errors", default=False)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def propagate_errors() -> bool:
+    """Mevcut bağlamda API hataları yükseltilmeli mi (bkz. HedgedChatbot)."""
+    return _propagate_errors.get()
+
+
+def _call_strict(fn, *args, **kwargs):
+    """fn'i hata yükseltme modunda çağırır (sync yol ve generator adımları için)."""
+    token = _propagate_errors.set(True)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _propagate_errors.reset(token)
+
+
+class CircuitBreaker:
+    """
+    Art arda `failure_threshold` hatadan sonra sağlayıcıyı `recovery_time` sn devre dışı bırakır.
+    Süre dolunca tek bir deneme isteğine izin verilir (half-open); başarılıysa devre kapanır.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0, name: str = ""):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.name = name
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """İstek gönderilebilir mi; half-open durumda aynı anda tek deneme isteğine izin verir."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"Devre kapandı: {self.name}")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                print(f"Devre açıldı: {self.name} ({self.recovery_time:g} sn devre dışı)")
+                metrics.increment("circuit_open", provider=self.name)
+
+    def release(self):
+        """Sonucu beklenmeden iptal edilen isteğin deneme hakkını geri verir."""
+        with self._lock:
+            self._probing = False
+
+
+class LatencyWindow:
+    """
+    Son isteklerin süreleri; hedge gecikmesi bunların yüzdeliğinden türetilir.
+    Hedge kazandığı için iptal edilen istekler de iptal anına kadar geçen süreyle (alt sınır) eklenir;
+    aksi halde pencerede sadece hızlı istekler kalır ve gecikme yavaşlık anında küçülür.
+    """
+
+    def __init__(self, size: int = 200):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            values = list(self._values)
+        return float(np.percentile(values, q)) if values else 0.0
+
+
+class HedgedChatbot:
+    """
+    Birden fazla sohbet botunu (ör. Groq + Mistral) tek istemci gibi kullanır.
+    İlk sağlayıcı p95 gecikmesi içinde yanıt vermezse aynı istek sıradakine de
+    gönderilir (hedge) ve önce biten kazanır. Hata veren sağlayıcı devre kesiciyle
+    bir süre atlanır.
+    """
+
+    def __init__(self, backends: List[Tuple[str, object]], hedge: bool = True,
+                 hedge_percentile: float = 95.0, default_hedge_delay: float = 1.5,
+                 min_hedge_delay: float = 0.05, min_samples: int = 20,
+                 failure_threshold: int = 5, recovery_time: float = 30.0):
+        """
+        Args:
+            backends: Öncelik sırasına göre (isim, bot) çiftleri; botlar achat/chat/stream_chat sağlamalı
+            hedge: False ise sadece hata durumunda sıradakine geçilir (failover)
+            hedge_percentile: Hedge gecikmesinin türetildiği gecikme yüzdeliği
+            default_hedge_delay: Yeterli örnek (min_samples) birikene kadar kullanılan gecikme (sn)
+            min_hedge_delay: Hedge gecikmesinin alt sınırı (sn)
+            failure_threshold / recovery_time: Devre kesici ayarları
+        """
+        if not backends:
+            raise ValueError("En az bir backend gerekli")
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+
+        self.breakers = {name: CircuitBreaker(failure_threshold, recovery_time, name) for name, _ in self.backends}
+        self.latencies = {name: LatencyWindow() for name, _ in self.backends}
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'hedged': 0, 'failovers': 0, 'failed': 0,
+                       'wins': {name: 0 for name, _ in self.backends}}
+
+        # Sync çağrılar için kalıcı event loop: HTTP bağlantıları turlar arasında korunur
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def hedge_delay(self, name: str) -> float:
+        """Sağlayıcının son (biten ya da iptal edilen) isteklerinin p95 süresi (örnek azsa varsayılan gecikme)."""
+        window = self.latencies[name]
+        if len(window) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, window.percentile(self.hedge_percentile))
+
+    def _ordered_backends(self) -> List[Tuple[str, object]]:
+        """Devresi izin veren sağlayıcılar öncelik sırasıyla; hiçbiri yoksa hepsi denenir."""
+        available = [(name, bot) for name, bot in self.backends if self.breakers[name].allow()]
+        return available or list(self.backends)
+
+    def _count(self, key: str, name: Optional[str] = None):
+        with self._stats_lock:
+            if name is None:
+                self._stats[key] += 1
+            else:
+                self._stats[key][name] += 1
+
+    async def _attempt(self, name: str, bot, user_message: str, history: List[Dict],
+                       single_call: Optional[bool]) -> Tuple[str, str]:
+        token = _propagate_errors.set(True)
+        start = time.perf_counter()
+        try:
+            result = await bot.achat(user_message, history, single_call=single_call)
+        except asyncio.CancelledError:
+            # Gerçek süre en az bu kadar: yavaş sağlayıcının örneği pencereden düşmesin
+            self.latencies[name].add(time.perf_counter() - start)
+            self.breakers[name].release()
+            raise
+        except Exception:
+            self.breakers[name].record_failure()
+            metrics.increment(metrics.COUNTER_ERROR, stage="hedged_chat", provider=name)
+            raise
+        finally:
+            _propagate_errors.reset(token)
+        self.latencies[name].add(time.perf_counter() - start)
+        self.breakers[name].record_success()
+        return result
+
+    async def achat(self, user_message: str, conversation_history: List[Dict] = None,
+                    single_call: Optional[bool] = None) -> Tuple[str, str]:
+        """chat'in async karşılığı: hedge + failover ile (yanıt, intent) döndürür."""
+        history = conversation_history or []
+        queue = self._ordered_backends()
+        self._count('requests')
+
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[Exception] = None
+
+        def _launch():
+            name, bot = queue.pop(0)
+            task = asyncio.create_task(self._attempt(name, bot, user_message, history, single_call))
+            pending[task] = name
+            return name
+
+        try:
+            primary = _launch()
+            while pending:
+                # Sırada sağlayıcı varsa ilk uçuştakinin p95'i kadar beklenir, sonra hedge gönderilir
+                timeout = self.hedge_delay(primary) if (self.hedge and queue and len(pending) == 1) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    self._count('hedged')
+                    metrics.increment("hedged_requests", provider=_launch())
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        self._count('wins', name)
+                        return task.result()
+                    last_error = task.exception()
+                    print(f"{name} başarısız: {last_error}")
+
+                # Uçuşta başka istek yoksa hata veren sağlayıcının yerine sıradaki denenir
+                if not pending and queue:
+                    self._count('failovers')
+                    primary = _launch()
+                    metrics.increment("failovers", provider=primary)
+        finally:
+            for task in pending:
+                task.cancel()
+            # Hiç denenmeyen sağlayıcıların half-open deneme hakkı geri verilir
+            for name, _ in queue:
+                self.breakers[name].release()
+
+        self._count('failed')
+        return f"Hata oluştu: {last_error}", "error"
+
+    def _run(self, coro):
+        """Coroutine'i arka plandaki kalıcı event loop'ta çalıştırıp sonucunu bekler."""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def chat(self, user_message: str, conversation_history: List[Dict] = None,
+             single_call: Optional[bool] = None) -> Tuple[str, str]:
+        """Sohbet fonksiyonu; sağlayıcılar arasında hedge ve failover yapar."""
+        return self._run(self.achat(user_message, conversation_history, single_call))
+
+    def stream_chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, Iterator[str]]:
+        """
+        Akış modunda hedge yapılmaz (yanıt zaten ekrana basılıyor); ilk parça gelmeden
+        hata veren sağlayıcının yerine sıradaki kullanılır.
+        """
+        queue = self._ordered_backends()
+        self._count('requests')
+        last_error: Optional[Exception] = None
+
+        for position, (name, bot) in enumerate(queue):
+            if position:
+                self._count('failovers')
+                metrics.increment("failovers", provider=name)
+            try:
+                intent, stream = _call_strict(bot.stream_chat, user_message, conversation_history)
+                first = _call_strict(next, stream, None)
+            except Exception as e:
+                self.breakers[name].record_failure()
+                metrics.increment(metrics.COUNTER_ERROR, stage="hedged_stream", provider=name)
+                print(f"{name} başarısız: {e}")
+                last_error = e
+                continue
+
+            self.breakers[name].record_success()
+            self._count('wins', name)
+            for skipped, _ in queue[position + 1:]:
+                self.breakers[skipped].release()
+            return intent, self._continue_stream(first, stream)
+
+        self._count('failed')
+        return "error", iter([f"Hata oluştu: {last_error}"])
+
+    @staticmethod
+    def _continue_stream(first: Optional[str], stream: Iterator[str]) -> Iterator[str]:
+        if first is not None:
+            yield first
+        try:
+            yield from stream
+        except Exception as e:
+            yield f"Hata oluştu: {e}"
+
+    def cache_stats(self) -> Dict:
+        """Sağlayıcıların önbellek sayaçları (isim önekli)."""
+        stats = {}
+        for name, bot in self.backends:
+            if hasattr(bot, "cache_stats"):
+                stats.update({f"{name}_{key}": value for key, value in bot.cache_stats().items()})
+        return stats
+
+    def stats(self) -> Dict:
+        """İstek, hedge, failover sayıları, sağlayıcı başına kazanma ve devre durumları."""
+        with self._stats_lock:
+            stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self._stats.items()}
+        stats['circuits'] = {name: breaker.state for name, breaker in self.breakers.items()}
+        stats['hedge_delay'] = {name: self.hedge_delay(name) for name, _ in self.backends}
+        return stats
+
+    async def aclose(self):
+        for _, bot in self.backends:
+            await bot.aclose()
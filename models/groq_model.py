@@ -1,61 +1,203 @@
 import os
 import json
+import time
+import asyncio
+import weakref
 import numpy as np
 import pandas as pd
-import faiss
-from typing import List, Dict, Optional, Tuple
-from groq import Groq
-from sentence_transformers import SentenceTransformer
+from typing import Iterator, List, Dict, Optional, Tuple
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 
+from models.vector_store import VectorStore, DEFAULT_INDEX_DIR, EMBEDDING_MODEL_NAME
+from models.intent_classifier import KNNIntentClassifier
+from models.dataset_watcher import DatasetWatcher
+from models.datasets import TRAIN_DATASET, load_dataset
+from models.example_store import CONTEXT_HEADER, dataframe_nbytes
+from models.prompts import PROMPT_VERSION, parse_batch_intents, parse_intent_reply
+from models.prompt_builder import PromptBuilder
+from models.cache import MISSING, create_cache, make_key
+from models.semantic_cache import SemanticResponseCache
+from models.history import FittedHistory, HistoryManager
+from models.startup import timed
+from models.embeddings import EmbeddingBackend, create_embedding_backend
+from models.http_pool import get_async_http_client, close_async_http_client
+from models.evaluation import build_report, evaluate_concurrently, predict_in_batches
+from models.rate_limit import call_with_rate_limit, estimate_request_tokens
+from models import instrumentation as metrics
+from models.failover import propagate_errors
+
 load_dotenv()
 
+# Semantik yanıt önbelleğinin devreye girdiği en uzun geçmiş (mesaj sayısı)
+SEMANTIC_CACHE_MAX_HISTORY = 2
+# Yanıtı mesajdaki ayrıntıya (ör. tatlı adı) bağlı niyetler: benzer mesajlara aynı yanıt verilemez
+SEMANTIC_CACHE_EXCLUDED_INTENTS = {"order_dessert"}
+
 class GroqChatbotRAG:
-    def __init__(self, api_key: Optional[str] = None, train_df: Optional[pd.DataFrame] = None):
+    def __init__(self, api_key: Optional[str] = None, train_df: Optional[pd.DataFrame] = None,
+                 index_dir: Optional[str] = DEFAULT_INDEX_DIR,
+                 intent_threshold: Optional[float] = 0.7, single_call: bool = False,
+                 cache_size: int = 2048, cache_ttl: float = 3600.0, cache_path: Optional[str] = None,
+                 semantic_threshold: Optional[float] = None, semantic_cache_size: int = 512,
+                 semantic_eviction: str = "lru", embedding_backend: Optional[str] = None,
+                 index_config: Optional[Dict] = None, base_url: Optional[str] = None,
+                 history_token_budget: int = 256, history_summary_budget: int = 96):
         """
         Groq API ve RAG altyapısını başlatan sınıf.
+
+        Args:
+            api_key: Groq API anahtarı
+            train_df: RAG için kullanılacak eğitim verisi
+            index_dir: Index'in diske yazılacağı klasör (None ise her seferinde yeniden oluşturulur)
+            intent_threshold: Yerel kNN tahmininin LLM'e sormadan kabul edileceği güven eşiği
+                              (None ise her mesaj için LLM kullanılır)
+            single_call: chat() varsayılan olarak niyet + yanıtı tek çağrıda alsın mı
+            cache_size / cache_ttl: Niyet ve arama önbelleklerinin boyutu ve ömrü (sn)
+            cache_path: Verilirse önbellek bu sqlite dosyasında kalıcı tutulur
+            semantic_threshold: İlk tur yanıtlarının yeniden kullanılacağı kosinüs eşiği, ör. 0.92
+                                (None ise semantik yanıt önbelleği kapalı; sipariş gibi
+                                SEMANTIC_CACHE_EXCLUDED_INTENTS niyetleri hiç önbelleğe alınmaz)
+            semantic_cache_size / semantic_eviction: Yanıt önbelleği kapasitesi ve politikası ("lru", "fifo")
+            embedding_backend: "torch", "torch-int8" veya "onnx" (None ise EMBEDDING_BACKEND ortam değişkeni)
+            index_config: FAISS index tipi ve parametreleri, ör. {"type": "hnsw", "metric": "ip"}
+                          (bkz. vector_store.DEFAULT_INDEX_CONFIG)
+            base_url: API adresi (None ise GROQ_BASE_URL ortam değişkeni ya da gerçek Groq API'si;
+                      yerel test için stub_llm_server.py adresi verilebilir)
+            history_token_budget: Sohbet geçmişinden olduğu gibi gönderilecek mesajların token bütçesi
+            history_summary_budget: Bütçeye sığmayan eski mesajların özetinin en fazla token sayısı
         """
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         if not self.api_key:
             print("UYARI: GROQ_API_KEY bulunamadı!")
             
-        self.client = Groq(api_key=self.api_key)
+        self.base_url = base_url
+        self.client = Groq(api_key=self.api_key, base_url=base_url)
+        # Event loop başına async istemci (HTTP havuzu tüm botlarla paylaşılır)
+        self._async_clients = weakref.WeakKeyDictionary()
         self.model = "llama-3.3-70b-versatile"
+        # Basit turlar için hızlı model (bkz. IntentRouter)
+        self.small_model = "llama-3.1-8b-instant"
+        self.single_call = single_call
         
         self.intents = [
             "greeting", "order_dessert", "ask_recommendation",
             "check_ingredients", "goodbye"
         ]
         
-        print("Model yükleniyor: paraphrase-multilingual-MiniLM-L12-v2...")
-        try:
-            self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        except Exception as e:
-            print(f"Embedding modeli yüklenemedi: {e}")
-            self.embedding_model = None
+        # Embedding modeli ilk ihtiyaçta yüklenir (bkz. embedding_model)
+        self.embedding_backend = embedding_backend or os.environ.get("EMBEDDING_BACKEND", "torch")
+        self._embedding_model = None
+        self._embedding_load_failed = False
         
-        # Vektör veritabanı değişkenleri
-        self.train_data = None
-        self.index = None
+        # Vektör veritabanı (index + embedding + satırlar); sınıflandırıcının store'u kullanılır
+        self.index_dir = index_dir
+        self.index_config = index_config
+        self.watcher: Optional[DatasetWatcher] = None
+        
+        # Yerel niyet sınıflandırıcı (kNN oylaması)
+        self.intent_threshold = intent_threshold
+        self.intent_classifier: Optional[KNNIntentClassifier] = None
+        self.intent_stats = {'local': 0, 'llm': 0}
+        
+        # Sık tekrarlanan mesajlar için önbellekler (normalize edilmiş metin anahtarlı)
+        self.intent_cache = create_cache(cache_size, cache_ttl, cache_path, name="groq_intent")
+        self.retrieval_cache = create_cache(cache_size, cache_ttl, cache_path, name="groq_retrieval")
+        self.response_cache = SemanticResponseCache(
+            semantic_threshold, semantic_cache_size, cache_ttl, semantic_eviction, name="groq_response"
+        ) if semantic_threshold is not None else None
+        
+        # Sohbet geçmişi token bütçesine sığdırılır (eski davranış: son 10 mesaj)
+        self.history = HistoryManager(history_token_budget, history_summary_budget,
+                                      baseline_window=10, name="groq")
+        
+        # Sabit önek + değişken kuyruk düzeninde prompt'lar (RAG örnekleri mesaja özel, sona eklenir)
+        self.prompts = PromptBuilder("Sen 'Tatlı Rüyalar' adında bir tatlı mağazasının yapay zeka asistanısın.",
+                                     self.intents, provider="groq")
         
         if train_df is not None and self.embedding_model is not None:
             self.setup_vector_db(train_df)
 
+    @property
+    def embedding_model(self) -> Optional[EmbeddingBackend]:
+        """Embedding backend'ini (ve torch'u) sadece RAG yolu kullanıldığında yükler."""
+        if self._embedding_model is None and not self._embedding_load_failed:
+            print(f"Model yükleniyor: {EMBEDDING_MODEL_NAME} ({self.embedding_backend})...")
+            try:
+                with timed('backends', f'embedding:{self.embedding_backend}'):
+                    self._embedding_model = create_embedding_backend(self.embedding_backend)
+            except Exception as e:
+                print(f"Embedding modeli yüklenemedi: {e}")
+                self._embedding_load_failed = True
+        return self._embedding_model
+
+    @property
+    def vector_store(self) -> Optional[VectorStore]:
+        """Güncel store; canlı güncellemelerde tek atamayla değişir (okuyucular yerel kopya almalı)."""
+        return self.intent_classifier.vector_store if self.intent_classifier is not None else None
+
+    @property
+    def index(self):
+        return self.vector_store.index if self.vector_store is not None else None
+
+    @property
+    def train_data(self) -> Optional[pd.DataFrame]:
+        return self.vector_store.data if self.vector_store is not None else None
+
     def setup_vector_db(self, train_df: pd.DataFrame):
-        """Eğitim verilerini vektör veritabanına işler."""
-        print("Vektör veritabanı oluşturuluyor...")
-        self.train_data = train_df.copy()
-        
-        # Metinleri vektöre çevir
-        texts = self.train_data['text'].tolist()
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+        """
+        Eğitim verilerini vektör veritabanına işler.
+        Veri seti değişmediyse diskteki index kullanılır, encode tekrarlanmaz.
+        """
+        print("Vektör veritabanı hazırlanıyor...")
+        directory = os.path.join(self.index_dir, self.embedding_backend) if self.index_dir else None
+        store = VectorStore.load_or_build(
+            train_df, self.embedding_model, self.embedding_model.cache_name, directory, self.index_config
+        )
         
-        # FAISS index oluştur
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype('float32'))
+        self.intent_classifier = KNNIntentClassifier(self.embedding_model, store, index_dir=directory)
         
-        print(f"✓ {len(texts)} örnek başarıyla indekslendi.")
+        print(f"✓ {len(self.vector_store)} örnek başarıyla indekslendi.")
+        print(f"  Örnek deposu belleği: {dataframe_nbytes(train_df[['text', 'intent']]) / 1024:.1f} KB (DataFrame) "
+              f"-> {self.vector_store.examples.nbytes() / 1024:.1f} KB (ExampleStore)")
+
+    # --- CANLI GÜNCELLEME ---
+
+    def _live_classifier(self) -> KNNIntentClassifier:
+        if self.intent_classifier is None:
+            raise RuntimeError("Vektör veritabanı hazır değil (önce setup_vector_db)")
+        return self.intent_classifier
+
+    def add_examples(self, texts: List[str], intents: List[str]):
+        """Etiketli örnekleri yeniden başlatmadan index'e ekler (sadece yeni metinler encode edilir)."""
+        store = self._live_classifier().add_examples(texts, intents)
+        print(f"✓ {len(texts)} örnek eklendi ({len(store)} örnek)")
+
+    def remove_examples(self, texts: List[str]) -> int:
+        """Metni verilenlerle aynı olan örnekleri index'ten çıkarır (encode yapılmaz)."""
+        removed = self._live_classifier().remove_examples(texts)
+        print(f"✓ {removed} örnek çıkarıldı ({len(self.vector_store)} örnek)")
+        return removed
+
+    def reload_training_data(self, train_df: pd.DataFrame) -> Dict:
+        """Index'i yeni eğitim setine eşitler; sadece yeni/değişen satırlar encode edilir."""
+        if self.intent_classifier is None:
+            start = time.perf_counter()
+            self.setup_vector_db(train_df)
+            return {'added': len(train_df), 'removed': 0, 'encoded': len(train_df), 'rebuilt': True,
+                    'seconds': time.perf_counter() - start}
+        stats = self.intent_classifier.reload(train_df)
+        print(f"✓ Eğitim seti yenilendi: +{stats['added']} / -{stats['removed']} satır, "
+              f"{stats['encoded']} metin encode edildi, {stats['seconds']:.2f} sn ({len(self.vector_store)} örnek)")
+        return stats
+
+    def watch_training_data(self, path: str = TRAIN_DATASET, interval: float = 2.0) -> DatasetWatcher:
+        """Eğitim seti dosyası değiştiğinde index'i arka planda günceller."""
+        if self.watcher is None:
+            self.watcher = DatasetWatcher(
+                path, lambda p: self.reload_training_data(load_dataset(p, columns=['text', 'intent'])), interval
+            ).start()
+        return self.watcher
 
     def retrieve_context(self, query: str, k: int = 3) -> str:
         """
@@ -64,96 +206,641 @@ class GroqChatbotRAG:
         if self.index is None:
             return ""
             
-        query_embedding = self.embedding_model.encode([query])
-        distances, indices = self.index.search(query_embedding.astype('float32'), k)
-        
-        similar_rows = self.train_data.iloc[indices[0]]
-        
-        context_str = "\nReferans Örnekler:\n"
-        for _, row in similar_rows.iterrows():
-            context_str += f"- Kullanıcı: '{row['text']}' -> Niyet: {row['intent']}\n"
+        return self.retrieve_contexts([query], k)[0]
+
+    def retrieve_neighbors(self, queries: List[str], k: int = 3,
+                           store: Optional[VectorStore] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tüm sorguları tek encode çağrısı ve tek matris aramasıyla işler.
+        (distances, indices) döndürür; her satır bir sorguya karşılık gelir.
+        """
+        with metrics.span(metrics.STAGE_EMBEDDING):
+            query_embeddings = self.embedding_model.encode(queries, batch_size=64)
+        return (store or self.vector_store).search(query_embeddings, k)
+
+    def retrieve_contexts(self, queries: List[str], k: int = 3) -> List[str]:
+        """retrieve_context'in toplu versiyonu: sorgu başına bağlam metni döndürür."""
+        if self.index is None:
+            return [""] * len(queries)
             
-        return context_str
+        store = self.vector_store
+        _, indices = self.retrieve_neighbors(queries, k, store)
+        return [self._format_context(row, store) for row in indices]
+
+    def _format_context(self, indices: np.ndarray, store: Optional[VectorStore] = None) -> str:
+        """FAISS sonuç indekslerini prompt'a eklenecek örnek listesine çevirir."""
+        return (store or self.vector_store).examples.render(indices)
 
     def predict_intent(self, user_message: str) -> str:
         """
         RAG destekli niyet tahmini yapar.
         """
-        # Benzer örnekleri çek (RAG Step)
-        context_examples = self.retrieve_context(user_message, k=5)
+        intent, _ = self.predict_intent_with_confidence(user_message)
+        return intent
+
+    def predict_intent_with_confidence(self, user_message: str) -> Tuple[str, float]:
+        """
+        Önce yerel kNN sınıflandırıcıyı dener, güven eşiğin altındaysa LLM'e sorar.
+        LLM yolunda geçerli bir etiket için güven 1.0 kabul edilir.
+        """
+        cached = self.intent_cache.get(self._intent_key(user_message))
+        if cached is not MISSING:
+            return tuple(cached)
         
-        system_prompt = f"""Sen bir sınıflandırma asistanısın. Aşağıdaki mesajın niyetini (intent) belirle.
+        local, context_examples = self._local_intent(user_message)
+        if local is not None:
+            return self._remember_intent(user_message, *local)
+        
+        self.intent_stats['llm'] += 1
+        intent = self._predict_intent_llm(user_message, context_examples)
+        return self._remember_intent(user_message, intent, 1.0 if intent in self.intents else 0.0)
 
-Kategoriler: {', '.join(self.intents)}
+    # --- ÖNBELLEK ---
 
-{context_examples}
+    @property
+    def _data_version(self) -> str:
+        """Eğitim verisi değişince önbellek anahtarlarının da değişmesi için."""
+        return self.vector_store.fingerprint[:12] if self.vector_store is not None else "none"
 
-Sadece kategori ismini yaz, başka hiçbir şey yazma."""
+    def _intent_key(self, text: str) -> str:
+        return make_key("intent", f"{self.model}:{self._data_version}", PROMPT_VERSION, text)
 
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Mesaj: {user_message}\nNiyet:"}
-                ],
-                model=self.model,
-                temperature=0.0, 
-                max_tokens=10
-            )
-            
-            predicted = response.choices[0].message.content.strip().lower()
+    def _retrieval_key(self, text: str, k: int, version: Optional[str] = None) -> str:
+        return make_key(f"retrieval:{k}",
+                        f"{EMBEDDING_MODEL_NAME}@{self.embedding_backend}:{version or self._data_version}",
+                        PROMPT_VERSION, text)
+
+    def _remember_intent(self, text: str, intent: str, confidence: float) -> Tuple[str, float]:
+        """Geçerli tahminleri önbelleğe yazar (hatalar yazılmaz)."""
+        if intent in self.intents:
+            self.intent_cache.set(self._intent_key(text), [intent, confidence])
+        return intent, confidence
+
+    def cache_stats(self) -> Dict:
+        """Önbellek isabet/kaçırma sayaçları."""
+        stats = {
+            'intent': self.intent_cache.stats(),
+            'retrieval': self.retrieval_cache.stats()
+        }
+        if self.response_cache is not None:
+            stats['response'] = self.response_cache.stats()
+        return stats
+
+    def _local_intent(self, user_message: str) -> Tuple[Optional[Tuple[str, float]], str]:
+        """
+        Yerel kNN tahmini eşiği geçerse (intent, güven) döndürür.
+        Geçmezse LLM'e verilecek RAG bağlamını döndürür.
+        """
+        return self._local_intents([user_message])[0]
+
+    def _local_intents(self, messages: List[str]) -> List[Tuple[Optional[Tuple[str, float]], str]]:
+        """_local_intent'in toplu versiyonu (tek encode + tek arama)."""
+        if self.index is None or not messages:
+            return [(None, "")] * len(messages)
+        
+        # Tek arama: hem oylama hem de RAG bağlamı için
+        k = max(self.intent_classifier.k, 5)
+        
+        # Arama, oylama ve bağlam aynı store'dan: arada eğitim seti güncellense de tutarlı
+        store = self.vector_store
+        version = store.fingerprint[:12]
+        
+        # Önbellekte olmayan mesajlar tek seferde aranır
+        neighbors = [self.retrieval_cache.get(self._retrieval_key(m, k, version)) for m in messages]
+        missing = [i for i, n in enumerate(neighbors) if n is MISSING]
+        if missing:
+            distances, indices = self.retrieve_neighbors([messages[i] for i in missing], k, store)
+            for j, i in enumerate(missing):
+                neighbors[i] = [distances[j].tolist(), indices[j].tolist()]
+                self.retrieval_cache.set(self._retrieval_key(messages[i], k, version), neighbors[i])
+        
+        results = []
+        for row_distances, row_indices in neighbors:
+            if self.intent_threshold is not None:
+                intent, confidence = self.intent_classifier.vote(row_distances, row_indices, store)
+                if confidence >= self.intent_threshold:
+                    self.intent_stats['local'] += 1
+                    results.append(((intent, confidence), ""))
+                    continue
             
-            for intent in self.intents:
-                if intent in predicted:
-                    return intent
-            return "unknown"
+            # Benzer örnekleri çek (RAG Step)
+            results.append((None, self._format_context(row_indices[:5], store)))
+        return results
+
+    def predict_intents(self, messages: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        Mesaj listesinin niyetlerini toplu tahmin eder.
+        Embedding ve FAISS araması tüm liste için tek seferde yapılır.
+        """
+        async def _run():
+            try:
+                return await self.apredict_intents(messages, max_concurrency)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    def predict_intents_batch(self, messages: List[str], batch_size: int = 20,
+                              max_concurrency: int = 4) -> List[str]:
+        """
+        predict_intents'in toplu prompt versiyonu: LLM'e gidecek mesajlar
+        batch_size'lık gruplar halinde tek istekte etiketlenir (bkz. apredict_intents_batch).
+        """
+        async def _run():
+            try:
+                return await self.apredict_intents_batch(messages, batch_size, max_concurrency)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    def _intent_request(self, user_message: str, context_examples: str) -> Dict:
+        """Niyet tahmini için API istek parametrelerini hazırlar."""
+        return dict(
+            messages=self.prompts.intent_messages(user_message, context_examples),
+            model=self.model,
+            temperature=0.0, 
+            max_tokens=10
+        )
+
+    def _batch_intent_request(self, messages: List[str], context_examples: str) -> Dict:
+        """Birden fazla mesajın niyetini tek istekte soran API parametrelerini hazırlar."""
+        return dict(
+            messages=self.prompts.batch_intent_messages(messages, context_examples),
+            model=self.model,
+            temperature=0.0,
+            max_tokens=20 * len(messages) + 20,
+            response_format={"type": "json_object"}
+        )
+
+    @staticmethod
+    def _merge_contexts(contexts: List[str], per_message: int = 3) -> str:
+        """Mesajların RAG bağlamlarını tekrar eden satırlar atılarak tek blokta birleştirir."""
+        lines = []
+        for context in contexts:
+            body = context[len(CONTEXT_HEADER):] if context.startswith(CONTEXT_HEADER) else context
+            lines.extend([line for line in body.splitlines() if line.strip()][:per_message])
+        return CONTEXT_HEADER + "\n".join(dict.fromkeys(lines)) if lines else ""
+
+    def _match_intent(self, predicted: str) -> str:
+        """Model çıktısını geçerli bir intent'e eşler."""
+        predicted = predicted.strip().lower()
+        
+        for intent in self.intents:
+            if intent in predicted:
+                return intent
+        return "unknown"
+
+    def _predict_intent_llm(self, user_message: str, context_examples: str) -> str:
+        """Niyeti LLM'e sorar."""
+        try:
+            with metrics.span(metrics.STAGE_INTENT):
+                response = self.client.chat.completions.create(
+                    **self._intent_request(user_message, context_examples)
+                )
+            metrics.record_usage(metrics.STAGE_INTENT, response)
+            return self._match_intent(response.choices[0].message.content)
             
         except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT, provider="groq")
+            if propagate_errors():
+                raise
             print(f"Intent tahmini hatası: {e}")
             return "error"
 
-    def chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, str]:
+    def _chat_messages(self, user_message: str, fitted: FittedHistory, intent: str) -> List[Dict]:
+        """Yanıt üretimi için mesaj listesini hazırlar (fitted: bütçeye sığdırılmış geçmiş)."""
+        recent, summary = fitted
+        # Bütçeye sığan son konuşmalar sabit talimatlardan sonra, niyet yeni mesajla birlikte en sona
+        return self.prompts.chat_messages(user_message, recent, summary, intent)
+
+    def _reply_request(self, user_message: str, fitted: FittedHistory, intent: str,
+                       model: Optional[str] = None) -> Dict:
+        """Yanıt üretimi için API istek parametrelerini hazırlar."""
+        return dict(
+            messages=self._chat_messages(user_message, fitted, intent),
+            model=model or self.model,
+            temperature=0.7,
+            max_tokens=150
+        )
+
+    def _single_call_request(self, user_message: str, fitted: FittedHistory, context_examples: str) -> Dict:
+        """Niyet + yanıtı tek JSON çıktısında isteyen API parametrelerini hazırlar."""
+        recent, summary = fitted
+        return dict(
+            messages=self.prompts.single_call_messages(user_message, recent, summary, context_examples),
+            model=self.model,
+            temperature=0.7,
+            max_tokens=200,
+            response_format={"type": "json_object"}
+        )
+
+    def _chat_single_call(self, user_message: str, conversation_history: List[Dict],
+                          fitted: FittedHistory) -> Optional[Tuple[str, str]]:
+        """
+        Tek API çağrısıyla niyet ve yanıtı birlikte üretir.
+        Çıktı çözümlenemezse None döner (iki çağrılı yola düşülür; aynı fitted geçmişle).
+        """
+        local, context_examples = self._local_intent(user_message)
+        if local is not None:
+            # Yerel tahmin yeterince güvenli: zaten tek çağrı yeterli
+            intent = local[0]
+            return self._generate_reply(user_message, conversation_history, intent, fitted=fitted), intent
+
+        try:
+            with metrics.span(metrics.STAGE_SINGLE_CALL):
+                chat_completion = self.client.chat.completions.create(
+                    **self._single_call_request(user_message, fitted, context_examples)
+                )
+            metrics.record_usage(metrics.STAGE_SINGLE_CALL, chat_completion)
+            return parse_intent_reply(chat_completion.choices[0].message.content, self.intents)
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_SINGLE_CALL, provider="groq")
+            if propagate_errors():
+                raise
+            print(f"Tek çağrı modu hatası: {e}")
+            return None
+
+    def _response_cache_key(self, intent: str, model: Optional[str] = None) -> str:
+        """Yanıt önbelleğinde sadece aynı niyet, model ve prompt sürümüyle üretilmiş yanıtlar eşleşir."""
+        return f"{model or self.model}:{PROMPT_VERSION}:{intent}"
+
+    def _response_cache_embedding(self, user_message: str, conversation_history: List[Dict],
+                                  intent: str) -> Optional[np.ndarray]:
+        """
+        Semantik yanıt önbelleği bu tur için uygunsa mesajın embedding'ini döndürür.
+        Sadece sohbetin ilk turlarında (kısa geçmiş) ve işlem niyeti olmayan mesajlarda kullanılır.
+        """
+        # Model zaten RAG için yüklüyse kullanılır; sadece önbellek için yüklenmez
+        if self.response_cache is None or self._embedding_model is None:
+            return None
+        if intent in SEMANTIC_CACHE_EXCLUDED_INTENTS or len(conversation_history) > SEMANTIC_CACHE_MAX_HISTORY:
+            return None
+        with metrics.span(metrics.STAGE_EMBEDDING):
+            return self.embedding_model.encode([user_message])[0]
+
+    def _generate_reply(self, user_message: str, conversation_history: List[Dict], intent: str,
+                        model: Optional[str] = None, fitted: Optional[FittedHistory] = None) -> str:
+        """
+        Tespit edilen niyete göre yanıt üretir.
+        fitted verilmezse geçmiş (önbellek ıskasında) burada bütçeye sığdırılır.
+        """
+        embedding = self._response_cache_embedding(user_message, conversation_history, intent)
+        cache_key = self._response_cache_key(intent, model)
+        if embedding is not None:
+            cached = self.response_cache.lookup(embedding, cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            with metrics.span(metrics.STAGE_GENERATION):
+                chat_completion = self.client.chat.completions.create(
+                    **self._reply_request(user_message, fitted or self.history.fit(conversation_history),
+                                          intent, model)
+                )
+            metrics.record_usage(metrics.STAGE_GENERATION, chat_completion)
+            
+            response = chat_completion.choices[0].message.content.strip()
+            
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="groq")
+            if propagate_errors():
+                raise
+            return f"Hata oluştu: {e}"
+        
+        if embedding is not None:
+            self.response_cache.store(embedding, cache_key, response)
+        return response
+
+    def chat(self, user_message: str, conversation_history: List[Dict] = None,
+             single_call: Optional[bool] = None, intent: Optional[str] = None,
+             model: Optional[str] = None) -> Tuple[str, str]:
         """
         Sohbet fonksiyonu. Hafıza (history) kullanır.
+
+        Args:
+            single_call: True ise niyet ve yanıt tek JSON çıktısıyla alınır
+                         (None ise self.single_call kullanılır)
+            intent: Verilirse niyet tespiti (ve tek çağrı modu) atlanır, ör. IntentRouter zaten tespit ettiyse
+            model: Yanıt üretiminde self.model yerine kullanılacak model (ör. küçük model)
         """
         if conversation_history is None:
             conversation_history = []
+        if single_call is None:
+            single_call = self.single_call
+
+        fitted = None
+        if intent is None:
+            if single_call and model is None:
+                # Geçmiş tur başına bir kez sığdırılır; yedek (iki çağrılı) yol da bunu kullanır
+                fitted = self.history.fit(conversation_history)
+                result = self._chat_single_call(user_message, conversation_history, fitted)
+                if result is not None:
+                    return result
 
-        # 1. Niyeti belirle
-        intent = self.predict_intent(user_message)
+            # 1. Niyeti belirle
+            intent = self.predict_intent(user_message)
         
-        # 2. Sistem Promptunu Hazırla
-        system_prompt = f"""Sen 'Tatlı Rüyalar' adında bir tatlı mağazasının yapay zeka asistanısın.
-Tespit edilen kullanıcı niyeti: {intent.upper()}
+        # 2. Yanıtı üret
+        return self._generate_reply(user_message, conversation_history, intent, model, fitted), intent
 
-Kurallar:
-1. Çok nazik, samimi ve iştah açıcı konuş.
-2. Sadece tatlılar, içecekler ve mağaza hakkında konuş.
-3. Eğer niyet 'order_dessert' ise siparişi onayla ve başka bir isteği olup olmadığını sor.
-4. Yanıtların kısa ve öz olsun (maksimum 3 cümle).
+    def stream_chat(self, user_message: str, conversation_history: List[Dict] = None,
+                    intent: Optional[str] = None, model: Optional[str] = None) -> Tuple[str, Iterator[str]]:
+        """
+        chat()'in akış (streaming) versiyonu.
+        Niyet hemen döner; yanıt parçaları üretildikçe iterator'dan okunur.
+        intent / model parametreleri chat() ile aynıdır.
+        """
+        if conversation_history is None:
+            conversation_history = []
 
-Menüden Örnekler: Fıstıklı Baklava, Sütlaç, San Sebastian Cheesecake, Tiramisu."""
+        if intent is None:
+            intent = self.predict_intent(user_message)
+        return intent, self._stream_reply(user_message, conversation_history, intent, model)
 
-        # 3. Mesaj geçmişini hazırla
-        messages = [{"role": "system", "content": system_prompt}]
+    def _stream_reply(self, user_message: str, conversation_history: List[Dict], intent: str,
+                      model: Optional[str] = None) -> Iterator[str]:
+        embedding = self._response_cache_embedding(user_message, conversation_history, intent)
+        cache_key = self._response_cache_key(intent, model)
+        if embedding is not None:
+            cached = self.response_cache.lookup(embedding, cache_key)
+            if cached is not None:
+                yield cached
+                return
         
-        # Eski konuşmaları ekle 
-        # History formatı: {'role': 'user', 'content': '...'}
-        messages.extend(conversation_history[-10:]) 
+        parts = []
+        try:
+            # Süre, akışın sonuna kadar (tüketen tarafın bekleme süresi dahil) ölçülür
+            with metrics.span(metrics.STAGE_GENERATION):
+                stream = self.client.chat.completions.create(
+                    **self._reply_request(user_message, self.history.fit(conversation_history), intent, model),
+                    stream=True
+                )
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                    
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="groq")
+            if propagate_errors():
+                raise
+            yield f"Hata oluştu: {e}"
+            return
         
-        # Yeni mesajı ekle
-        messages.append({"role": "user", "content": user_message})
+        if embedding is not None:
+            self.response_cache.store(embedding, cache_key, "".join(parts).strip())
 
+    def evaluate_model(self, test_df: pd.DataFrame, max_concurrency: int = 8,
+                       requests_per_second: Optional[float] = None,
+                       tokens_per_minute: Optional[float] = None) -> Dict:
+        """
+        Model başarısını test seti üzerinde ölçer.
+
+        Args:
+            max_concurrency: Aynı anda uçuşta olabilecek en fazla istek
+            requests_per_second: İstek/saniye bütçesi (None ise sınırsız)
+            tokens_per_minute: Token/dakika bütçesi (None ise sınırsız)
+        """
+        async def _run():
+            try:
+                return await self.aevaluate_model(test_df, max_concurrency, requests_per_second, tokens_per_minute)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    # --- ASYNC API ---
+    # Ağ çağrıları paylaşılan bağlantı havuzu üzerinden yapılır,
+    # embedding + FAISS işleri event loop'u bloklamamak için thread'e alınır.
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        """Çalışan event loop'a ait, paylaşılan HTTP havuzunu kullanan istemci."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            # 429/Retry-After'ı sadece call_with_rate_limit ele alır (limitleyici duraklatılır, sayaç artar);
+            # SDK'nın kendi yeniden denemeleri kapalı
+            client = AsyncGroq(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                               http_client=get_async_http_client())
+            self._async_clients[loop] = client
+        return client
+
+    async def _acomplete(self, request: Dict, stage: str = metrics.STAGE_GENERATION):
+        """
+        Tüm async API çağrılarının geçtiği nokta: rate limit + 429 yeniden deneme.
+        Her deneme `stage` aşaması altında ölçülür (limitleyici beklemesi hariç).
+        """
+        async def _call():
+            with metrics.span(stage):
+                return await self.async_client.chat.completions.create(**request)
+
+        response = await call_with_rate_limit(_call, estimate_request_tokens(request))
+        metrics.record_usage(stage, response)
+        return response
+
+    async def apredict_intent(self, user_message: str) -> str:
+        """predict_intent'in async karşılığı."""
+        intent, _ = await self.apredict_intent_with_confidence(user_message)
+        return intent
+
+    async def apredict_intent_with_confidence(self, user_message: str) -> Tuple[str, float]:
+        """predict_intent_with_confidence'ın async karşılığı."""
+        cached = self.intent_cache.get(self._intent_key(user_message))
+        if cached is not MISSING:
+            return tuple(cached)
+        
+        local, context_examples = await asyncio.to_thread(self._local_intent, user_message)
+        if local is not None:
+            return self._remember_intent(user_message, *local)
+        
+        self.intent_stats['llm'] += 1
+        intent = await self._apredict_intent_llm(user_message, context_examples)
+        return self._remember_intent(user_message, intent, 1.0 if intent in self.intents else 0.0)
+
+    async def _apredict_intent_llm(self, user_message: str, context_examples: str) -> str:
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model,
-                temperature=0.7,
-                max_tokens=150
-            )
+            response = await self._acomplete(self._intent_request(user_message, context_examples),
+                                             metrics.STAGE_INTENT)
+            return self._match_intent(response.choices[0].message.content)
             
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT, provider="groq")
+            if propagate_errors():
+                raise
+            print(f"Intent tahmini hatası: {e}")
+            return "error"
+
+    async def _agenerate_reply(self, user_message: str, conversation_history: List[Dict], intent: str,
+                               model: Optional[str] = None, fitted: Optional[FittedHistory] = None) -> str:
+        embedding = await asyncio.to_thread(self._response_cache_embedding, user_message,
+                                            conversation_history, intent)
+        cache_key = self._response_cache_key(intent, model)
+        if embedding is not None:
+            cached = self.response_cache.lookup(embedding, cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            chat_completion = await self._acomplete(
+                self._reply_request(user_message, fitted or self.history.fit(conversation_history), intent, model)
+            )
             response = chat_completion.choices[0].message.content.strip()
-            return response, intent
             
         except Exception as e:
-            return f"Hata oluştu: {e}", intent
\ No newline at end of file
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="groq")
+            if propagate_errors():
+                raise
+            return f"Hata oluştu: {e}"
+        
+        if embedding is not None:
+            self.response_cache.store(embedding, cache_key, response)
+        return response
+
+    async def _achat_single_call(self, user_message: str, conversation_history: List[Dict],
+                                 fitted: FittedHistory) -> Optional[Tuple[str, str]]:
+        local, context_examples = await asyncio.to_thread(self._local_intent, user_message)
+        if local is not None:
+            intent = local[0]
+            return await self._agenerate_reply(user_message, conversation_history, intent, fitted=fitted), intent
+
+        try:
+            chat_completion = await self._acomplete(
+                self._single_call_request(user_message, fitted, context_examples),
+                metrics.STAGE_SINGLE_CALL
+            )
+            return parse_intent_reply(chat_completion.choices[0].message.content, self.intents)
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_SINGLE_CALL, provider="groq")
+            if propagate_errors():
+                raise
+            print(f"Tek çağrı modu hatası: {e}")
+            return None
+
+    async def achat(self, user_message: str, conversation_history: List[Dict] = None,
+                    single_call: Optional[bool] = None, intent: Optional[str] = None,
+                    model: Optional[str] = None) -> Tuple[str, str]:
+        """chat'in async karşılığı."""
+        if conversation_history is None:
+            conversation_history = []
+        if single_call is None:
+            single_call = self.single_call
+
+        fitted = None
+        if intent is None:
+            if single_call and model is None:
+                fitted = self.history.fit(conversation_history)
+                result = await self._achat_single_call(user_message, conversation_history, fitted)
+                if result is not None:
+                    return result
+
+            intent = await self.apredict_intent(user_message)
+        return await self._agenerate_reply(user_message, conversation_history, intent, model, fitted), intent
+
+    async def apredict_intents(self, messages: List[str], max_concurrency: int = 8,
+                               requests_per_second: Optional[float] = None,
+                               tokens_per_minute: Optional[float] = None) -> List[str]:
+        """predict_intents'in async karşılığı. Sadece yerel tahmini yetersiz kalanlar LLM'e gider."""
+        predictions, pending = await self._aresolve_without_llm(messages)
+
+        async def _predict(item):
+            i, context_examples = item
+            intent = await self._apredict_intent_llm(messages[i], context_examples)
+            return self._remember_intent(messages[i], intent, 1.0 if intent in self.intents else 0.0)[0]
+
+        llm_preds, _ = await evaluate_concurrently(
+            _predict, pending, max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for (i, _), pred in zip(pending, llm_preds):
+            predictions[i] = pred
+        return predictions
+
+    async def _aresolve_without_llm(self, messages: List[str]) -> Tuple[List[Optional[str]], List[Tuple[int, str]]]:
+        """
+        Önbellek ve yerel kNN ile çözülebilen niyetleri doldurur.
+        LLM'e gitmesi gerekenler için (indeks, RAG bağlamı) listesi döner.
+        """
+        predictions = [None] * len(messages)
+        for i, message in enumerate(messages):
+            cached = self.intent_cache.get(self._intent_key(message))
+            if cached is not MISSING:
+                predictions[i] = cached[0]
+        
+        uncached = [i for i, pred in enumerate(predictions) if pred is None]
+        local_results = await asyncio.to_thread(self._local_intents, [messages[i] for i in uncached])
+        
+        pending = []
+        for i, (local, context_examples) in zip(uncached, local_results):
+            if local is not None:
+                predictions[i] = self._remember_intent(messages[i], *local)[0]
+            else:
+                pending.append((i, context_examples))
+        self.intent_stats['llm'] += len(pending)
+        return predictions, pending
+
+    async def _apredict_intents_llm_batch(self, batch: List[Tuple[int, str]], messages: List[str]) -> List[Optional[str]]:
+        """Tek istekte bir grup mesajı etiketler; geçersiz/eksik etiketler None döner."""
+        texts = [messages[i] for i, _ in batch]
+        request = self._batch_intent_request(texts, self._merge_contexts([context for _, context in batch]))
+        try:
+            response = await self._acomplete(request, metrics.STAGE_INTENT_BATCH)
+            return parse_batch_intents(response.choices[0].message.content, len(texts), self.intents)
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT_BATCH, provider="groq")
+            if propagate_errors():
+                raise
+            print(f"Toplu intent tahmini hatası: {e}")
+            return [None] * len(texts)
+
+    async def apredict_intents_batch(self, messages: List[str], batch_size: int = 20,
+                                     max_concurrency: int = 4, requests_per_second: Optional[float] = None,
+                                     tokens_per_minute: Optional[float] = None, max_rounds: int = 2) -> List[str]:
+        """
+        LLM'e gidecek mesajları batch_size'lık gruplar halinde, numaralı JSON çıktılı
+        tek prompt ile etiketler. Her etiket self.intents'e göre doğrulanır; geçersiz
+        ya da eksik kalanlar max_rounds tura kadar tekrar gruplanarak sorulur, yine
+        de kalanlar tek mesajlık yoldan (predict_intent) etiketlenir.
+        """
+        predictions, pending = await self._aresolve_without_llm(messages)
+        contexts = dict(pending)
+
+        async def _predict_batch(indices):
+            return await self._apredict_intents_llm_batch([(i, contexts[i]) for i in indices], messages)
+
+        labels, failed = await predict_in_batches(
+            _predict_batch, list(contexts), batch_size, max_rounds,
+            max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for i, intent in labels.items():
+            predictions[i] = self._remember_intent(messages[i], intent, 1.0)[0]
+
+        async def _predict_single(i):
+            intent = await self._apredict_intent_llm(messages[i], contexts[i])
+            return self._remember_intent(messages[i], intent, 1.0 if intent in self.intents else 0.0)[0]
+
+        single_preds, _ = await evaluate_concurrently(
+            _predict_single, failed, max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for i, pred in zip(failed, single_preds):
+            predictions[i] = pred
+        return predictions
+
+    async def aevaluate_model(self, test_df: pd.DataFrame, max_concurrency: int = 8,
+                              requests_per_second: Optional[float] = None,
+                              tokens_per_minute: Optional[float] = None) -> Dict:
+        """evaluate_model'in async karşılığı."""
+        print(f"\nDeğerlendirme Başlıyor: {len(test_df)} örnek...")
+        
+        start = time.perf_counter()
+        y_pred = await self.apredict_intents(
+            test_df['text'].tolist(), max_concurrency, requests_per_second, tokens_per_minute
+        )
+        wall_time = time.perf_counter() - start
+        return build_report('Groq (RAG)', test_df['intent'].tolist(), y_pred, self.intents, wall_time)
+
+    async def aclose(self):
+        """Paylaşılan HTTP bağlantı havuzunu kapatır."""
+        self._async_clients.pop(asyncio.get_running_loop(), None)
+        await close_async_http_client()
@@ -0,0 +1,172 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models import instrumentation as metrics
+
+# Mesaj başına rol/ayraç maliyeti (yaklaşık)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Özet satırlarında tek mesajdan alınacak en fazla karakter
+SUMMARY_USER_CHARS = 160
+SUMMARY_ASSISTANT_CHARS = 80
+
+Summarizer = Callable[[str, List[Dict]], str]
+# HistoryManager.fit çıktısı: (son mesajlar, eski mesajların özeti); tur başına bir kez hesaplanır
+FittedHistory = Tuple[List[Dict], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Kaba token tahmini (~4 karakter/token), rate_limit.estimate_request_tokens ile aynı ölçek."""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Dict, token_counter: Callable[[str], int] = estimate_tokens) -> int:
+    return token_counter(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def extractive_summarizer(previous: str, messages: List[Dict]) -> str:
+    """
+    API çağrısı yapmayan varsayılan özetleyici: önceki özete, düşen mesajları
+    kısaltılmış satırlar olarak ekler. Sipariş detayları genelde müşteri
+    mesajlarında olduğu için onlara daha fazla yer ayrılır.
+    """
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        if message.get("role") == "user":
+            lines.append(f"- Müşteri: {_shorten(message.get('content', ''), SUMMARY_USER_CHARS)}")
+        elif message.get("role") == "assistant":
+            first_sentence = str(message.get("content", "")).split(". ")[0]
+            lines.append(f"- Asistan: {_shorten(first_sentence, SUMMARY_ASSISTANT_CHARS)}")
+    return "\n".join(lines)
+
+
+def format_summary(summary: str) -> str:
+    """Özeti system prompt'un sonuna eklenecek blok haline getirir (özet yoksa boş)."""
+    return f"\n\nÖnceki konuşmanın özeti:\n{summary}" if summary else ""
+
+
+class HistoryManager:
+    """
+    Sohbet geçmişini token bütçesine sığdırır.
+    En yeni mesajlar bütçe dolana kadar olduğu gibi gönderilir; daha eskileri
+    bir özet halinde sıkıştırılır. Özetler geçmişin önek hash'iyle saklandığı
+    için her turda sadece yeni düşen mesajlar özete eklenir.
+    """
+
+    def __init__(self, token_budget: int = 512, summary_budget: int = 128,
+                 baseline_window: Optional[int] = None,
+                 summarizer: Summarizer = extractive_summarizer,
+                 token_counter: Callable[[str], int] = estimate_tokens,
+                 max_cached_summaries: int = 256, name: str = "history"):
+        """
+        Args:
+            token_budget: Olduğu gibi gönderilecek mesajlar için token bütçesi
+            summary_budget: Özetin en fazla token sayısı (aşılırsa en eski satırlar atılır)
+            baseline_window: Karşılaştırma için eski sabit pencere (son N mesaj)
+            summarizer: (önceki özet, yeni düşen mesajlar) -> yeni özet
+        """
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.baseline_window = baseline_window
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.max_cached_summaries = max_cached_summaries
+        self.name = name
+
+        self._summaries = OrderedDict()   # önek hash'i -> özet
+        self._lock = threading.Lock()
+        self._totals = {'turns': 0, 'full_tokens': 0, 'baseline_tokens': 0, 'sent_tokens': 0,
+                        'summarized_messages': 0, 'summary_updates': 0}
+
+    @staticmethod
+    def _prefix_hashes(history: List[Dict]) -> List[str]:
+        """hashes[i] = history[:i] önekinin zincirleme hash'i (hashes[0] boş önek)."""
+        hashes = [""]
+        for message in history:
+            hasher = hashlib.sha1(hashes[-1].encode("ascii"))
+            hasher.update(f"{message.get('role')}\x00{message.get('content', '')}\x01".encode("utf-8"))
+            hashes.append(hasher.hexdigest())
+        return hashes
+
+    def _trim_summary(self, summary: str) -> str:
+        lines = summary.splitlines()
+        while len(lines) > 1 and self.token_counter("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _summary_for(self, history: List[Dict], cut: int, hashes: List[str]) -> str:
+        """history[:cut] için özeti döndürür; önbellekteki en uzun önekten devam eder."""
+        if cut == 0:
+            return ""
+        with self._lock:
+            start, previous = 0, ""
+            for j in range(cut, 0, -1):
+                cached = self._summaries.get(hashes[j])
+                if cached is not None:
+                    self._summaries.move_to_end(hashes[j])
+                    start, previous = j, cached
+                    break
+        if start == cut:
+            return previous
+
+        summary = self._trim_summary(self.summarizer(previous, history[start:cut]))
+        with self._lock:
+            self._summaries[hashes[cut]] = summary
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+            self._totals['summary_updates'] += 1
+        return summary
+
+    def fit(self, history: Optional[List[Dict]]) -> FittedHistory:
+        """
+        Geçmişi bütçeye sığdırır.
+
+        Returns:
+            (olduğu gibi gönderilecek son mesajlar, daha eski mesajların özeti)
+        """
+        history = [m for m in (history or []) if m.get("role") in ("user", "assistant")]
+        costs = [message_tokens(m, self.token_counter) for m in history]
+
+        used = 0
+        cut = len(history)
+        while cut > 0 and used + costs[cut - 1] <= self.token_budget:
+            used += costs[cut - 1]
+            cut -= 1
+
+        summary = self._summary_for(history, cut, self._prefix_hashes(history)) if cut else ""
+        recent = history[cut:]
+
+        sent = used + (self.token_counter(format_summary(summary)) if summary else 0)
+        baseline = sum(costs[-self.baseline_window:]) if self.baseline_window and costs else sum(costs)
+        with self._lock:
+            self._totals['turns'] += 1
+            self._totals['full_tokens'] += sum(costs)
+            self._totals['baseline_tokens'] += baseline
+            self._totals['sent_tokens'] += sent
+            self._totals['summarized_messages'] += cut
+        metrics.increment("history_tokens_baseline", baseline, manager=self.name)
+        metrics.increment("history_tokens_sent", sent, manager=self.name)
+        return recent, summary
+
+    def stats(self) -> Dict:
+        """Tur başına ortalama geçmiş token'ı: tüm geçmiş, eski sabit pencere ve gönderilen."""
+        with self._lock:
+            totals = dict(self._totals)
+            cached = len(self._summaries)
+        turns = max(totals['turns'], 1)
+        return {
+            'turns': totals['turns'],
+            'full_tokens_per_turn': totals['full_tokens'] / turns,
+            'baseline_tokens_per_turn': totals['baseline_tokens'] / turns,
+            'sent_tokens_per_turn': totals['sent_tokens'] / turns,
+            'summarized_messages': totals['summarized_messages'],
+            'summary_updates': totals['summary_updates'],
+            'cached_summaries': cached
+        }
@@ -0,0 +1,27 @@
+import asyncio
+import weakref
+import httpx
+
+# Tüm async provider istemcilerinin paylaştığı bağlantı havuzu ayarları
+ASYNC_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+ASYNC_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# httpx bağlantıları oluşturuldukları event loop'a bağlıdır; loop başına tek havuz tutulur
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Çalışan event loop için paylaşılan httpx.AsyncClient'ı döndürür (yoksa oluşturur)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=ASYNC_HTTP_LIMITS, timeout=ASYNC_HTTP_TIMEOUT)
+        _clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """Çalışan event loop'un havuzunu kapatır."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,396 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import numpy as np
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Ölçüm yapılan aşama isimleri
+STAGE_REQUEST = "request"
+STAGE_TTFT = "first_token"
+STAGE_EMBEDDING = "embedding"
+STAGE_SEARCH = "faiss_search"
+STAGE_INTENT = "intent_llm"
+STAGE_INTENT_BATCH = "intent_batch"
+STAGE_GENERATION = "generation"
+STAGE_SINGLE_CALL = "single_call"
+
+# Sayaç isimleri
+COUNTER_CACHE_HIT = "cache_hits"
+COUNTER_CACHE_MISS = "cache_misses"
+COUNTER_ERROR = "errors"
+COUNTER_RATE_LIMITED = "rate_limited"
+# Prompt token'ları: sabit önek / değişken kısım (tahmini) ve sağlayıcı önbelleğinden gelenler
+COUNTER_PROMPT_PREFIX = "prompt_prefix_tokens"
+COUNTER_PROMPT_VARIABLE = "prompt_variable_tokens"
+COUNTER_PROMPT_CACHED = "prompt_cached_tokens"
+
+# Prometheus histogram sınırları (sn)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Benchmark gibi ölçüm yapılan işlerde aktif kaydediciler (async task ve to_thread'e miras kalır).
+# İç içe kullanılabilir: ör. benchmark kaydedicisi + IntentRouter'ın rota kaydedicisi.
+_current_recorder: ContextVar = ContextVar("latency_recorders", default=())
+
+# Süreç genelinde etkin sink'ler (configure ile ayarlanır). Boşken ölçüm yapılmaz.
+_sinks: Tuple = ()
+
+
+class MetricsSink:
+    """
+    Ölçümlerin gönderildiği hedef arayüzü.
+    Tüm metotlar farklı thread'lerden çağrılabilir.
+    """
+
+    def record(self, stage: str, seconds: float):
+        pass
+
+    def record_usage(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        pass
+
+    def increment(self, name: str, amount: int = 1, labels: Optional[Dict[str, str]] = None):
+        pass
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+class LatencyRecorder(MetricsSink):
+    """Aşama bazlı ham gecikme örneklerini (kesin yüzdelikler için) ve token kullanımını toplar."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.usage = defaultdict(lambda: {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        self.counters = defaultdict(int)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def record_usage(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            entry = self.usage[stage]
+            entry['calls'] += 1
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+
+    def increment(self, name: str, amount: int = 1, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += amount
+
+    def reset(self):
+        with self._lock:
+            self.latencies.clear()
+            self.usage.clear()
+            self.counters.clear()
+
+    def merge(self, other: "LatencyRecorder"):
+        """Başka bir kaydedicinin örneklerini, token kullanımını ve sayaçlarını bu kaydediciye ekler."""
+        with other._lock:
+            latencies = {stage: list(values) for stage, values in other.latencies.items()}
+            usage = {stage: dict(values) for stage, values in other.usage.items()}
+            counters = dict(other.counters)
+        with self._lock:
+            for stage, values in latencies.items():
+                self.latencies[stage].extend(values)
+            for stage, entry in usage.items():
+                for key, value in entry.items():
+                    self.usage[stage][key] += value
+            for key, value in counters.items():
+                self.counters[key] += value
+
+    def summary(self) -> Dict:
+        """Aşama başına adet, ortalama ve p50/p95/p99 (ms); token ortalamaları ve sayaçlar."""
+        with self._lock:
+            latencies = {stage: list(values) for stage, values in self.latencies.items()}
+            usage = {stage: dict(values) for stage, values in self.usage.items()}
+            counters = dict(self.counters)
+
+        stages = {}
+        for stage, values in latencies.items():
+            ms = np.asarray(values) * 1000
+            stages[stage] = {
+                'count': len(values),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+            }
+
+        tokens = {}
+        for stage, entry in usage.items():
+            calls = max(entry['calls'], 1)
+            tokens[stage] = dict(entry,
+                                 prompt_tokens_per_call=entry['prompt_tokens'] / calls,
+                                 completion_tokens_per_call=entry['completion_tokens'] / calls)
+        return {'stages': stages, 'tokens': tokens, 'counters': _format_counters(counters)}
+
+
+def _format_counters(counters: Dict) -> Dict[str, int]:
+    formatted = {}
+    for (name, labels), value in sorted(counters.items()):
+        suffix = ",".join(f"{k}={v}" for k, v in labels)
+        formatted[f"{name}{{{suffix}}}" if suffix else name] = value
+    return formatted
+
+
+class HistogramSink(MetricsSink):
+    """
+    Süreç içi, sabit bellekli histogramlar (örnekler saklanmaz).
+    Yüzdelikler bucket sınırları arasında doğrusal interpolasyonla tahmin edilir.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = defaultdict(float)
+        self.tokens = defaultdict(int)      # (stage, "prompt"|"completion") -> toplam
+        self.counters = defaultdict(int)    # (isim, etiketler) -> toplam
+
+    def record(self, stage: str, seconds: float):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._counts.get(stage)
+            if counts is None:
+                counts = self._counts[stage] = [0] * (len(self.buckets) + 1)
+            counts[slot] += 1
+            self._sums[stage] += seconds
+
+    def record_usage(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.tokens[(stage, "prompt")] += prompt_tokens
+            self.tokens[(stage, "completion")] += completion_tokens
+
+    def increment(self, name: str, amount: int = 1, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += amount
+
+    def _quantile(self, counts: List[int], q: float) -> float:
+        total = sum(counts)
+        target = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        """Aşama başına adet, ortalama ve tahmini p50/p95/p99 (ms), token ve sayaç toplamları."""
+        with self._lock:
+            counts = {stage: list(values) for stage, values in self._counts.items()}
+            sums = dict(self._sums)
+            tokens = dict(self.tokens)
+            counters = dict(self.counters)
+
+        stages = {}
+        for stage, values in counts.items():
+            total = sum(values)
+            stages[stage] = {
+                'count': total,
+                'mean_ms': sums[stage] / total * 1000 if total else 0.0,
+                'p50_ms': self._quantile(values, 0.50) * 1000,
+                'p95_ms': self._quantile(values, 0.95) * 1000,
+                'p99_ms': self._quantile(values, 0.99) * 1000,
+            }
+        token_totals = defaultdict(dict)
+        for (stage, kind), value in tokens.items():
+            token_totals[stage][f"{kind}_tokens"] = value
+        return {'stages': stages, 'tokens': dict(token_totals), 'counters': _format_counters(counters)}
+
+    def render_prometheus(self, prefix: str = "chatbot") -> str:
+        """Prometheus metin formatı (text/plain; version=0.0.4)."""
+        with self._lock:
+            counts = {stage: list(values) for stage, values in self._counts.items()}
+            sums = dict(self._sums)
+            tokens = dict(self.tokens)
+            counters = dict(self.counters)
+
+        lines = [f"# HELP {prefix}_stage_seconds Sohbet hattı aşama süreleri",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, values in sorted(counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {sum(values)}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {sums[stage]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {sum(values)}')
+
+        lines += [f"# HELP {prefix}_tokens_total LLM token kullanımı",
+                  f"# TYPE {prefix}_tokens_total counter"]
+        for (stage, kind), value in sorted(tokens.items()):
+            lines.append(f'{prefix}_tokens_total{{stage="{stage}",kind="{kind}"}} {value}')
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{prefix}_{name}_total{{{label_text}}} {value}" if label_text
+                                 else f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonLogSink(MetricsSink):
+    """Her ölçümü bir JSON satırı olarak dosyaya (ya da stderr'e) yazar."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stream = open(path, "a", encoding="utf-8", buffering=1) if path else sys.stderr
+
+    def _write(self, event: Dict):
+        line = json.dumps(dict(event, ts=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._stream.write(line + "\n")
+
+    def record(self, stage: str, seconds: float):
+        self._write({'type': 'span', 'stage': stage, 'ms': round(seconds * 1000, 3)})
+
+    def record_usage(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        self._write({'type': 'tokens', 'stage': stage, 'prompt': prompt_tokens, 'completion': completion_tokens})
+
+    def increment(self, name: str, amount: int = 1, labels: Optional[Dict[str, str]] = None):
+        self._write({'type': 'counter', 'name': name, 'amount': amount, **(labels or {})})
+
+
+def serve_prometheus(sink: HistogramSink, port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """/metrics adresinde sink içeriğini sunan arka plan HTTP sunucusu başlatır."""
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = sink.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- YAPILANDIRMA ---
+
+def configure(*sinks: MetricsSink):
+    """Süreç genelindeki sink'leri ayarlar (argümansız çağrı ölçümü kapatır)."""
+    global _sinks
+    _sinks = tuple(sinks)
+
+
+def active_sinks() -> Tuple:
+    return _sinks
+
+
+def get_sink(sink_type: type) -> Optional[MetricsSink]:
+    """Etkin sink'ler arasında verilen tipte olanı döndürür."""
+    return next((s for s in _sinks if isinstance(s, sink_type)), None)
+
+
+def configure_from_env() -> Tuple:
+    """
+    CHATBOT_METRICS ortam değişkenine göre sink'leri kurar, ör. "histogram,prometheus,jsonlog".
+    CHATBOT_METRICS_PORT (varsayılan 9464) ve CHATBOT_METRICS_LOG (JSON log dosyası, boşsa stderr).
+    """
+    names = [n.strip() for n in os.environ.get("CHATBOT_METRICS", "").split(",") if n.strip()]
+    sinks = []
+    histogram = None
+    if "histogram" in names or "prometheus" in names:
+        histogram = HistogramSink()
+        sinks.append(histogram)
+    if "prometheus" in names:
+        port = int(os.environ.get("CHATBOT_METRICS_PORT", "9464"))
+        try:
+            serve_prometheus(histogram, port)
+            print(f"✓ Prometheus metrikleri: http://0.0.0.0:{port}/metrics")
+        except OSError as e:
+            print(f"Prometheus sunucusu başlatılamadı: {e}")
+    if "jsonlog" in names:
+        sinks.append(JsonLogSink(os.environ.get("CHATBOT_METRICS_LOG") or None))
+    configure(*sinks)
+    return _sinks
+
+
+# --- ÖLÇÜM NOKTALARI ---
+
+def use_recorder(recorder: Optional[MetricsSink]):
+    """
+    Mevcut bağlamda (ve ondan türeyen task/thread'lerde) ek bir kaydediciyi etkinleştirir.
+    Daha önce etkinleştirilmiş kaydediciler de yazılmaya devam eder.
+    """
+    recorders = _current_recorder.get()
+    return _current_recorder.set(recorders + (recorder,) if recorder is not None else recorders)
+
+
+def reset_recorder(token):
+    _current_recorder.reset(token)
+
+
+def _targets() -> Tuple:
+    recorders = _current_recorder.get()
+    return _sinks + recorders if recorders else _sinks
+
+
+def observe(stage: str, seconds: float):
+    """Dışarıda ölçülmüş bir süreyi kaydeder (ör. akışta ilk token süresi)."""
+    for sink in _targets():
+        sink.record(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """Bloğun süresini etkin sink'lere yazar; hiçbiri yoksa ölçüm yapılmaz."""
+    targets = _targets()
+    if not targets:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for sink in targets:
+            sink.record(stage, elapsed)
+
+
+def record_usage(stage: str, response: Any):
+    """Groq/Mistral yanıtındaki usage alanını (varsa) etkin sink'lere yazar."""
+    targets = _targets()
+    usage = getattr(response, "usage", None)
+    if not targets or usage is None:
+        return
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+    for sink in targets:
+        sink.record_usage(stage, prompt_tokens, completion_tokens)
+
+    # Sağlayıcı prompt önbelleğinden gelen token'lar (OpenAI uyumlu usage.prompt_tokens_details)
+    cached_tokens = int(getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0)
+    if cached_tokens:
+        increment(COUNTER_PROMPT_CACHED, cached_tokens, stage=stage)
+
+
+def increment(name: str, amount: int = 1, **labels: str):
+    """Sayaç artırır (önbellek isabeti, hata, 429 ...)."""
+    for sink in _targets():
+        sink.increment(name, amount, labels or None)
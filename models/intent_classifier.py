@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from models.vector_store import VectorStore, DEFAULT_INDEX_DIR
+from models.embeddings import create_embedding_backend
+from models import instrumentation as metrics
+
+
+class KNNIntentClassifier:
+    """
+    Eğitim setindeki en yakın komşuların ağırlıklı oylaması ile yerel niyet tahmini.
+    LLM çağrısı yapmaz; intent ile birlikte 0-1 arası bir güven skoru döndürür.
+    """
+
+    def __init__(self, embedding_model, vector_store: VectorStore, k: int = 7,
+                 index_dir: Optional[str] = None):
+        """
+        Args:
+            index_dir: Verilirse canlı güncellemelerden sonra index buraya kaydedilir
+        """
+        self.embedding_model = embedding_model
+        self.vector_store = vector_store
+        self.k = k
+        self.index_dir = index_dir
+        self._update_lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, train_df: pd.DataFrame, index_dir: Optional[str] = DEFAULT_INDEX_DIR,
+                       k: int = 7, embedding_backend: Optional[str] = None,
+                       index_config: Optional[Dict] = None) -> "KNNIntentClassifier":
+        """RAG kullanmayan modeller (ör. Mistral) için bağımsız sınıflandırıcı oluşturur."""
+        backend_name = embedding_backend or os.environ.get("EMBEDDING_BACKEND", "torch")
+        embedding_model = create_embedding_backend(backend_name)
+        directory = os.path.join(index_dir, backend_name) if index_dir else None
+        store = VectorStore.load_or_build(train_df, embedding_model, embedding_model.cache_name,
+                                          directory, index_config)
+        return cls(embedding_model, store, k=k, index_dir=directory)
+
+    def vote(self, distances: np.ndarray, indices: np.ndarray,
+             store: Optional[VectorStore] = None) -> Tuple[str, float]:
+        """
+        Tek bir sorgunun komşularından (intent, güven) üretir.
+        store: Aramanın yapıldığı store (arada güncellenmiş olabilecek self.vector_store yerine)
+        """
+        store = store or self.vector_store
+        examples = store.examples
+        indices = np.asarray(indices)
+        valid = indices >= 0
+        if not valid.any():
+            return "unknown", 0.0
+
+        # Yakın komşu daha fazla oy alır (L2 için 1/(1+d), IP için kosinüs)
+        weights = store.similarities(np.asarray(distances)[valid])
+        scores = np.bincount(examples.intent_codes[indices[valid]],
+                             weights=weights, minlength=len(examples.intent_names))
+        total = float(scores.sum())
+        best = int(np.argmax(scores))
+        if total <= 0:
+            return examples.intent_names[best], 0.0
+        return examples.intent_names[best], float(scores[best]) / total
+
+    def classify_embeddings(self, embeddings: np.ndarray) -> List[Tuple[str, float]]:
+        # Arama ve oylama aynı store üzerinde yapılır (canlı güncellemede store değişebilir)
+        store = self.vector_store
+        distances, indices = store.search(embeddings, self.k)
+        return [self.vote(d, i, store) for d, i in zip(distances, indices)]
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """Tek mesaj için (intent, güven) döndürür."""
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """Tüm mesajları tek encode + tek arama ile sınıflandırır."""
+        with metrics.span(metrics.STAGE_EMBEDDING):
+            embeddings = self.embedding_model.encode(texts, batch_size=64)
+        return self.classify_embeddings(embeddings)
+
+    # --- CANLI GÜNCELLEME ---
+    # Güncellemeler yeni bir VectorStore üretir ve tek atamayla devreye alır;
+    # o sırada arama yapan istekler eski store ile tutarlı biçimde tamamlanır.
+
+    def _swap(self, store: VectorStore) -> VectorStore:
+        self.vector_store = store
+        if self.index_dir:
+            try:
+                store.save(self.index_dir)
+            except OSError as e:
+                print(f"Index kaydedilemedi: {e}")
+        return store
+
+    def add_examples(self, texts: List[str], intents: List[str]) -> VectorStore:
+        """Örnekleri canlı index'e ekler; sadece yeni metinler encode edilir."""
+        with self._update_lock:
+            store = self.vector_store.with_added(texts, intents, self.embedding_model)
+            return self._swap(store) if store is not self.vector_store else store
+
+    def remove_examples(self, texts: List[str]) -> int:
+        """Metni verilenlerden biriyle aynı olan satırları çıkarır, çıkarılan satır sayısını döndürür."""
+        targets = {str(t) for t in texts}
+        with self._update_lock:
+            store = self.vector_store
+            positions = [i for i, text in enumerate(store.examples.texts()) if text in targets]
+            if positions:
+                self._swap(store.without(positions))
+            return len(positions)
+
+    def reload(self, train_df: pd.DataFrame) -> Dict:
+        """Index'i yeni eğitim setine eşitler (sadece yeni/değişen metinler encode edilir)."""
+        with self._update_lock:
+            start = time.perf_counter()
+            store, stats = self.vector_store.synced(train_df, self.embedding_model)
+            if store is not self.vector_store:
+                self._swap(store)
+            stats['seconds'] = time.perf_counter() - start
+            return stats
@@ -1,41 +1,93 @@
 import os
 import json
 import time
+import asyncio
+import weakref
 import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from mistralai import Mistral
-from sklearn.metrics import precision_recall_fscore_support, confusion_matrix, classification_report
+from mistralai.utils import RetryConfig
+
+from models.prompts import PROMPT_VERSION, parse_batch_intents, parse_intent_reply
+from models.cache import MISSING, create_cache, make_key
+from models.history import FittedHistory, HistoryManager
+from models.prompt_builder import PromptBuilder
+from models.dataset_watcher import DatasetWatcher
+from models.datasets import TRAIN_DATASET, load_dataset
+from models.http_pool import get_async_http_client, close_async_http_client
+from models.evaluation import build_report, evaluate_concurrently, predict_in_batches
+from models.rate_limit import call_with_rate_limit, estimate_request_tokens
+from models import instrumentation as metrics
+from models.failover import propagate_errors
 
 class MistralChatbot:
-    def __init__(self, api_key: Optional[str] = None, train_df: Optional[pd.DataFrame] = None):
+    def __init__(self, api_key: Optional[str] = None, train_df: Optional[pd.DataFrame] = None,
+                 intent_classifier=None, intent_threshold: float = 0.7,
+                 single_call: bool = False,
+                 cache_size: int = 2048, cache_ttl: float = 3600.0, cache_path: Optional[str] = None,
+                 server_url: Optional[str] = None,
+                 history_token_budget: int = 128, history_summary_budget: int = 64):
         """
         Mistral Chatbot Başlatıcı
         
         Args:
             api_key: Mistral API anahtarı
             train_df: Few-shot learning için kullanılacak eğitim verisi
+            intent_classifier: Opsiyonel yerel sınıflandırıcı (KNNIntentClassifier)
+            intent_threshold: Yerel tahminin LLM'e sormadan kabul edileceği güven eşiği
+            single_call: chat() varsayılan olarak niyet + yanıtı tek çağrıda alsın mı
+            cache_size / cache_ttl: Niyet önbelleğinin boyutu ve ömrü (sn)
+            cache_path: Verilirse önbellek bu sqlite dosyasında kalıcı tutulur
+            server_url: API adresi (None ise MISTRAL_SERVER_URL ortam değişkeni ya da gerçek Mistral API'si;
+                        yerel test için stub_llm_server.py adresi verilebilir)
+            history_token_budget: Sohbet geçmişinden olduğu gibi gönderilecek mesajların token bütçesi
+            history_summary_budget: Bütçeye sığmayan eski mesajların özetinin en fazla token sayısı
         """
         self.api_key = api_key or os.environ.get("MISTRAL_API_KEY")
+        self.server_url = server_url or os.environ.get("MISTRAL_SERVER_URL")
         
         if not self.api_key:
             print("UYARI: MISTRAL_API_KEY bulunamadı! .env dosyasını kontrol edin.")
             self.client = None
         else:
-            self.client = Mistral(api_key=self.api_key)
+            self.client = Mistral(api_key=self.api_key, server_url=self.server_url)
             
+        # Event loop başına async istemci (HTTP havuzu tüm botlarla paylaşılır)
+        self._async_clients = weakref.WeakKeyDictionary()
+        
         self.model = "open-mistral-nemo" 
+        # Basit turlar için hızlı model (bkz. IntentRouter)
+        self.small_model = "ministral-8b-latest"
+        self.single_call = single_call
         
         self.intents = [
             "greeting", "order_dessert", "ask_recommendation", 
             "check_ingredients", "goodbye"
         ]
         
+        # Yerel niyet sınıflandırıcı: eşiği geçen tahminlerde LLM çağrısı yapılmaz
+        self.intent_classifier = intent_classifier
+        self.intent_threshold = intent_threshold
+        self.intent_stats = {'local': 0, 'llm': 0}
+        self.watcher: Optional[DatasetWatcher] = None
+        
+        # Sık tekrarlanan mesajlar için niyet önbelleği (normalize edilmiş metin anahtarlı)
+        self.intent_cache = create_cache(cache_size, cache_ttl, cache_path, name="mistral_intent")
+        
+        # Sohbet geçmişi token bütçesine sığdırılır (eski davranış: son 4 mesaj)
+        self.history = HistoryManager(history_token_budget, history_summary_budget,
+                                      baseline_window=4, name="mistral")
+        
         # --- STATIC FEW-SHOT HAZIRLIĞI ---
         # RAG kullanmadığımız için, her intent'ten 2-3 örnek seçip 
         # bunları sabit prompt olarak modele vereceğiz.
         self.few_shot_context = ""
         if train_df is not None:
             self._prepare_static_examples(train_df)
+        
+        # Few-shot örnekleri sabit olduğu için bayt bayt aynı kalan önekin parçasıdır
+        self.prompts = PromptBuilder("Sen 'Tatlı Rüyalar' pastanesinin yapay zeka asistanısın.",
+                                     self.intents, self.few_shot_context, provider="mistral")
             
         print(f"✓ Mistral API başlatıldı (Model: {self.model})")
 
@@ -69,127 +121,535 @@ class MistralChatbot:
 
     def predict_intent(self, user_message: str) -> str:
         """Kullanıcı mesajının niyetini tahmin eder."""
+        intent, _ = self.predict_intent_with_confidence(user_message)
+        return intent
+
+    def predict_intent_with_confidence(self, user_message: str) -> Tuple[str, float]:
+        """
+        Yerel sınıflandırıcı varsa önce onu dener, güven düşükse LLM'e sorar.
+        LLM yolunda geçerli bir etiket için güven 1.0 kabul edilir.
+        """
+        cached = self.intent_cache.get(self._intent_key(user_message))
+        if cached is not MISSING:
+            return tuple(cached)
+        
+        if self.intent_classifier is not None:
+            intent, confidence = self.intent_classifier.classify(user_message)
+            if confidence >= self.intent_threshold:
+                self.intent_stats['local'] += 1
+                return self._remember_intent(user_message, intent, confidence)
+        
+        self.intent_stats['llm'] += 1
+        intent = self._predict_intent_llm(user_message)
+        return self._remember_intent(user_message, intent, 1.0 if intent in self.intents else 0.0)
+
+    # --- ÖNBELLEK ---
+
+    def _intent_key(self, text: str) -> str:
+        # Few-shot örnekleri rastgele seçildiği için prompt özeti de anahtara girer
+        # Yerel sınıflandırıcının eğitim seti değişince (canlı güncelleme) eski tahminler kullanılmaz
+        store = self.intent_classifier.vector_store if self.intent_classifier is not None else None
+        data_version = store.fingerprint[:12] if store is not None else "none"
+        return make_key("intent", f"{self.model}:{self.prompts.prefix_hash}:{data_version}", PROMPT_VERSION, text)
+
+    def _remember_intent(self, text: str, intent: str, confidence: float) -> Tuple[str, float]:
+        """Geçerli tahminleri önbelleğe yazar (hatalar yazılmaz)."""
+        if intent in self.intents:
+            self.intent_cache.set(self._intent_key(text), [intent, confidence])
+        return intent, confidence
+
+    # --- CANLI GÜNCELLEME ---
+    # Sadece yerel sınıflandırıcının index'i güncellenir; few-shot örnekleri prompt
+    # önekinin parçası olduğu için değiştirilmez.
+
+    def _live_classifier(self):
+        if self.intent_classifier is None:
+            raise RuntimeError("Yerel sınıflandırıcı yok (intent_classifier verilmedi)")
+        return self.intent_classifier
+
+    def add_examples(self, texts: List[str], intents: List[str]):
+        """Etiketli örnekleri yerel sınıflandırıcının index'ine ekler."""
+        store = self._live_classifier().add_examples(texts, intents)
+        print(f"✓ {len(texts)} örnek eklendi ({len(store)} örnek)")
+
+    def remove_examples(self, texts: List[str]) -> int:
+        """Metni verilenlerle aynı olan örnekleri yerel sınıflandırıcının index'inden çıkarır."""
+        removed = self._live_classifier().remove_examples(texts)
+        print(f"✓ {removed} örnek çıkarıldı")
+        return removed
+
+    def reload_training_data(self, train_df: pd.DataFrame) -> Dict:
+        """Yerel sınıflandırıcıyı yeni eğitim setine eşitler; sadece yeni/değişen satırlar encode edilir."""
+        stats = self._live_classifier().reload(train_df)
+        print(f"✓ Eğitim seti yenilendi: +{stats['added']} / -{stats['removed']} satır, "
+              f"{stats['encoded']} metin encode edildi, {stats['seconds']:.2f} sn")
+        return stats
+
+    def watch_training_data(self, path: str = TRAIN_DATASET, interval: float = 2.0) -> DatasetWatcher:
+        """Eğitim seti dosyası değiştiğinde yerel sınıflandırıcıyı arka planda günceller."""
+        self._live_classifier()
+        if self.watcher is None:
+            self.watcher = DatasetWatcher(
+                path, lambda p: self.reload_training_data(load_dataset(p, columns=['text', 'intent'])), interval
+            ).start()
+        return self.watcher
+
+    def cache_stats(self) -> Dict:
+        """Önbellek isabet/kaçırma sayaçları."""
+        return {'intent': self.intent_cache.stats()}
+
+    def _intent_request(self, user_message: str) -> Dict:
+        """Niyet tahmini için API istek parametrelerini hazırlar."""
+        return dict(
+            model=self.model,
+            messages=self.prompts.intent_messages(user_message),
+            temperature=0.0, # Tutarlılık için 0
+            max_tokens=10
+        )
+
+    def _batch_intent_request(self, messages: List[str]) -> Dict:
+        """Birden fazla mesajın niyetini tek istekte soran API parametrelerini hazırlar."""
+        return dict(
+            model=self.model,
+            messages=self.prompts.batch_intent_messages(messages),
+            temperature=0.0,
+            max_tokens=20 * len(messages) + 20,
+            response_format={"type": "json_object"}
+        )
+
+    def _match_intent(self, predicted: str) -> str:
+        """Model çıktısını geçerli bir intent'e eşler."""
+        predicted = predicted.strip().lower()
+        
+        # Temizlik
+        predicted = predicted.replace("intent:", "").strip()
+        
+        # Doğrulama
+        for intent in self.intents:
+            if intent in predicted:
+                return intent
+        
+        return "unknown"
+
+    def _predict_intent_llm(self, user_message: str) -> str:
+        """Niyeti LLM'e sorar."""
         if not self.client: return "error"
 
-        system_prompt = f"""Sen bir sınıflandırma motorusun. 
-Görevin: Kullanıcı mesajını aşağıdaki kategorilerden birine eşleştirmek.
+        try:
+            with metrics.span(metrics.STAGE_INTENT):
+                response = self.client.chat.complete(**self._intent_request(user_message))
+            metrics.record_usage(metrics.STAGE_INTENT, response)
+            return self._match_intent(response.choices[0].message.content)
 
-KATEGORİLER:
-{', '.join(self.intents)}
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT, provider="mistral")
+            if propagate_errors():
+                raise
+            print(f"Intent Error: {e}")
+            return "error"
+
+    def _chat_messages(self, user_message: str, fitted: FittedHistory, intent: str) -> List[Dict]:
+        """Yanıt üretimi için mesaj listesini hazırlar."""
+        # Geçmiş token bütçesine sığdırılmış gelir, eski mesajlar özet olarak system prompt'a eklenir
+        recent, summary = fitted
+        # Niyet her turda değiştiği için system prompt'a değil yeni mesajla birlikte en sona eklenir
+        return self.prompts.chat_messages(user_message, recent, summary, intent)
+
+    def _reply_request(self, user_message: str, fitted: FittedHistory, intent: str,
+                       model: Optional[str] = None) -> Dict:
+        """Yanıt üretimi için API istek parametrelerini hazırlar."""
+        return dict(
+            model=model or self.model,
+            messages=self._chat_messages(user_message, fitted, intent),
+            temperature=0.7, # Yaratıcılık için
+            max_tokens=150
+        )
 
-{self.few_shot_context}
+    def _single_call_request(self, user_message: str, fitted: FittedHistory) -> Dict:
+        """Niyet + yanıtı tek JSON çıktısında isteyen API parametrelerini hazırlar."""
+        recent, summary = fitted
+        return dict(
+            model=self.model,
+            messages=self.prompts.single_call_messages(user_message, recent, summary),
+            temperature=0.7,
+            max_tokens=200,
+            response_format={"type": "json_object"}
+        )
 
-KURALLAR:
-1. Sadece kategori ismini (intent) yaz.
-2. Açıklama yapma, noktalama işareti koyma.
-3. Mesaj şunlardan birine tam uymuyorsa en yakını seç.
+    def _confident_local_intent(self, user_message: str) -> Optional[str]:
+        """Yerel sınıflandırıcı eşiği geçerse intent'i döndürür, geçmezse None."""
+        if self.intent_classifier is None:
+            return None
+        intent, confidence = self.intent_classifier.classify(user_message)
+        if confidence >= self.intent_threshold:
+            self.intent_stats['local'] += 1
+            return intent
+        return None
 
-Mesaj: "{user_message}"
-Intent:"""
+    def _chat_single_call(self, user_message: str, fitted: FittedHistory) -> Optional[Tuple[str, str]]:
+        """
+        Tek API çağrısıyla niyet ve yanıtı birlikte üretir.
+        Çıktı çözümlenemezse None döner (iki çağrılı yola düşülür; aynı fitted geçmişle).
+        """
+        intent = self._confident_local_intent(user_message)
+        if intent is not None:
+            # Yerel tahmin yeterince güvenli: zaten tek çağrı yeterli
+            return self._generate_reply(user_message, fitted, intent), intent
 
         try:
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=[{"role": "user", "content": system_prompt}],
-                temperature=0.0, # Tutarlılık için 0
-                max_tokens=10
-            )
-            
-            predicted = response.choices[0].message.content.strip().lower()
+            with metrics.span(metrics.STAGE_SINGLE_CALL):
+                response = self.client.chat.complete(
+                    **self._single_call_request(user_message, fitted)
+                )
+            metrics.record_usage(metrics.STAGE_SINGLE_CALL, response)
+            return parse_intent_reply(response.choices[0].message.content, self.intents)
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_SINGLE_CALL, provider="mistral")
+            if propagate_errors():
+                raise
+            print(f"Tek çağrı modu hatası: {e}")
+            return None
+
+    def _generate_reply(self, user_message: str, fitted: FittedHistory, intent: str,
+                        model: Optional[str] = None) -> str:
+        """Tespit edilen niyete göre yanıt üretir (fitted: bütçeye sığdırılmış geçmiş)."""
+        try:
+            with metrics.span(metrics.STAGE_GENERATION):
+                response = self.client.chat.complete(
+                    **self._reply_request(user_message, fitted, intent, model)
+                )
+            metrics.record_usage(metrics.STAGE_GENERATION, response)
             
-            # Temizlik
-            predicted = predicted.replace("intent:", "").strip()
+            return response.choices[0].message.content.strip()
             
-            # Doğrulama
-            for intent in self.intents:
-                if intent in predicted:
-                    return intent
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="mistral")
+            if propagate_errors():
+                raise
+            return f"Şu an fırın çok sıcak, yanıt veremiyorum: {e}"
+
+    def chat(self, user_message: str, conversation_history: List[Dict] = None,
+             single_call: Optional[bool] = None, intent: Optional[str] = None,
+             model: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Ana sohbet fonksiyonu (Hafıza destekli).
+
+        Args:
+            single_call: True ise niyet ve yanıt tek JSON çıktısıyla alınır
+                         (None ise self.single_call kullanılır)
+            intent: Verilirse niyet tespiti (ve tek çağrı modu) atlanır, ör. IntentRouter zaten tespit ettiyse
+            model: Yanıt üretiminde self.model yerine kullanılacak model (ör. küçük model)
+        """
+        if not self.client: return "API Key Eksik", "error"
+        if single_call is None:
+            single_call = self.single_call
+        
+        # Geçmiş tur başına bir kez sığdırılır; tek çağrı çözümlenemezse yedek yol da bunu kullanır
+        fitted = self.history.fit(conversation_history)
+        if intent is None:
+            if single_call and model is None:
+                result = self._chat_single_call(user_message, fitted)
+                if result is not None:
+                    return result
             
-            return "unknown"
+            # 1. Niyeti Belirle
+            intent = self.predict_intent(user_message)
+        
+        # 2. Yanıtı üret
+        return self._generate_reply(user_message, fitted, intent, model), intent
+
+    def stream_chat(self, user_message: str, conversation_history: List[Dict] = None,
+                    intent: Optional[str] = None, model: Optional[str] = None) -> Tuple[str, Iterator[str]]:
+        """
+        chat()'in akış (streaming) versiyonu.
+        Niyet hemen döner; yanıt parçaları üretildikçe iterator'dan okunur.
+        intent / model parametreleri chat() ile aynıdır.
+        """
+        if not self.client: return "error", iter(["API Key Eksik"])
+        
+        if intent is None:
+            intent = self.predict_intent(user_message)
+        return intent, self._stream_reply(user_message, conversation_history, intent, model)
 
+    def _stream_reply(self, user_message: str, conversation_history: Optional[List[Dict]], intent: str,
+                      model: Optional[str] = None) -> Iterator[str]:
+        try:
+            with metrics.span(metrics.STAGE_GENERATION):
+                stream = self.client.chat.stream(
+                    **self._reply_request(user_message, self.history.fit(conversation_history), intent, model)
+                )
+                for event in stream:
+                    choices = event.data.choices
+                    delta = choices[0].delta.content if choices else None
+                    if delta:
+                        yield delta
+                    
         except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="mistral")
+            if propagate_errors():
+                raise
+            yield f"Şu an fırın çok sıcak, yanıt veremiyorum: {e}"
+
+    def predict_intents(self, messages: List[str], max_concurrency: int = 4) -> List[str]:
+        """
+        Mesaj listesinin niyetlerini toplu tahmin eder.
+        Yerel sınıflandırıcı varsa tüm liste tek encode + tek aramayla işlenir.
+        """
+        async def _run():
+            try:
+                return await self.apredict_intents(messages, max_concurrency)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    def predict_intents_batch(self, messages: List[str], batch_size: int = 20,
+                              max_concurrency: int = 4) -> List[str]:
+        """
+        predict_intents'in toplu prompt versiyonu: few-shot bloğu her mesaj için
+        tekrar gönderilmez, batch_size mesaj tek istekte etiketlenir.
+        """
+        async def _run():
+            try:
+                return await self.apredict_intents_batch(messages, batch_size, max_concurrency)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    def evaluate_model(self, test_df: pd.DataFrame, max_concurrency: int = 4,
+                       requests_per_second: Optional[float] = 5.0,
+                       tokens_per_minute: Optional[float] = None) -> Dict:
+        """
+        Model başarısını test seti üzerinde ölçer.
+        İstekler eşzamanlı gönderilir; sonuçlar test seti sırasıyla döner.
+
+        Args:
+            max_concurrency: Aynı anda uçuşta olabilecek en fazla istek
+            requests_per_second: İstek/saniye bütçesi (None ise sınırsız)
+            tokens_per_minute: Token/dakika bütçesi (None ise sınırsız)
+        """
+        async def _run():
+            try:
+                return await self.aevaluate_model(test_df, max_concurrency, requests_per_second, tokens_per_minute)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
+
+    # --- ASYNC API ---
+    # Ağ çağrıları paylaşılan bağlantı havuzu üzerinden yapılır,
+    # yerel sınıflandırıcı (embedding) event loop'u bloklamamak için thread'e alınır.
+
+    @property
+    def async_client(self) -> Mistral:
+        """Çalışan event loop'a ait, paylaşılan HTTP havuzunu kullanan istemci."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            # 429/Retry-After'ı sadece call_with_rate_limit ele alır; SDK yeniden denemesi açıkça kapatılır
+            client = Mistral(api_key=self.api_key, server_url=self.server_url,
+                             async_client=get_async_http_client(),
+                             retry_config=RetryConfig("none", None, False))
+            self._async_clients[loop] = client
+        return client
+
+    async def _acomplete(self, request: Dict, stage: str = metrics.STAGE_GENERATION):
+        """
+        Tüm async API çağrılarının geçtiği nokta: rate limit + 429 yeniden deneme.
+        Her deneme `stage` aşaması altında ölçülür (limitleyici beklemesi hariç).
+        """
+        async def _call():
+            with metrics.span(stage):
+                return await self.async_client.chat.complete_async(**request)
+
+        response = await call_with_rate_limit(_call, estimate_request_tokens(request))
+        metrics.record_usage(stage, response)
+        return response
+
+    async def apredict_intent(self, user_message: str) -> str:
+        """predict_intent'in async karşılığı."""
+        intent, _ = await self.apredict_intent_with_confidence(user_message)
+        return intent
+
+    async def apredict_intent_with_confidence(self, user_message: str) -> Tuple[str, float]:
+        """predict_intent_with_confidence'ın async karşılığı."""
+        cached = self.intent_cache.get(self._intent_key(user_message))
+        if cached is not MISSING:
+            return tuple(cached)
+        
+        if self.intent_classifier is not None:
+            intent, confidence = await asyncio.to_thread(self.intent_classifier.classify, user_message)
+            if confidence >= self.intent_threshold:
+                self.intent_stats['local'] += 1
+                return self._remember_intent(user_message, intent, confidence)
+        
+        self.intent_stats['llm'] += 1
+        intent = await self._apredict_intent_llm(user_message)
+        return self._remember_intent(user_message, intent, 1.0 if intent in self.intents else 0.0)
+
+    async def _apredict_intent_llm(self, user_message: str) -> str:
+        if not self.client: return "error"
+
+        try:
+            response = await self._acomplete(self._intent_request(user_message), metrics.STAGE_INTENT)
+            return self._match_intent(response.choices[0].message.content)
+
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT, provider="mistral")
+            if propagate_errors():
+                raise
             print(f"Intent Error: {e}")
             return "error"
 
-    def chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, str]:
-        """Ana sohbet fonksiyonu (Hafıza destekli)."""
+    async def _agenerate_reply(self, user_message: str, fitted: FittedHistory, intent: str,
+                               model: Optional[str] = None) -> str:
+        try:
+            response = await self._acomplete(self._reply_request(user_message, fitted, intent, model))
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_GENERATION, provider="mistral")
+            if propagate_errors():
+                raise
+            return f"Şu an fırın çok sıcak, yanıt veremiyorum: {e}"
+
+    async def _achat_single_call(self, user_message: str, fitted: FittedHistory) -> Optional[Tuple[str, str]]:
+        intent = await asyncio.to_thread(self._confident_local_intent, user_message)
+        if intent is not None:
+            return await self._agenerate_reply(user_message, fitted, intent), intent
+
+        try:
+            response = await self._acomplete(self._single_call_request(user_message, fitted),
+                                             metrics.STAGE_SINGLE_CALL)
+            return parse_intent_reply(response.choices[0].message.content, self.intents)
+        except Exception as e:
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_SINGLE_CALL, provider="mistral")
+            if propagate_errors():
+                raise
+            print(f"Tek çağrı modu hatası: {e}")
+            return None
+
+    async def achat(self, user_message: str, conversation_history: List[Dict] = None,
+                    single_call: Optional[bool] = None, intent: Optional[str] = None,
+                    model: Optional[str] = None) -> Tuple[str, str]:
+        """chat'in async karşılığı."""
         if not self.client: return "API Key Eksik", "error"
+        if single_call is None:
+            single_call = self.single_call
         
-        # 1. Niyeti Belirle
-        intent = self.predict_intent(user_message)
-        
-        # 2. Yanıt Üretme Prompt'u
-        system_instructions = f"""Sen 'Tatlı Rüyalar' pastanesinin yapay zeka asistanısın.
-Tespit edilen kullanıcı niyeti: {intent.upper()}
+        fitted = self.history.fit(conversation_history)
+        if intent is None:
+            if single_call and model is None:
+                result = await self._achat_single_call(user_message, fitted)
+                if result is not None:
+                    return result
+            
+            intent = await self.apredict_intent(user_message)
+        return await self._agenerate_reply(user_message, fitted, intent, model), intent
 
-Kurallar:
-1. Çok nazik, samimi ve iştah açıcı konuş.
-2. Sadece tatlılar, içecekler ve mağaza hakkında konuş.
-3. Eğer niyet 'order_dessert' ise siparişi onayla ve başka bir isteği olup olmadığını sor.
-4. Yanıtların kısa ve öz olsun (maksimum 3 cümle).
+    async def apredict_intents(self, messages: List[str], max_concurrency: int = 4,
+                               requests_per_second: Optional[float] = 5.0,
+                               tokens_per_minute: Optional[float] = None) -> List[str]:
+        """predict_intents'in async karşılığı. Sadece yerel tahmini yetersiz kalanlar LLM'e gider."""
+        predictions, pending = await self._aresolve_without_llm(messages)
 
-Menüden Örnekler: Fıstıklı Baklava, Sütlaç, San Sebastian Cheesecake, Tiramisu.
-"""
+        async def _predict(i):
+            intent = await self._apredict_intent_llm(messages[i])
+            return self._remember_intent(messages[i], intent, 1.0 if intent in self.intents else 0.0)[0]
+
+        llm_preds, _ = await evaluate_concurrently(
+            _predict, pending, max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for i, pred in zip(pending, llm_preds):
+            predictions[i] = pred
+        return predictions
+
+    async def _aresolve_without_llm(self, messages: List[str]) -> Tuple[List[Optional[str]], List[int]]:
+        """Önbellek ve yerel sınıflandırıcıyla çözülebilenleri doldurur, LLM'e gidecek indeksleri döndürür."""
+        predictions = [None] * len(messages)
+        for i, message in enumerate(messages):
+            cached = self.intent_cache.get(self._intent_key(message))
+            if cached is not MISSING:
+                predictions[i] = cached[0]
         
-        # Mesaj geçmişini hazırla
-        messages = [{"role": "system", "content": system_instructions}]
+        uncached = [i for i, pred in enumerate(predictions) if pred is None]
+        if self.intent_classifier is not None and uncached:
+            local_results = await asyncio.to_thread(
+                self.intent_classifier.classify_batch, [messages[i] for i in uncached]
+            )
+            for i, (intent, confidence) in zip(uncached, local_results):
+                if confidence >= self.intent_threshold:
+                    self.intent_stats['local'] += 1
+                    predictions[i] = self._remember_intent(messages[i], intent, confidence)[0]
         
-        # Geçmişi ekle (Son 4 mesaj - token tasarrufu için)
-        if conversation_history:
-            messages.extend(conversation_history[-4:])
-            
-        # Yeni mesajı ekle
-        messages.append({"role": "user", "content": user_message})
+        pending = [i for i, pred in enumerate(predictions) if pred is None]
+        self.intent_stats['llm'] += len(pending)
+        return predictions, pending
+
+    async def _apredict_intents_llm_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """Tek istekte bir grup mesajı etiketler; geçersiz/eksik etiketler None döner."""
+        if not self.client: return [None] * len(texts)
 
         try:
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=messages,
-                temperature=0.7, # Yaratıcılık için
-                max_tokens=150
-            )
-            
-            return response.choices[0].message.content.strip(), intent
-            
+            response = await self._acomplete(self._batch_intent_request(texts), metrics.STAGE_INTENT_BATCH)
+            return parse_batch_intents(response.choices[0].message.content, len(texts), self.intents)
         except Exception as e:
-            return f"Şu an fırın çok sıcak, yanıt veremiyorum: {e}", intent
+            metrics.increment(metrics.COUNTER_ERROR, stage=metrics.STAGE_INTENT_BATCH, provider="mistral")
+            if propagate_errors():
+                raise
+            print(f"Toplu intent tahmini hatası: {e}")
+            return [None] * len(texts)
+
+    async def apredict_intents_batch(self, messages: List[str], batch_size: int = 20,
+                                     max_concurrency: int = 4, requests_per_second: Optional[float] = 5.0,
+                                     tokens_per_minute: Optional[float] = None, max_rounds: int = 2) -> List[str]:
+        """
+        LLM'e gidecek mesajları batch_size'lık gruplar halinde, numaralı JSON çıktılı
+        tek prompt ile etiketler. Her etiket self.intents'e göre doğrulanır; geçersiz
+        ya da eksik kalanlar max_rounds tura kadar tekrar gruplanarak sorulur, yine
+        de kalanlar tek mesajlık yoldan etiketlenir.
+        """
+        predictions, pending = await self._aresolve_without_llm(messages)
+
+        async def _predict_batch(indices):
+            return await self._apredict_intents_llm_batch([messages[i] for i in indices])
+
+        labels, failed = await predict_in_batches(
+            _predict_batch, pending, batch_size, max_rounds,
+            max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for i, intent in labels.items():
+            predictions[i] = self._remember_intent(messages[i], intent, 1.0)[0]
+
+        async def _predict_single(i):
+            intent = await self._apredict_intent_llm(messages[i])
+            return self._remember_intent(messages[i], intent, 1.0 if intent in self.intents else 0.0)[0]
 
-    def evaluate_model(self, test_df: pd.DataFrame):
-        """Model başarısını test seti üzerinde ölçer."""
+        single_preds, _ = await evaluate_concurrently(
+            _predict_single, failed, max_concurrency, requests_per_second, tokens_per_minute
+        )
+        for i, pred in zip(failed, single_preds):
+            predictions[i] = pred
+        return predictions
+
+    async def aevaluate_model(self, test_df: pd.DataFrame, max_concurrency: int = 4,
+                              requests_per_second: Optional[float] = 5.0,
+                              tokens_per_minute: Optional[float] = None) -> Dict:
+        """evaluate_model'in async karşılığı."""
         print(f"\nDeğerlendirme Başlıyor: {len(test_df)} örnek...")
         
-        y_true = []
-        y_pred = []
-        
-        for i, row in test_df.iterrows():
-            if i % 10 == 0: print(f"İşleniyor: {i}/{len(test_df)}")
-            
-            pred = self.predict_intent(row['text'])
-            y_true.append(row['intent'])
-            y_pred.append(pred)
-            
-            # API limitine takılmamak için minik bekleme
-            time.sleep(0.2)
-            
-        print("\n" + "="*50)
-        print("MISTRAL SONUÇ RAPORU")
-        print("="*50)
-        
-        report = classification_report(y_true, y_pred, zero_division=0)
-        print(report)
-        
-        # Metrikleri döndür
-        precision, recall, f1, _ = precision_recall_fscore_support(y_true, y_pred, average='weighted', zero_division=0)
-        
-        return {
-            'model': 'Mistral (Static Few-Shot)',
-            'precision': precision,
-            'recall': recall,
-            'f1_score': f1,
-            'classification_report': report,
-            'predictions': y_pred,
-            'true_labels': y_true
-        }
+        start = time.perf_counter()
+        y_pred = await self.apredict_intents(
+            test_df['text'].tolist(), max_concurrency, requests_per_second, tokens_per_minute
+        )
+        wall_time = time.perf_counter() - start
+        return build_report('Mistral (Static Few-Shot)', test_df['intent'].tolist(), y_pred, self.intents, wall_time)
+
+    async def aclose(self):
+        """Paylaşılan HTTP bağlantı havuzunu kapatır."""
+        self._async_clients.pop(asyncio.get_running_loop(), None)
+        await close_async_http_client()
 
 # --- TEST BLOĞU ---
 if __name__ == "__main__":
@@ -197,9 +657,11 @@ if __name__ == "__main__":
     load_dotenv()
     
     # Veri setini yükle (Varsa)
-    if os.path.exists('data/train_dataset.xlsx'):
+    from models.datasets import TRAIN_DATASET, load_dataset
+
+    if os.path.exists(TRAIN_DATASET):
         print("Veriseti yükleniyor...")
-        df = pd.read_excel('data/train_dataset.xlsx')
+        df = load_dataset(TRAIN_DATASET, columns=['text', 'intent'])
         bot = MistralChatbot(train_df=df)
     else:
         print("Veriseti bulunamadı, boş başlatılıyor.")
@@ -0,0 +1,201 @@
+import os
+import re
+import time
+import zlib
+import resource
+import itertools
+from collections import deque
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# MinHash parametreleri: 64 permütasyon, 16 bant x 4 satır (aday eşiği ~0.5 Jaccard)
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+# 2^32'den küçük en büyük asal: a*x çarpımı uint64'e taşmadan sığar
+_HASH_PRIME = np.uint64(4294967291)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def standardize_columns(columns: Iterable[str]) -> Dict[str, str]:
+    """category/sentence gibi sütun isimlerini intent/text'e eşler."""
+    column_mapping = {}
+    for col in columns:
+        col_lower = str(col).lower().strip()
+        if 'category' in col_lower or 'intent' in col_lower:
+            column_mapping[col] = 'intent'
+        elif 'sentence' in col_lower or 'text' in col_lower:
+            column_mapping[col] = 'text'
+    return column_mapping
+
+
+def clean_text(text) -> str:
+    """
+    Tek metin için temizlik kuralı: küçük harf + boşluk sadeleştirme.
+    Veri seti bu kuralla temizlendiği için önbellek anahtarları da bunu kullanır (cache.normalize_text).
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    return _WHITESPACE.sub(' ', text.lower()).strip()
+
+
+def clean_text_series(texts: pd.Series) -> pd.Series:
+    """
+    clean_text'in vektörel karşılığı (aynı desen ve sıra).
+    object dtype'a çevrilir ki lower() Python ile aynı sonucu versin
+    (Arrow string'leri 'İ' harfini farklı küçültür).
+    """
+    return (texts.astype(str).astype(object)
+                 .str.lower()
+                 .str.replace(_WHITESPACE, ' ', regex=True)
+                 .str.strip())
+
+
+def clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Tek parçayı temizler (süreç havuzunda çalışabilmesi için modül seviyesinde)."""
+    df = df[['intent', 'text']].dropna()
+    return pd.DataFrame({
+        'intent': df['intent'].astype(str).astype(object).str.lower().str.strip(),
+        'text': clean_text_series(df['text'])
+    })
+
+
+class MinHashDeduplicator:
+    """
+    Karakter n-gram MinHash + LSH ile neredeyse aynı örnekleri bulur.
+    Sadece tutulan örneklerin imzaları saklanır; aynı intent içindeki
+    tahmini Jaccard benzerliği eşiği geçen satırlar tekrar sayılır.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = MINHASH_PERMUTATIONS,
+                 bands: int = LSH_BANDS, shingle_size: int = SHINGLE_SIZE, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError("num_perm, bands sayısına tam bölünmeli")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_HASH_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_HASH_PRIME), size=num_perm, dtype=np.uint64)
+        self._buckets: Dict[tuple, int] = {}
+        self._signatures: List[np.ndarray] = []
+
+    def _shingles(self, text: str) -> np.ndarray:
+        padded = f" {text} "
+        n = self.shingle_size
+        grams = {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+        return hashes % _HASH_PRIME
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self._shingles(text)
+        # (a*x + b) mod p, tüm permütasyonlar için tek matris işlemi
+        hashed = (np.outer(shingles, self._a) % _HASH_PRIME + self._b) % _HASH_PRIME
+        return hashed.min(axis=0)
+
+    def is_duplicate(self, text: str, intent: str) -> bool:
+        """Yakın bir kopya daha önce görüldüyse True; değilse örneği kaydeder."""
+        signature = self.signature(text)
+        band_keys = [
+            (intent, band, signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes())
+            for band in range(self.bands)
+        ]
+
+        candidates = {self._buckets[key] for key in band_keys if key in self._buckets}
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                return True
+
+        slot = len(self._signatures)
+        self._signatures.append(signature)
+        for key in band_keys:
+            self._buckets.setdefault(key, slot)
+        return False
+
+
+def peak_memory_mb() -> float:
+    """Bu süreç ve çocuk süreçlerinin en yüksek RSS değeri (MB, Linux)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def _cleaned_chunks(chunks: Iterable[pd.DataFrame], workers: int) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    (ham satır sayısı, temizlenmiş parça) çiftleri verir, sıra korunur.
+    Havuz sadece birden fazla parça varsa açılır ve en fazla 2*workers parça
+    aynı anda bellekte bekler (executor.map tüm girdiyi baştan tüketirdi).
+    """
+    iterator = iter(chunks)
+    first = next(iterator, None)
+    if first is None:
+        return
+    second = next(iterator, None)
+    if second is None or workers <= 1:
+        head = (first,) if second is None else (first, second)
+        for chunk in itertools.chain(head, iterator):
+            yield len(chunk), clean_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in itertools.chain((first, second), iterator):
+            pending.append((len(chunk), pool.submit(clean_chunk, chunk)))
+            if len(pending) >= 2 * workers:
+                size, future = pending.popleft()
+                yield size, future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield size, future.result()
+
+
+def preprocess_chunks(chunks: Iterable[pd.DataFrame], workers: Optional[int] = None,
+                      near_dup_threshold: Optional[float] = 0.8) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Parça parça gelen veriyi temizler, tekrarları ve yakın kopyaları atar.
+    Temizlik süreç havuzunda, tekrar kontrolü sırayı korumak için ana süreçte yapılır.
+
+    Args:
+        chunks: intent/text sütunlu DataFrame parçaları
+        workers: Temizlik için süreç sayısı (None ise CPU sayısı, 1 ise havuz kullanılmaz)
+        near_dup_threshold: MinHash Jaccard eşiği (None ise sadece birebir tekrarlar atılır)
+    """
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    dedup = MinHashDeduplicator(near_dup_threshold) if near_dup_threshold is not None else None
+
+    start = time.perf_counter()
+    seen = set()
+    kept = []
+    stats = {'rows_in': 0, 'empty_removed': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+
+    for raw, cleaned in _cleaned_chunks(chunks, workers):
+        stats['rows_in'] += raw
+        stats['empty_removed'] += raw - len(cleaned)
+        keep = np.zeros(len(cleaned), dtype=bool)
+        for i, (intent, text) in enumerate(zip(cleaned['intent'], cleaned['text'])):
+            if text in seen:
+                stats['exact_duplicates'] += 1
+                continue
+            seen.add(text)
+            if dedup is not None and dedup.is_duplicate(text, intent):
+                stats['near_duplicates'] += 1
+                continue
+            keep[i] = True
+        kept.append(cleaned[keep])
+
+    df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=['intent', 'text'])
+    elapsed = time.perf_counter() - start
+    stats.update({
+        'rows_out': len(df),
+        'seconds': elapsed,
+        'rows_per_second': stats['rows_in'] / elapsed if elapsed > 0 else 0.0,
+        'peak_memory_mb': peak_memory_mb(),
+        'workers': workers
+    })
+    return df, stats
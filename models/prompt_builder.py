@@ -0,0 +1,97 @@
+import hashlib
+from typing import Dict, List
+
+from models import instrumentation as metrics
+from models.history import estimate_tokens, format_summary
+from models.prompts import (CHAT_RULES, SINGLE_CALL_FORMAT, BATCH_INTENT_FORMAT, INTENT_INSTRUCTIONS,
+                            BATCH_INTENT_INSTRUCTIONS, SINGLE_CALL_INSTRUCTIONS, format_batch_messages)
+
+# Prompt türleri (sayaçlardaki `kind` etiketi)
+KIND_INTENT = "intent"
+KIND_INTENT_BATCH = "intent_batch"
+KIND_CHAT = "chat"
+KIND_SINGLE_CALL = "single_call"
+
+
+class PromptBuilder:
+    """
+    Groq ve Mistral botlarının ortak prompt düzeni.
+    Talimatlar, kategoriler ve sabit few-shot örnekleri her istekte bayt bayt aynı kalan
+    system mesajında (önek) tutulur. Tespit edilen niyet, RAG örnekleri ve kullanıcı
+    mesajı gibi değişken kısımlar en sona eklenir; böylece sağlayıcı tarafı prompt
+    önbelleği önek üzerinde isabet edebilir. Önek token'ları bir kez hesaplanır.
+    """
+
+    def __init__(self, persona: str, intents: List[str], examples: str = "", provider: str = ""):
+        """
+        Args:
+            persona: Yanıt üretiminde system prompt'un ilk satırı
+            intents: Kategori listesi (sırası önekin parçasıdır)
+            examples: Her istekte aynı olan few-shot örnekleri (RAG örnekleri buraya verilmez)
+            provider: Sayaç etiketi
+        """
+        self.persona = persona
+        self.intents = list(intents)
+        self.examples = examples
+        self.provider = provider
+
+        categories = ', '.join(self.intents)
+        self.prefixes = {
+            KIND_INTENT: INTENT_INSTRUCTIONS.format(intents=categories, examples=examples),
+            KIND_INTENT_BATCH: (BATCH_INTENT_INSTRUCTIONS.format(intents=categories, examples=examples)
+                                + "\n" + BATCH_INTENT_FORMAT),
+            KIND_CHAT: f"{persona}\n\n{CHAT_RULES}",
+            KIND_SINGLE_CALL: (f"{persona}\n\n{CHAT_RULES}\n\n"
+                               f"{SINGLE_CALL_INSTRUCTIONS.format(intents=categories, examples=examples)}\n"
+                               f"{SINGLE_CALL_FORMAT}"),
+        }
+        self.prefix_tokens = {kind: estimate_tokens(text) for kind, text in self.prefixes.items()}
+        # Önbellek anahtarları için: önekler değişirse (ör. yeni few-shot seçimi) anahtar da değişir
+        self.prefix_hash = hashlib.sha1("\x00".join(self.prefixes.values()).encode("utf-8")).hexdigest()[:8]
+
+    def _finish(self, kind: str, messages: List[Dict]) -> List[Dict]:
+        """Önek ve değişken kısmın tahmini token sayılarını sayaçlara yazar."""
+        total = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        prefix = self.prefix_tokens[kind]
+        metrics.increment(metrics.COUNTER_PROMPT_PREFIX, prefix, kind=kind, provider=self.provider)
+        metrics.increment(metrics.COUNTER_PROMPT_VARIABLE, max(total - prefix, 0), kind=kind, provider=self.provider)
+        return messages
+
+    @staticmethod
+    def _context_block(context: str) -> str:
+        context = context.strip()
+        return f"{context}\n\n" if context else ""
+
+    def intent_messages(self, user_message: str, context: str = "") -> List[Dict]:
+        """Niyet tahmini: sabit talimatlar + (RAG örnekleri ve mesaj)."""
+        return self._finish(KIND_INTENT, [
+            {"role": "system", "content": self.prefixes[KIND_INTENT]},
+            {"role": "user", "content": f"{self._context_block(context)}Mesaj: {user_message}\nNiyet:"}
+        ])
+
+    def batch_intent_messages(self, messages: List[str], context: str = "") -> List[Dict]:
+        """Toplu niyet tahmini: sabit talimatlar + (ortak RAG örnekleri ve numaralı mesajlar)."""
+        return self._finish(KIND_INTENT_BATCH, [
+            {"role": "system", "content": self.prefixes[KIND_INTENT_BATCH]},
+            {"role": "user", "content": self._context_block(context) + format_batch_messages(messages)}
+        ])
+
+    def chat_messages(self, user_message: str, recent: List[Dict], summary: str, intent: str) -> List[Dict]:
+        """
+        Yanıt üretimi: sabit talimatlar (+ konuşma özeti), son mesajlar ve en sonda
+        tespit edilen niyetle birlikte yeni mesaj. Özet sadece eski mesajlar düştükçe
+        değiştiği için konuşma boyunca önekin devamı olarak kalır.
+        """
+        messages = [{"role": "system", "content": self.prefixes[KIND_CHAT] + format_summary(summary)}]
+        messages.extend(recent)
+        messages.append({"role": "user", "content": f"{user_message}\n\n[Tespit edilen niyet: {intent.upper()}]"})
+        return self._finish(KIND_CHAT, messages)
+
+    def single_call_messages(self, user_message: str, recent: List[Dict], summary: str,
+                             context: str = "") -> List[Dict]:
+        """Tek çağrı modu: sabit talimatlar (+ özet), son mesajlar, en sonda RAG örnekleri ve mesaj."""
+        messages = [{"role": "system", "content": self.prefixes[KIND_SINGLE_CALL] + format_summary(summary)}]
+        messages.extend(recent)
+        content = f"{self._context_block(context)}Mesaj: {user_message}" if context.strip() else user_message
+        messages.append({"role": "user", "content": content})
+        return self._finish(KIND_SINGLE_CALL, messages)
@@ -0,0 +1,138 @@
+import json
+import re
+from typing import List, Optional, Tuple
+
+# Prompt metinleri değiştiğinde artırılır; önbellek anahtarlarına girer
+PROMPT_VERSION = "v2"
+
+# Her iki modelin yanıt üretiminde kullandığı ortak kurallar
+CHAT_RULES = """Kurallar:
+1. Çok nazik, samimi ve iştah açıcı konuş.
+2. Sadece tatlılar, içecekler ve mağaza hakkında konuş.
+3. Eğer niyet 'order_dessert' ise siparişi onayla ve başka bir isteği olup olmadığını sor.
+4. Yanıtların kısa ve öz olsun (maksimum 3 cümle).
+
+Menüden Örnekler: Fıstıklı Baklava, Sütlaç, San Sebastian Cheesecake, Tiramisu."""
+
+# Büyük modele gerek olmayan niyetler için hazır yanıtlar (bkz. IntentRouter)
+TEMPLATE_REPLIES = {
+    "greeting": [
+        "Merhaba, Tatlı Rüyalar'a hoş geldiniz! 🧁 Bugün size hangi tatlımızla yardımcı olabilirim?",
+        "Selam, hoş geldiniz! Fıstıklı Baklava'mız ve San Sebastian Cheesecake'imiz bugün çok taze, ne arzu edersiniz?",
+        "Merhabalar! Tatlı bir mola için doğru yerdesiniz. Size ne önermemi istersiniz?",
+    ],
+    "goodbye": [
+        "Bizi tercih ettiğiniz için teşekkür ederiz, afiyet olsun! Yine bekleriz. 👋",
+        "Görüşmek üzere, tatlı günler dileriz! 🍰",
+        "Teşekkürler, yine tatlı bir mola için bekleriz. Hoşça kalın!",
+    ],
+}
+
+# Niyet tahmininin sabit talimatları. Mesaja özel RAG örnekleri ve mesajın kendisi
+# prompt'un sonuna (kullanıcı mesajına) eklenir; bkz. models/prompt_builder.py
+INTENT_INSTRUCTIONS = """Sen bir sınıflandırma asistanısın.
+Görevin: Kullanıcı mesajını aşağıdaki kategorilerden birine eşleştirmek.
+
+KATEGORİLER:
+{intents}
+{examples}
+KURALLAR:
+1. Sadece kategori ismini (intent) yaz.
+2. Açıklama yapma, noktalama işareti koyma.
+3. Mesaj şunlardan birine tam uymuyorsa en yakını seç."""
+
+BATCH_INTENT_INSTRUCTIONS = """Sen bir sınıflandırma asistanısın.
+Görevin: Numaralı her kullanıcı mesajını aşağıdaki kategorilerden birine eşleştirmek.
+
+KATEGORİLER:
+{intents}
+{examples}
+Mesaj şunlardan birine tam uymuyorsa en yakını seç."""
+
+SINGLE_CALL_INSTRUCTIONS = """Ayrıca kullanıcının son mesajının niyetini (intent) şu kategorilerden biriyle belirle: {intents}
+{examples}"""
+
+# Tek çağrı modunda beklenen çıktı formatı
+SINGLE_CALL_FORMAT = """Çıktını SADECE şu JSON formatında ver, başka hiçbir şey yazma:
+{"intent": "<kategori>", "reply": "<müşteriye yanıtın>"}"""
+
+# Toplu niyet tahmininde beklenen çıktı formatı
+BATCH_INTENT_FORMAT = """Numaralı her mesaj için niyeti belirle ve hiçbir mesajı atlama.
+Çıktını SADECE şu JSON formatında ver, başka hiçbir şey yazma:
+{"labels": [{"id": <mesaj numarası>, "intent": "<kategori>"}]}"""
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def format_batch_messages(messages: List[str]) -> str:
+    """Mesajları 1'den başlayan numaralarla tek satırlık girdiler halinde listeler."""
+    lines = [f"[{i}] {' '.join(str(message).split())}" for i, message in enumerate(messages, 1)]
+    return "Mesajlar:\n" + "\n".join(lines)
+
+
+def parse_batch_intents(raw: Optional[str], count: int, intents: List[str]) -> List[Optional[str]]:
+    """
+    Toplu niyet çıktısını mesaj sırasına göre etiket listesine çevirir.
+    Eksik, çelişkili (aynı numaraya farklı etiket) ya da listede olmayan etiketler None olarak kalır.
+    """
+    labels: List[Optional[str]] = [None] * count
+    match = _JSON_OBJECT.search(raw or "")
+    if not match:
+        return labels
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return labels
+
+    items = data.get("labels") if isinstance(data, dict) else None
+    if isinstance(items, list):
+        pairs = [(item.get("id"), item.get("intent")) for item in items if isinstance(item, dict)]
+    elif isinstance(data, dict):
+        # Model bazen {"1": "greeting", ...} biçiminde dönebiliyor
+        pairs = list(data.items())
+    else:
+        return labels
+
+    conflicts = set()
+    for key, intent in pairs:
+        try:
+            index = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        intent = str(intent or "").strip().lower()
+        if not (0 <= index < count) or intent not in intents or index in conflicts:
+            continue
+        if labels[index] is not None and labels[index] != intent:
+            labels[index] = None
+            conflicts.add(index)
+        else:
+            labels[index] = intent
+    return labels
+
+
+def parse_intent_reply(raw: Optional[str], intents: List[str]) -> Optional[Tuple[str, str]]:
+    """
+    Tek çağrı modunun JSON çıktısını (yanıt, intent) olarak çözer.
+    Çıktı bozuksa ya da intent listede yoksa None döner.
+    """
+    if not raw:
+        return None
+
+    # Model bazen JSON'u ``` blokları veya açıklama ile sarabiliyor
+    match = _JSON_OBJECT.search(raw)
+    if not match:
+        return None
+
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    intent = str(data.get("intent", "")).strip().lower()
+    reply = str(data.get("reply", "")).strip()
+
+    if intent not in intents or not reply:
+        return None
+    return reply, intent
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from models import instrumentation as metrics
+
+# Değerlendirme gibi toplu işlerde aktif limitleyici (async task'lara miras kalır)
+_current_limiter: ContextVar = ContextVar("rate_limiter", default=None)
+
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    """Saniyede `rate` hızında dolan, en fazla `capacity` biriktiren kova."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Yeterli jeton birikene kadar bekler. Kilit sayesinde sıra korunur."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    İstek/saniye ve token/dakika bütçesini birlikte uygular.
+    429 alındığında pause() ile tüm çağıranlar Retry-After kadar bekletilir.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second)) \
+            if requests_per_second else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) \
+            if tokens_per_minute else None
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: int = 0):
+        wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            await self.tokens.acquire(tokens)
+
+
+def use_rate_limiter(limiter: Optional[RateLimiter]):
+    """Mevcut async bağlamda (ve ondan türeyen task'larda) limitleyiciyi etkinleştirir."""
+    return _current_limiter.set(limiter)
+
+
+def reset_rate_limiter(token):
+    _current_limiter.reset(token)
+
+
+def estimate_request_tokens(request: Dict) -> int:
+    """İstek için kaba token tahmini (~4 karakter/token + üretilecek token)."""
+    chars = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+    return chars // 4 + int(request.get("max_tokens") or 0)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Hata bir 429 ise beklenecek süreyi döndürür, değilse None.
+    Groq (APIStatusError.response) ve Mistral (SDKError.raw_response) hatalarını tanır.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "raw_response", None)
+    status = getattr(error, "status_code", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status != 429:
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+async def call_with_rate_limit(call: Callable[[], Awaitable], request_tokens: int = 0,
+                               max_retries: int = 5):
+    """
+    API çağrısını aktif limitleyici üzerinden yapar; 429'da Retry-After kadar
+    bekleyip yeniden dener. Diğer hatalar olduğu gibi yükseltilir.
+    """
+    limiter = _current_limiter.get()
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire(request_tokens)
+        try:
+            return await call()
+        except Exception as e:
+            delay = retry_after_seconds(e)
+            if delay is None or attempt >= max_retries:
+                raise
+            attempt += 1
+            metrics.increment(metrics.COUNTER_RATE_LIMITED)
+            if limiter is not None:
+                limiter.pause(delay)
+            print(f"Rate limit (429), {delay:.1f} sn sonra tekrar denenecek ({attempt}/{max_retries})")
+            await asyncio.sleep(delay)
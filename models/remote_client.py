@@ -0,0 +1,116 @@
+import os
+import json
+import httpx
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.failover import propagate_errors
+
+DEFAULT_SERVICE_URL = "http://127.0.0.1:8000"
+
+
+class RemoteChatbot:
+    """
+    chat_server.py servisine bağlanan ince istemci. Groq/Mistral botlarıyla aynı
+    chat / stream_chat / predict_intent_with_confidence arayüzünü sunar; model, index
+    ve API istemcileri serviste tutulur, istemci süreci hafif kalır.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, model: str = "groq", route: bool = False,
+                 timeout: float = 60.0):
+        """
+        Args:
+            base_url: Servis adresi (None ise CHAT_SERVICE_URL ortam değişkeni ya da yerel varsayılan)
+            model: Serviste kullanılacak bot (groq / mistral / hedged)
+            route: True ise tur serviste IntentRouter ile yönlendirilir
+        """
+        self.base_url = (base_url or os.environ.get("CHAT_SERVICE_URL") or DEFAULT_SERVICE_URL).rstrip("/")
+        self.model = model
+        self.route = route
+        # Bağlantı turlar arasında korunur (keep-alive)
+        self._client = httpx.Client(base_url=self.base_url, timeout=httpx.Timeout(timeout, connect=5.0))
+
+    def _payload(self, user_message: str, conversation_history: Optional[List[Dict]], **extra) -> Dict:
+        history = [{"role": m["role"], "content": m["content"]} for m in (conversation_history or [])
+                   if m.get("role") in ("user", "assistant")]
+        return {"message": user_message, "history": history, "model": self.model, "route": self.route, **extra}
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        response = self._client.post(path, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} {response.status_code}: {response.json().get('error', response.text)}")
+        return response.json()
+
+    def chat(self, user_message: str, conversation_history: List[Dict] = None,
+             single_call: Optional[bool] = None) -> Tuple[str, str]:
+        """Sohbet fonksiyonu; (yanıt, intent) döndürür."""
+        try:
+            result = self._post("/chat", self._payload(user_message, conversation_history, single_call=single_call))
+            return result['reply'], result['intent']
+        except (httpx.HTTPError, RuntimeError, ValueError) as e:
+            if propagate_errors():
+                raise
+            return f"Hata oluştu: {e}", "error"
+
+    def stream_chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, Iterator[str]]:
+        """chat()'in akış versiyonu: servis satır satır JSON gönderir, ilk satırda intent gelir."""
+        try:
+            request = self._client.build_request(
+                "POST", "/chat", json=self._payload(user_message, conversation_history, stream=True)
+            )
+            response = self._client.send(request, stream=True)
+            if response.status_code != 200:
+                response.read()
+                raise RuntimeError(f"/chat {response.status_code}: {response.text}")
+            lines = response.iter_lines()
+            header = json.loads(next(lines))
+        except (httpx.HTTPError, RuntimeError, ValueError, StopIteration) as e:
+            if propagate_errors():
+                raise
+            return "error", iter([f"Hata oluştu: {e}"])
+        return header.get('intent', 'unknown'), self._stream_lines(response, lines)
+
+    @staticmethod
+    def _stream_lines(response: httpx.Response, lines: Iterator[str]) -> Iterator[str]:
+        try:
+            for line in lines:
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('done'):
+                    break
+                yield event.get('delta', '')
+        except httpx.HTTPError as e:
+            yield f"Hata oluştu: {e}"
+        finally:
+            response.close()
+
+    def predict_intent_with_confidence(self, user_message: str) -> Tuple[str, float]:
+        try:
+            result = self._post("/intent", {"message": user_message, "model": self.model})
+            return result['intent'], float(result['confidence'])
+        except (httpx.HTTPError, RuntimeError, ValueError) as e:
+            if propagate_errors():
+                raise
+            print(f"Intent tahmini hatası: {e}")
+            return "error", 0.0
+
+    def predict_intent(self, user_message: str) -> str:
+        """Kullanıcı mesajının niyetini tahmin eder."""
+        intent, _ = self.predict_intent_with_confidence(user_message)
+        return intent
+
+    def service_stats(self) -> Dict:
+        """İsteği karşılayan worker'ın bellek, istek ve önbellek istatistikleri."""
+        response = self._client.get("/stats")
+        response.raise_for_status()
+        return response.json()
+
+    def cache_stats(self) -> Dict:
+        """Serviste bu modelin önbellek sayaçları (isteği karşılayan worker'ınki)."""
+        try:
+            return self.service_stats()['models'].get(self.model, {}).get('cache', {})
+        except (httpx.HTTPError, ValueError, KeyError):
+            return {}
+
+    def close(self):
+        self._client.close()
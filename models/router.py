@@ -0,0 +1,202 @@
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.prompts import TEMPLATE_REPLIES
+from models import instrumentation as metrics
+
+# Rota katmanları: hazır yanıt, küçük model, büyük model
+TIER_TEMPLATE = "template"
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+TIERS = (TIER_TEMPLATE, TIER_SMALL, TIER_LARGE)
+
+# Niyet başına en ucuz uygun katman; güven düşükse bir üst katmana çıkılır
+DEFAULT_ROUTES = {
+    "greeting": TIER_TEMPLATE,
+    "goodbye": TIER_TEMPLATE,
+    "check_ingredients": TIER_SMALL,
+    "ask_recommendation": TIER_SMALL,
+    "order_dessert": TIER_LARGE,
+}
+
+_ESCALATION = {TIER_TEMPLATE: TIER_SMALL, TIER_SMALL: TIER_LARGE, TIER_LARGE: TIER_LARGE}
+
+# Rota kaydedicilerinde tüm turun süresi bu aşama adıyla tutulur
+STAGE_TURN = "turn"
+
+
+class IntentRouter:
+    """
+    GroqChatbotRAG / MistralChatbot üzerinde çalışan maliyet/gecikme odaklı yönlendirici.
+    Tespit edilen niyet ve güvene göre her tur hazır yanıtla, küçük modelle ya da
+    büyük modelle yanıtlanır. Her rota için süre ve token kullanımı ayrı tutulur;
+    niyet tespitinin maliyeti de turun düştüğü rotaya yazılır.
+    """
+
+    def __init__(self, bot, routes: Optional[Dict[str, str]] = None, small_model: Optional[str] = None,
+                 template_confidence: float = 0.85, small_confidence: float = 0.7,
+                 template_max_chars: int = 80):
+        """
+        Args:
+            bot: Niyet tespiti ve yanıt üretimi yapılacak sohbet botu
+            routes: intent -> katman eşlemesi (None ise DEFAULT_ROUTES; listede olmayanlar büyük modele gider)
+            small_model: Küçük model adı (None ise bot.small_model)
+            template_confidence: Hazır yanıt için gereken en düşük niyet güveni
+            small_confidence: Küçük model için gereken en düşük niyet güveni
+            template_max_chars: Bundan uzun mesajlara hazır yanıt verilmez (selamla birlikte sipariş vb.)
+        """
+        self.bot = bot
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.small_model = small_model or getattr(bot, "small_model", None)
+        self.template_confidence = template_confidence
+        self.small_confidence = small_confidence
+        self.template_max_chars = template_max_chars
+
+        self.recorders = {tier: metrics.LatencyRecorder() for tier in TIERS}
+
+    def route(self, user_message: str, intent: str, confidence: float) -> str:
+        """Mesajın yanıtlanacağı katmanı seçer."""
+        tier = self.routes.get(intent, TIER_LARGE)
+        if tier == TIER_TEMPLATE and (confidence < self.template_confidence
+                                      or len(user_message) > self.template_max_chars
+                                      or intent not in TEMPLATE_REPLIES):
+            tier = _ESCALATION[tier]
+        if tier == TIER_SMALL and (confidence < self.small_confidence or not self.small_model):
+            tier = _ESCALATION[tier]
+        return tier
+
+    @staticmethod
+    def template_reply(user_message: str, intent: str) -> str:
+        """Aynı mesaja hep aynı hazır yanıt (deterministik seçim)."""
+        replies = TEMPLATE_REPLIES[intent]
+        return replies[zlib.crc32(user_message.encode("utf-8")) % len(replies)]
+
+    def _model_for(self, tier: str) -> Optional[str]:
+        return self.small_model if tier == TIER_SMALL else None
+
+    def _detect(self, user_message: str) -> Tuple[str, float, metrics.LatencyRecorder]:
+        """Niyet tespiti; kullanımı rota seçilince ona eklenmek üzere ayrı bir kaydediciye yazılır."""
+        recorder = metrics.LatencyRecorder()
+        token = metrics.use_recorder(recorder)
+        try:
+            intent, confidence = self.bot.predict_intent_with_confidence(user_message)
+        finally:
+            metrics.reset_recorder(token)
+        return intent, confidence, recorder
+
+    async def _adetect(self, user_message: str) -> Tuple[str, float, metrics.LatencyRecorder]:
+        recorder = metrics.LatencyRecorder()
+        token = metrics.use_recorder(recorder)
+        try:
+            intent, confidence = await self.bot.apredict_intent_with_confidence(user_message)
+        finally:
+            metrics.reset_recorder(token)
+        return intent, confidence, recorder
+
+    def _select(self, user_message: str, intent: str, confidence: float,
+                detection: metrics.LatencyRecorder) -> str:
+        tier = self.route(user_message, intent, confidence)
+        self.recorders[tier].merge(detection)
+        return tier
+
+    def _finish(self, tier: str, start: float):
+        elapsed = time.perf_counter() - start
+        self.recorders[tier].record(STAGE_TURN, elapsed)
+        metrics.observe(f"route_{tier}", elapsed)
+        metrics.increment("routes", tier=tier)
+
+    def chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, str]:
+        """Niyeti tespit eder, seçilen katmanda yanıt üretir; (yanıt, intent) döndürür."""
+        start = time.perf_counter()
+        intent, confidence, detection = self._detect(user_message)
+        tier = self._select(user_message, intent, confidence, detection)
+
+        token = metrics.use_recorder(self.recorders[tier])
+        try:
+            if tier == TIER_TEMPLATE:
+                reply = self.template_reply(user_message, intent)
+            else:
+                reply, _ = self.bot.chat(user_message, conversation_history, intent=intent,
+                                         model=self._model_for(tier))
+        finally:
+            metrics.reset_recorder(token)
+        self._finish(tier, start)
+        return reply, intent
+
+    async def achat(self, user_message: str, conversation_history: List[Dict] = None,
+                    single_call: Optional[bool] = None) -> Tuple[str, str]:
+        """chat'in async karşılığı (single_call, bot arayüzüyle uyum için kabul edilir ve yok sayılır)."""
+        start = time.perf_counter()
+        intent, confidence, detection = await self._adetect(user_message)
+        tier = self._select(user_message, intent, confidence, detection)
+
+        token = metrics.use_recorder(self.recorders[tier])
+        try:
+            if tier == TIER_TEMPLATE:
+                reply = self.template_reply(user_message, intent)
+            else:
+                reply, _ = await self.bot.achat(user_message, conversation_history, intent=intent,
+                                                model=self._model_for(tier))
+        finally:
+            metrics.reset_recorder(token)
+        self._finish(tier, start)
+        return reply, intent
+
+    def stream_chat(self, user_message: str, conversation_history: List[Dict] = None) -> Tuple[str, Iterator[str]]:
+        """chat()'in akış versiyonu; hazır yanıtlar tek parça olarak döner."""
+        start = time.perf_counter()
+        intent, confidence, detection = self._detect(user_message)
+        tier = self._select(user_message, intent, confidence, detection)
+        if tier == TIER_TEMPLATE:
+            self._finish(tier, start)
+            return intent, iter([self.template_reply(user_message, intent)])
+
+        _, stream = self.bot.stream_chat(user_message, conversation_history, intent=intent,
+                                         model=self._model_for(tier))
+        return intent, self._routed_stream(tier, stream, start)
+
+    def _routed_stream(self, tier: str, stream: Iterator[str], start: float) -> Iterator[str]:
+        # Kaydedici sadece her parça üretilirken etkin: generator'ı tüketen bağlama sızmaz
+        recorder = self.recorders[tier]
+        while True:
+            token = metrics.use_recorder(recorder)
+            try:
+                chunk = next(stream, None)
+            finally:
+                metrics.reset_recorder(token)
+            if chunk is None:
+                break
+            yield chunk
+        self._finish(tier, start)
+
+    def route_stats(self) -> Dict:
+        """Rota başına tur sayısı, tur süresi yüzdelikleri (ms) ve tur başına token (niyet tespiti dahil)."""
+        stats = {}
+        for tier, recorder in self.recorders.items():
+            summary = recorder.summary()
+            turn = summary['stages'].get(STAGE_TURN)
+            turns = turn['count'] if turn else 0
+            prompt = sum(t['prompt_tokens'] for t in summary['tokens'].values())
+            completion = sum(t['completion_tokens'] for t in summary['tokens'].values())
+            intent = summary['tokens'].get(metrics.STAGE_INTENT, {})
+            intent_tokens = intent.get('prompt_tokens', 0) + intent.get('completion_tokens', 0)
+            stats[tier] = {
+                'turns': turns,
+                'p50_ms': turn['p50_ms'] if turn else 0.0,
+                'p95_ms': turn['p95_ms'] if turn else 0.0,
+                'prompt_tokens_per_turn': prompt / turns if turns else 0.0,
+                'completion_tokens_per_turn': completion / turns if turns else 0.0,
+                'intent_tokens_per_turn': intent_tokens / turns if turns else 0.0,
+            }
+        return stats
+
+    def cache_stats(self) -> Dict:
+        return self.bot.cache_stats() if hasattr(self.bot, "cache_stats") else {}
+
+    @property
+    def history(self):
+        return self.bot.history
+
+    async def aclose(self):
+        await self.bot.aclose()
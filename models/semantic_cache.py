@@ -0,0 +1,118 @@
+import time
+import threading
+import numpy as np
+from typing import Dict, Optional
+
+from models import instrumentation as metrics
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+
+class SemanticResponseCache:
+    """
+    Anlamca yakın (kosinüs benzerliği eşiği geçen) ilk mesajlar için
+    daha önce üretilmiş yanıtı döndüren önbellek.
+    Sadece aynı anahtara (ör. intent + model + prompt sürümü) sahip kayıtlar eşleşebilir.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512,
+                 ttl: float = 86400.0, eviction: str = "lru", name: str = "response"):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Geçersiz eviction politikası: {eviction} ({', '.join(EVICTION_POLICIES)})")
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.eviction = eviction
+
+        self._vectors: Optional[np.ndarray] = None   # (max_entries, dim), normalize edilmiş
+        self._keys = [None] * max_entries
+        self._replies = [None] * max_entries
+        self._created = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _expire(self, now: float):
+        self._valid &= (now - self._created) <= self.ttl
+
+    def lookup(self, embedding: np.ndarray, key: str) -> Optional[str]:
+        """Eşik üstü benzerlikte, aynı anahtarlı kayıt varsa yanıtını döndürür."""
+        reply = self._lookup(embedding, key)
+        metrics.increment(metrics.COUNTER_CACHE_HIT if reply is not None else metrics.COUNTER_CACHE_MISS,
+                          cache=self.name)
+        return reply
+
+    def _lookup(self, embedding: np.ndarray, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            self._expire(now)
+            candidates = np.flatnonzero(self._valid)
+            candidates = [i for i in candidates if self._keys[i] == key]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            scores = self._vectors[candidates] @ self._normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            slot = candidates[best]
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._replies[slot]
+
+    def store(self, embedding: np.ndarray, key: str, reply: str):
+        now = time.time()
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype='float32')
+
+            self._expire(now)
+            free = np.flatnonzero(~self._valid)
+            if len(free):
+                slot = int(free[0])
+            else:
+                # Kapasite doldu: politikaya göre en eski / en az kullanılanı çıkar
+                ages = self._last_used if self.eviction == "lru" else self._created
+                slot = int(np.argmin(ages))
+
+            self._vectors[slot] = vector
+            self._keys[slot] = key
+            self._replies[slot] = reply
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._valid[slot] = True
+
+    def clear(self):
+        with self._lock:
+            self._valid[:] = False
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': int(self._valid.sum()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
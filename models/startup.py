@@ -0,0 +1,41 @@
+import sys
+import time
+import importlib
+from contextlib import contextmanager
+from typing import Dict
+
+# Soğuk başlangıç ölçümleri: modül import süreleri ve backend kurulum süreleri (sn)
+STARTUP_TIMINGS: Dict[str, Dict[str, float]] = {'imports': {}, 'backends': {}}
+
+
+@contextmanager
+def timed(category: str, name: str):
+    """Bloğun süresini STARTUP_TIMINGS[category][name] altına yazar."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS.setdefault(category, {})[name] = time.perf_counter() - start
+
+
+def timed_import(module_name: str):
+    """
+    Modülü ilk ihtiyaç anında import eder ve süresini kaydeder.
+    Zaten yüklü modüller için ölçüm yapılmaz.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    with timed('imports', module_name):
+        return importlib.import_module(module_name)
+
+
+def startup_report() -> Dict[str, Dict[str, float]]:
+    """Kaydedilen sürelerin kopyasını döndürür."""
+    return {category: dict(values) for category, values in STARTUP_TIMINGS.items()}
+
+
+def print_startup_report():
+    for category, values in startup_report().items():
+        print(f"[{category}]")
+        for name, seconds in sorted(values.items(), key=lambda kv: -kv[1]):
+            print(f"  {name:<40} {seconds * 1000:8.1f} ms")
@@ -0,0 +1,424 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from collections import Counter
+from contextlib import contextmanager
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from models.startup import timed_import
+from models import instrumentation as metrics
+from models.example_store import ExampleStore
+
+# Varsayılan index klasörü: <proje>/data/index_cache
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "index_cache"
+)
+
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+INDEX_FILE = "index.faiss"
+EMBEDDINGS_FILE = "embeddings.npy"
+ROWS_FILE = "rows.json"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+try:
+    import fcntl
+except ImportError:  # Windows: sadece süreç içi kilit kullanılır
+    fcntl = None
+
+# Aynı klasöre yazan store'ların dosya değişimleri sırayla yapılır (süreç içi + süreçler arası)
+_save_lock = threading.Lock()
+
+
+@contextmanager
+def _directory_lock(directory: str):
+    with _save_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def import_faiss():
+    """faiss ağır bir modül; sadece RAG yolu gerçekten kullanıldığında yüklenir."""
+    return timed_import('faiss')
+
+
+# Index tipi ve parametreleri. metric="ip" seçilirse vektörler normalize edilir (kosinüs).
+DEFAULT_INDEX_CONFIG = {
+    'type': 'flat',          # flat | hnsw | ivf | ivfpq
+    'metric': 'l2',          # l2 | ip
+    'hnsw_m': 32,
+    'ef_construction': 80,
+    'ef_search': 64,
+    'nlist': 256,
+    'nprobe': 16,
+    'pq_m': 16,              # boyutu (384) tam bölmeli
+    'pq_bits': 8,
+}
+INDEX_TYPES = ('flat', 'hnsw', 'ivf', 'ivfpq')
+# FAISS'in küme başına önerdiği en az eğitim örneği
+IVF_POINTS_PER_LIST = 39
+
+
+def resolve_index_config(index_config: Optional[Dict] = None) -> Dict:
+    """Eksik alanları varsayılanlarla doldurur ve doğrular."""
+    config = dict(DEFAULT_INDEX_CONFIG)
+    config.update(index_config or {})
+    if config['type'] not in INDEX_TYPES:
+        raise ValueError(f"Geçersiz index tipi: {config['type']} ({', '.join(INDEX_TYPES)})")
+    if config['metric'] not in ('l2', 'ip'):
+        raise ValueError(f"Geçersiz metrik: {config['metric']} (l2, ip)")
+    return config
+
+
+def trainable_index_type(config: Dict, n: int) -> str:
+    """
+    n satırla eğitilebilecek index tipi. PQ eğitimi en az 2^pq_bits vektör ister, IVF'in
+    tek kümeden anlamı kalmaz; canlı güncellemelerle küçülen store'lar bir alt tipe düşer.
+    Fingerprint konfigürasyondan üretildiği için aynı satırlar hep aynı tipe düşer.
+    """
+    index_type = config['type']
+    if index_type == 'ivfpq' and n < 2 ** config['pq_bits']:
+        index_type = 'ivf'
+    if index_type == 'ivf' and n < IVF_POINTS_PER_LIST:
+        index_type = 'flat'
+    if index_type != config['type']:
+        print(f"{n} satır {config['type']} eğitimi için yetersiz, {index_type} index kullanılıyor")
+    return index_type
+
+
+def build_index(embeddings: np.ndarray, index_config: Optional[Dict] = None):
+    """
+    Verilen konfigürasyona göre FAISS index'i oluşturur, eğitir ve doldurur.
+    metric="ip" için embedding'lerin önceden normalize edilmiş olması beklenir.
+    """
+    faiss = import_faiss()
+    config = resolve_index_config(index_config)
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n, dimension = embeddings.shape
+    metric = faiss.METRIC_INNER_PRODUCT if config['metric'] == 'ip' else faiss.METRIC_L2
+    index_type = trainable_index_type(config, n)
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatIP(dimension) if config['metric'] == 'ip' else faiss.IndexFlatL2(dimension)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, config['hnsw_m'], metric)
+        index.hnsw.efConstruction = config['ef_construction']
+    else:
+        # Küçük veri setlerinde küme sayısı eğitim verisine göre kısılır (~39 örnek/küme)
+        nlist = max(1, min(config['nlist'], n // IVF_POINTS_PER_LIST))
+        quantizer = faiss.IndexFlatIP(dimension) if config['metric'] == 'ip' else faiss.IndexFlatL2(dimension)
+        if index_type == 'ivf':
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, config['pq_m'], config['pq_bits'], metric)
+        index.train(embeddings)
+
+    index.add(embeddings)
+    apply_search_params(index, config)
+    return index
+
+
+def apply_search_params(index, index_config: Dict):
+    """Arama zamanı parametrelerini (efSearch / nprobe) uygular."""
+    faiss = import_faiss()
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = index_config['ef_search']
+    ivf = faiss.try_extract_index_ivf(index) if hasattr(faiss, 'try_extract_index_ivf') else None
+    if ivf is not None:
+        ivf.nprobe = min(index_config['nprobe'], ivf.nlist)
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype='float32')
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def dataset_fingerprint(df: pd.DataFrame, model_name: str, index_config: Optional[Dict] = None) -> str:
+    """Veri seti içeriği + embedding model adı + index ayarlarından kararlı bir hash üretir."""
+    return rows_fingerprint(df['text'].astype(str), df['intent'].astype(str), model_name, index_config)
+
+
+def rows_fingerprint(texts: Iterable[str], intents: Iterable[str], model_name: str,
+                     index_config: Optional[Dict] = None) -> str:
+    """dataset_fingerprint'in DataFrame gerektirmeyen hali (artımlı güncellemeler için)."""
+    hasher = hashlib.sha256()
+    hasher.update(model_name.encode("utf-8"))
+    hasher.update(json.dumps(resolve_index_config(index_config), sort_keys=True).encode("utf-8"))
+    for text, intent in zip(texts, intents):
+        hasher.update(b"\x1e")
+        hasher.update(text.encode("utf-8"))
+        hasher.update(b"\x1f")
+        hasher.update(intent.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class VectorStore:
+    """
+    FAISS index'i, embedding matrisi ve satır bilgilerini birlikte tutar.
+    Satırlar DataFrame yerine sıkıştırılmış ExampleStore olarak saklanır.
+    Diske yazılabilir ve hash eşleştiğinde memory-mapped olarak geri yüklenir.
+    """
+
+    def __init__(self, index, embeddings: np.ndarray, data: Union[pd.DataFrame, ExampleStore],
+                 fingerprint: str, model_name: str, index_config: Optional[Dict] = None):
+        self.index = index
+        self.embeddings = embeddings
+        self.examples = data if isinstance(data, ExampleStore) else ExampleStore.from_dataframe(data)
+        self.fingerprint = fingerprint
+        self.model_name = model_name
+        self.index_config = resolve_index_config(index_config)
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """Satırların DataFrame görünümü (her çağrıda yeniden oluşturulur, sıcak yolda kullanmayın)."""
+        return self.examples.to_frame()
+
+    @property
+    def metric(self) -> str:
+        return self.index_config['metric']
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorguları index metriğine uygun hale getirip arar."""
+        queries = np.asarray(query_embeddings, dtype='float32')
+        if self.metric == 'ip':
+            queries = normalize_rows(queries)
+        with metrics.span(metrics.STAGE_SEARCH):
+            return self.index.search(queries, k)
+
+    def similarities(self, distances: np.ndarray) -> np.ndarray:
+        """Arama skorlarını 'büyük = daha benzer' ağırlıklara çevirir."""
+        distances = np.asarray(distances, dtype='float32')
+        if self.metric == 'ip':
+            return np.maximum(distances, 0.0)
+        return 1.0 / (1.0 + np.maximum(distances, 0.0))
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, embedding_model, model_name: str,
+              index_config: Optional[Dict] = None) -> "VectorStore":
+        """Metinleri encode edip sıfırdan index oluşturur."""
+        config = resolve_index_config(index_config)
+        data = df[['text', 'intent']].reset_index(drop=True)
+        texts = data['text'].astype(str).tolist()
+        embeddings = embedding_model.encode(texts, show_progress_bar=True).astype('float32')
+        if config['metric'] == 'ip':
+            embeddings = normalize_rows(embeddings)
+
+        index = build_index(embeddings, config)
+
+        return cls(index, embeddings, data, dataset_fingerprint(data, model_name, config), model_name, config)
+
+    # --- ARTIMLI GÜNCELLEME ---
+    # Store'lar değiştirilmez: her güncelleme yeni bir store döndürür. Okuyucular elindeki
+    # store'u kullanmaya devam eder, yenisi tek bir referans atamasıyla devreye alınır.
+
+    def _encode(self, embedding_model, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.embeddings.shape[1]), dtype='float32')
+        embeddings = np.asarray(embedding_model.encode(list(texts), batch_size=64), dtype='float32')
+        return normalize_rows(embeddings) if self.metric == 'ip' else embeddings
+
+    def _derive(self, texts: List[str], intents: List[str], embeddings: np.ndarray, index) -> "VectorStore":
+        return VectorStore(index, embeddings, ExampleStore(texts, intents),
+                           rows_fingerprint(texts, intents, self.model_name, self.index_config),
+                           self.model_name, self.index_config)
+
+    def with_added(self, texts: Sequence[str], intents: Sequence[str], embedding_model) -> "VectorStore":
+        """
+        Örnekleri sona ekleyen yeni store döndürür. Sadece yeni metinler encode edilir;
+        mevcut index kopyalanıp yeni vektörler eklenir (IVF'de mevcut kümeler kullanılır).
+        """
+        texts, intents = [str(t) for t in texts], [str(i) for i in intents]
+        if len(texts) != len(intents):
+            raise ValueError("texts ve intents aynı uzunlukta olmalı")
+        if not texts:
+            return self
+
+        new_embeddings = self._encode(embedding_model, texts)
+        embeddings = np.concatenate([np.asarray(self.embeddings, dtype='float32'), new_embeddings])
+        try:
+            index = import_faiss().clone_index(self.index)
+            index.add(new_embeddings)
+            apply_search_params(index, self.index_config)
+        except RuntimeError:
+            # Kopyalanamayan index tipleri saklanan embedding'lerden yeniden kurulur
+            index = build_index(embeddings, self.index_config)
+
+        return self._derive(self.examples.texts() + texts, self.examples.intents() + intents, embeddings, index)
+
+    def without(self, positions: Iterable[int]) -> "VectorStore":
+        """Verilen satırları çıkaran yeni store döndürür. Index saklanan embedding'lerden kurulur, encode yapılmaz."""
+        drop = {int(p) for p in positions}
+        if not drop:
+            return self
+        keep = [i for i in range(len(self)) if i not in drop]
+        if not keep:
+            raise ValueError("Index'te en az bir örnek kalmalı")
+
+        embeddings = np.ascontiguousarray(np.asarray(self.embeddings, dtype='float32')[keep])
+        texts, intents = self.examples.texts(), self.examples.intents()
+        return self._derive([texts[i] for i in keep], [intents[i] for i in keep],
+                            embeddings, build_index(embeddings, self.index_config))
+
+    def synced(self, df: pd.DataFrame, embedding_model) -> Tuple["VectorStore", Dict]:
+        """
+        Store'u verilen veri setine eşitleyen yeni store ve değişiklik özetini döndürür.
+        Metni zaten index'te olan satırların embedding'i yeniden kullanılır, sadece yeni
+        ya da değişen metinler encode edilir. Satır sırası ve fingerprint sıfırdan kurulumla aynıdır.
+        """
+        data = df[['text', 'intent']].reset_index(drop=True)
+        texts, intents = data['text'].astype(str).tolist(), data['intent'].astype(str).tolist()
+        if not texts:
+            raise ValueError("Eğitim verisi boş")
+        old_texts, old_intents = self.examples.texts(), self.examples.intents()
+
+        old_rows, new_rows = Counter(zip(old_texts, old_intents)), Counter(zip(texts, intents))
+        stats = {'added': sum((new_rows - old_rows).values()), 'removed': sum((old_rows - new_rows).values()),
+                 'encoded': 0, 'rebuilt': False}
+        if rows_fingerprint(texts, intents, self.model_name, self.index_config) == self.fingerprint:
+            return self, stats
+
+        # Sadece sona ekleme yapıldıysa mevcut index korunur
+        n = len(old_texts)
+        if len(texts) >= n and texts[:n] == old_texts and intents[:n] == old_intents:
+            stats['encoded'] = len(texts) - n
+            return self.with_added(texts[n:], intents[n:], embedding_model), stats
+
+        positions = {}
+        for i, text in enumerate(old_texts):
+            positions.setdefault(text, i)
+        missing = [text for text in dict.fromkeys(texts) if text not in positions]
+        for j, text in enumerate(missing):
+            positions[text] = n + j
+
+        source = np.concatenate([np.asarray(self.embeddings, dtype='float32'),
+                                 self._encode(embedding_model, missing)])
+        embeddings = np.ascontiguousarray(source[[positions[text] for text in texts]])
+        stats.update(encoded=len(missing), rebuilt=True)
+        return self._derive(texts, intents, embeddings, build_index(embeddings, self.index_config)), stats
+
+    def save(self, directory: str):
+        """
+        Index, embedding ve satırları diske yazar. Dosyalar önce bu yazıma özel geçici
+        bir klasöre yazılır, sonra klasör kilidi altında yerlerine taşınır (meta.json en son);
+        böylece aynı klasöre eşzamanlı yazan store'ların dosyaları birbirine karışmaz.
+        """
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".save-", dir=directory)
+
+        def _tmp(name):
+            return os.path.join(staging, name)
+
+        try:
+            import_faiss().write_index(self.index, _tmp(INDEX_FILE))
+            with open(_tmp(EMBEDDINGS_FILE), "wb") as f:
+                np.save(f, np.ascontiguousarray(self.embeddings, dtype='float32'))
+            with open(_tmp(ROWS_FILE), "w", encoding="utf-8") as f:
+                json.dump({
+                    'text': self.examples.texts(),
+                    'intent': self.examples.intents()
+                }, f, ensure_ascii=False)
+
+            meta = {
+                'fingerprint': self.fingerprint,
+                'model_name': self.model_name,
+                'count': int(len(self.examples)),
+                'dimension': int(self.embeddings.shape[1]),
+                'index_config': self.index_config
+            }
+            with open(_tmp(META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+
+            with _directory_lock(directory):
+                # Önce eski meta'yı düşür ki yarım kalan bir yazım geçerli sayılmasın
+                meta_path = os.path.join(directory, META_FILE)
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                for name in (INDEX_FILE, EMBEDDINGS_FILE, ROWS_FILE, META_FILE):
+                    os.replace(_tmp(name), os.path.join(directory, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def read_meta(directory: str) -> Optional[dict]:
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, directory: str, fingerprint: Optional[str] = None) -> Optional["VectorStore"]:
+        """
+        Diskteki index'i yükler. Fingerprint verilmişse ve eşleşmiyorsa None döner.
+        Index ve embedding matrisi memory-mapped açılır.
+        """
+        meta = cls.read_meta(directory)
+        if meta is None:
+            return None
+        if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+            return None
+
+        faiss = import_faiss()
+        index_path = os.path.join(directory, INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            # Bazı index tipleri mmap desteklemez
+            index = faiss.read_index(index_path)
+
+        embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, ROWS_FILE), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        data = ExampleStore(rows['text'], rows['intent'])
+
+        if index.ntotal != len(data) or embeddings.shape[0] != len(data):
+            return None
+
+        config = resolve_index_config(meta.get('index_config'))
+        apply_search_params(index, config)
+        return cls(index, embeddings, data, meta['fingerprint'], meta['model_name'], config)
+
+    @classmethod
+    def load_or_build(cls, df: pd.DataFrame, embedding_model, model_name: str,
+                      directory: Optional[str] = DEFAULT_INDEX_DIR,
+                      index_config: Optional[Dict] = None) -> "VectorStore":
+        """Hash eşleşirse diskten yükler, aksi halde yeniden oluşturup kaydeder."""
+        data = df[['text', 'intent']].reset_index(drop=True)
+
+        if directory:
+            fingerprint = dataset_fingerprint(data, model_name, index_config)
+            store = cls.load(directory, fingerprint)
+            if store is not None:
+                print(f"✓ Index diskten yüklendi: {directory} ({len(store)} örnek)")
+                return store
+
+        store = cls.build(data, embedding_model, model_name, index_config)
+
+        if directory:
+            try:
+                store.save(directory)
+                print(f"✓ Index diske kaydedildi: {directory}")
+            except OSError as e:
+                print(f"Index kaydedilemedi: {e}")
+
+        return store
@@ -0,0 +1,342 @@
+# stub_llm_server.py
+"""
+Groq ve Mistral chat-completion API'lerini taklit eden yerel sunucu.
+Gerçek API kotası harcamadan ve ağ olmadan yük testi yapmak için kullanılır.
+
+- Groq yolu:    POST /openai/v1/chat/completions
+- Mistral yolu: POST /v1/chat/completions
+- stream=True isteklerinde SSE ile parça parça yanıt verir
+- Gecikme dağılımı, hata (500) ve 429 enjeksiyonu ayarlanabilir
+- Niyet istekleri eğitim/test setindeki etiketlerden deterministik olarak yanıtlanır
+
+Kullanım:
+    python stub_llm_server.py --port 8765 --latency-ms 300 --latency-dist lognormal --rate-limit-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765 MISTRAL_SERVER_URL=http://127.0.0.1:8765 python benchmark.py --suite latency
+"""
+import re
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from models.cache import normalize_text
+from models.datasets import TRAIN_DATASET, TEST_DATASET, load_dataset
+
+INTENTS = ["greeting", "order_dessert", "ask_recommendation", "check_ingredients", "goodbye"]
+
+CANNED_REPLIES = {
+    "greeting": "Merhaba, Tatlı Rüyalar'a hoş geldiniz! Size nasıl yardımcı olabilirim?",
+    "order_dessert": "Siparişinizi aldım, hemen hazırlıyoruz. Başka bir isteğiniz var mı?",
+    "ask_recommendation": "Bugün Fıstıklı Baklava ve San Sebastian Cheesecake çok taze, kesinlikle öneririm!",
+    "check_ingredients": "Tatlılarımızın içerik listesini paylaşabilirim; alerjiniz varsa lütfen belirtin.",
+    "goodbye": "Bizi tercih ettiğiniz için teşekkürler, yine bekleriz!",
+}
+
+# Niyet istemlerinden kullanıcı mesajını ayıklar ("Mesaj: ...\nNiyet:", eski Mistral biçimi: 'Mesaj: "..."\nIntent:')
+_MESSAGE_PATTERN = re.compile(r'Mesaj:\s*"?(.*?)"?\s*\n\s*(?:Niyet|Intent):', re.DOTALL)
+# Tek çağrı isteklerinde RAG örneklerinden sonra gelen mesaj ("...\n\nMesaj: ...")
+_TAIL_MESSAGE = re.compile(r'\n\nMesaj: (.*)\Z', re.DOTALL)
+# Toplu niyet isteklerindeki "[3] mesaj" satırları
+_BATCH_LINE = re.compile(r'^\[(\d+)\]\s?(.*)$', re.MULTILINE)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 200.0         # Yanıt öncesi gecikme (ortalama/ölçek)
+    latency_dist: str = "lognormal"   # fixed | uniform | normal | lognormal
+    latency_sigma: float = 0.5        # normal: std (ms) oranı, lognormal: sigma
+    token_ms: float = 15.0            # Akışta parça başına gecikme
+    error_rate: float = 0.0           # 500 dönen isteklerin oranı
+    rate_limit_rate: float = 0.0      # 429 dönen isteklerin oranı
+    retry_after: float = 1.0          # 429 yanıtlarındaki Retry-After (sn)
+    intent_error_rate: float = 0.0    # Bilinçli olarak yanlış etiket verilen niyet isteklerinin oranı
+    seed: int = 42
+
+
+class IntentOracle:
+    """Veri setlerindeki (normalize edilmiş) metinlerden intent'i bulur."""
+
+    def __init__(self, paths: Tuple[str, ...] = (TRAIN_DATASET, TEST_DATASET)):
+        self.labels: Dict[str, str] = {}
+        for path in paths:
+            try:
+                df = load_dataset(path, columns=['text', 'intent'])
+            except (OSError, ValueError) as e:
+                print(f"Veri seti okunamadı ({path}): {e}")
+                continue
+            for text, intent in zip(df['text'], df['intent']):
+                self.labels[normalize_text(text)] = str(intent)
+
+    def intent_for(self, text: str) -> str:
+        label = self.labels.get(normalize_text(text))
+        if label is not None:
+            return label
+        # Bilinmeyen metinler için metinden türetilen sabit bir etiket
+        return INTENTS[zlib.crc32(normalize_text(text).encode("utf-8")) % len(INTENTS)]
+
+
+class StubBehaviour:
+    """Gecikme/hata kararları ve yanıt içeriği. Thread-safe, seed ile tekrarlanabilir."""
+
+    def __init__(self, config: StubConfig, oracle: IntentOracle):
+        self.config = config
+        self.oracle = oracle
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'streams': 0}
+        self._seen_prefixes = OrderedDict()   # daha önce görülen system mesajlarının hash'leri
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def latency(self) -> float:
+        """Bir sonraki yanıtın gecikmesi (sn)."""
+        c = self.config
+        with self._lock:
+            if c.latency_dist == "fixed":
+                ms = c.latency_ms
+            elif c.latency_dist == "uniform":
+                ms = self._rng.uniform(0, 2 * c.latency_ms)
+            elif c.latency_dist == "normal":
+                ms = self._rng.gauss(c.latency_ms, c.latency_sigma * c.latency_ms)
+            else:
+                # Medyanı latency_ms olan log-normal: uzun kuyruklu gerçek API gecikmesine yakın
+                ms = self._rng.lognormvariate(math.log(max(c.latency_ms, 1e-3)), c.latency_sigma)
+        return max(ms, 0.0) / 1000
+
+    def fault(self) -> Optional[int]:
+        """Enjekte edilecek HTTP hata kodu (yoksa None)."""
+        roll = self._random()
+        if roll < self.config.rate_limit_rate:
+            return 429
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            return 500
+        return None
+
+    def _intent(self, message: str) -> str:
+        intent = self.oracle.intent_for(message)
+        if self._random() < self.config.intent_error_rate:
+            intent = INTENTS[(INTENTS.index(intent) + 1) % len(INTENTS)] if intent in INTENTS else INTENTS[0]
+        return intent
+
+    def cached_tokens(self, request: Dict) -> int:
+        """
+        Sağlayıcı prompt önbelleğini taklit eder: system mesajı daha önce aynen
+        görüldüyse token'ları önbellekten gelmiş sayılır.
+        """
+        messages = request.get("messages") or []
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = str(messages[0].get("content", ""))
+        key = zlib.crc32(prefix.encode("utf-8"))
+        with self._lock:
+            seen = key in self._seen_prefixes
+            self._seen_prefixes[key] = True
+            self._seen_prefixes.move_to_end(key)
+            while len(self._seen_prefixes) > 1024:
+                self._seen_prefixes.popitem(last=False)
+        return len(prefix) // 4 if seen else 0
+
+    def answer(self, request: Dict) -> str:
+        """İsteğin türüne (niyet / tek çağrı / yanıt) göre içerik üretir."""
+        messages = request.get("messages") or []
+        user_turns = [str(m.get("content", "")) for m in messages if m.get("role") == "user"]
+        last_user = user_turns[-1] if user_turns else ""
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_object" and '"labels"' in prompt:
+            labels = [{"id": int(i), "intent": self._intent(text)} for i, text in _BATCH_LINE.findall(last_user)]
+            return json.dumps({"labels": labels}, ensure_ascii=False)
+        if response_format.get("type") == "json_object":
+            tail = _TAIL_MESSAGE.search(last_user)
+            intent = self._intent(tail.group(1) if tail else last_user)
+            return json.dumps({"intent": intent, "reply": CANNED_REPLIES[intent]}, ensure_ascii=False)
+
+        match = _MESSAGE_PATTERN.search(last_user)
+        if match or "sınıflandırma" in prompt:
+            return self._intent(match.group(1) if match else last_user)
+
+        intent = next((i for i in INTENTS if i.upper() in prompt), None) or self._intent(last_user)
+        return CANNED_REPLIES[intent]
+
+
+def _usage(request: Dict, content: str, cached_tokens: int = 0) -> Dict:
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in request.get("messages") or [])
+    prompt_tokens, completion_tokens = prompt_chars // 4 + 1, len(content) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_tokens)}}
+
+
+def _chunks(content: str) -> List[str]:
+    """Akış parçaları: kelimeleri boşluklarıyla birlikte böler."""
+    return re.findall(r"\S+\s*|\s+", content) or [content]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: istemcilerin bağlantı havuzu kullanılabilsin
+    behaviour: StubBehaviour = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/health"):
+            self._send_json(200, {"status": "ok", **self.behaviour.stats})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if self.path not in ("/openai/v1/chat/completions", "/v1/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        behaviour = self.behaviour
+        behaviour.count('requests')
+        time.sleep(behaviour.latency())
+
+        fault = behaviour.fault()
+        if fault == 429:
+            behaviour.count('rate_limited')
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                            {"retry-after": f"{behaviour.config.retry_after:g}"})
+            return
+        if fault == 500:
+            behaviour.count('errors')
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        content = behaviour.answer(request)
+        cached_tokens = behaviour.cached_tokens(request)
+        model = request.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": _usage(request, content, cached_tokens),
+            })
+            return
+
+        behaviour.count('streams')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def _event(delta: Dict, finish_reason: Optional[str] = None, usage: Optional[Dict] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            if usage is not None:
+                chunk["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        try:
+            _event({"role": "assistant", "content": ""})
+            for piece in _chunks(content):
+                time.sleep(behaviour.config.token_ms / 1000)
+                _event({"content": piece})
+            _event({}, "stop", _usage(request, content, cached_tokens))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # İstemci akışı yarıda bıraktı
+            self.close_connection = True
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, config: Optional[StubConfig] = None,
+                  oracle: Optional[IntentOracle] = None, quiet: bool = True) -> ThreadingHTTPServer:
+    """Sunucuyu oluşturur (serve_forever çağrılmaz). port=0 ile boş bir port seçilir."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        'behaviour': StubBehaviour(config or StubConfig(), oracle or IntentOracle()),
+        'quiet': quiet,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs) -> Tuple[ThreadingHTTPServer, str]:
+    """Sunucuyu arka plan thread'inde başlatır, (sunucu, base_url) döndürür. Kapatmak için server.shutdown()."""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Groq/Mistral uyumlu yerel test sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=StubConfig.latency_ms)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"],
+                        default=StubConfig.latency_dist)
+    parser.add_argument("--latency-sigma", type=float, default=StubConfig.latency_sigma)
+    parser.add_argument("--token-ms", type=float, default=StubConfig.token_ms)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=StubConfig.rate_limit_rate)
+    parser.add_argument("--retry-after", type=float, default=StubConfig.retry_after)
+    parser.add_argument("--intent-error-rate", type=float, default=StubConfig.intent_error_rate)
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    parser.add_argument("--verbose", action="store_true", help="Her isteği logla")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms, latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        token_ms=args.token_ms, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, intent_error_rate=args.intent_error_rate, seed=args.seed
+    )
+    server = create_server(args.host, args.port, config, quiet=not args.verbose)
+    print(f"✓ Yerel LLM sunucusu dinliyor: http://{args.host}:{args.port}")
+    print(f"  Groq:    GROQ_BASE_URL=http://{args.host}:{args.port}")
+    print(f"  Mistral: MISTRAL_SERVER_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,107 @@
+from models.history import HistoryManager, format_summary, message_tokens
+
+
+def _conversation(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"kullanıcı mesajı {i} " + "baklava " * 5})
+        history.append({"role": "assistant", "content": f"asistan yanıtı {i} " + "sütlaç " * 5})
+    return history
+
+
+class RecordingSummarizer:
+    """Her çağrıda özete eklenen mesajları kaydeder."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append((previous, [m["content"] for m in messages]))
+        lines = [previous] if previous else []
+        return "\n".join(lines + [m["content"][:12] for m in messages])
+
+
+def test_recent_fits_budget_and_keeps_newest_messages():
+    manager = HistoryManager(token_budget=60, summary_budget=10_000)
+    history = _conversation(6)
+    recent, summary = manager.fit(history)
+
+    assert sum(message_tokens(m) for m in recent) <= 60
+    assert recent == history[-len(recent):]
+    # Bir sonraki eski mesaj da bütçeyi aşardı
+    assert sum(message_tokens(m) for m in history[-len(recent) - 1:]) > 60
+    assert summary
+
+
+def test_short_history_is_sent_as_is():
+    manager = HistoryManager(token_budget=10_000)
+    history = _conversation(2)
+    assert manager.fit(history) == (history, "")
+    assert manager.fit(None) == ([], "")
+
+
+def test_non_chat_roles_are_ignored():
+    manager = HistoryManager(token_budget=10_000)
+    history = [{"role": "system", "content": "gizli"}] + _conversation(1)
+    recent, _ = manager.fit(history)
+    assert all(m["role"] in ("user", "assistant") for m in recent)
+    assert len(recent) == 2
+
+
+def test_summary_is_extended_incrementally_over_turns():
+    summarizer = RecordingSummarizer()
+    manager = HistoryManager(token_budget=60, summary_budget=10_000, summarizer=summarizer)
+    full = _conversation(8)
+
+    summarized = 0
+    for turns in range(1, 9):
+        history = full[:2 * turns]
+        recent, summary = manager.fit(history)
+        cut = len(history) - len(recent)
+        if cut:
+            # Her özet çağrısı sadece önceki turdan beri düşen mesajları alır
+            assert summarizer.calls[-1][1] == [m["content"] for m in history[summarized:cut]]
+            summarized = cut
+
+    updates = manager.stats()['summary_updates']
+    assert updates == len(summarizer.calls)
+    assert updates < 8
+    # Özetlenen her mesaj özetleyiciye tam bir kez verildi
+    assert sum(len(messages) for _, messages in summarizer.calls) == summarized
+
+
+def test_same_history_reuses_cached_summary():
+    summarizer = RecordingSummarizer()
+    manager = HistoryManager(token_budget=60, summary_budget=10_000, summarizer=summarizer)
+    history = _conversation(6)
+
+    first = manager.fit(history)
+    calls = len(summarizer.calls)
+    assert manager.fit(history) == first
+    assert len(summarizer.calls) == calls
+    assert manager.stats()['summary_updates'] == calls
+
+
+def test_summary_respects_summary_budget():
+    manager = HistoryManager(token_budget=20, summary_budget=15)
+    _, summary = manager.fit(_conversation(10))
+    assert summary
+    assert manager.token_counter(summary) <= 15 or len(summary.splitlines()) == 1
+
+
+def test_stats_count_one_turn_per_fit():
+    manager = HistoryManager(token_budget=60, baseline_window=4)
+    full = _conversation(5)
+    sent = 0
+    for turns in range(1, 6):
+        recent, summary = manager.fit(full[:2 * turns])
+        sent += sum(message_tokens(m) for m in recent)
+        sent += manager.token_counter(format_summary(summary)) if summary else 0
+
+    stats = manager.stats()
+    assert stats['turns'] == 5
+    full_tokens = sum(sum(message_tokens(m) for m in full[:2 * t]) for t in range(1, 6))
+    assert stats['full_tokens_per_turn'] == full_tokens / 5
+    baseline = sum(sum(message_tokens(m) for m in full[:2 * t][-4:]) for t in range(1, 6))
+    assert stats['baseline_tokens_per_turn'] == baseline / 5
+    assert stats['sent_tokens_per_turn'] == sent / 5
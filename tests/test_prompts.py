@@ -0,0 +1,79 @@
+from models.prompts import format_batch_messages, parse_batch_intents, parse_intent_reply
+
+INTENTS = ["greeting", "order_dessert", "ask_recommendation", "check_ingredients", "goodbye"]
+
+
+# --- parse_batch_intents ---
+
+def test_batch_labels_in_message_order():
+    raw = '{"labels": [{"id": 2, "intent": "goodbye"}, {"id": 1, "intent": "greeting"}]}'
+    assert parse_batch_intents(raw, 2, INTENTS) == ["greeting", "goodbye"]
+
+
+def test_batch_missing_ids_stay_none():
+    raw = '{"labels": [{"id": 1, "intent": "greeting"}, {"id": 3, "intent": "goodbye"}]}'
+    assert parse_batch_intents(raw, 3, INTENTS) == ["greeting", None, "goodbye"]
+
+
+def test_batch_conflicting_labels_are_dropped():
+    raw = ('{"labels": [{"id": 1, "intent": "greeting"}, {"id": 1, "intent": "goodbye"},'
+           ' {"id": 1, "intent": "greeting"}, {"id": 2, "intent": "goodbye"}]}')
+    assert parse_batch_intents(raw, 2, INTENTS) == [None, "goodbye"]
+
+
+def test_batch_repeated_same_label_is_kept():
+    raw = '{"labels": [{"id": 1, "intent": "greeting"}, {"id": 1, "intent": "Greeting "}]}'
+    assert parse_batch_intents(raw, 1, INTENTS) == ["greeting"]
+
+
+def test_batch_dict_form():
+    raw = '{"1": "order_dessert", "2": "check_ingredients"}'
+    assert parse_batch_intents(raw, 2, INTENTS) == ["order_dessert", "check_ingredients"]
+
+
+def test_batch_fenced_json():
+    raw = 'İşte sonuç:\n```json\n{"labels": [{"id": "1", "intent": "ORDER_DESSERT"}]}\n```'
+    assert parse_batch_intents(raw, 1, INTENTS) == ["order_dessert"]
+
+
+def test_batch_ignores_unknown_intents_and_bad_ids():
+    raw = ('{"labels": [{"id": 0, "intent": "greeting"}, {"id": 5, "intent": "greeting"},'
+           ' {"id": "x", "intent": "greeting"}, {"id": 1, "intent": "complaint"},'
+           ' {"id": 2}, "çöp", {"id": 3, "intent": "goodbye"}]}')
+    assert parse_batch_intents(raw, 3, INTENTS) == [None, None, "goodbye"]
+
+
+def test_batch_invalid_output():
+    assert parse_batch_intents(None, 2, INTENTS) == [None, None]
+    assert parse_batch_intents("greeting, goodbye", 2, INTENTS) == [None, None]
+    assert parse_batch_intents('{"labels": [{"id": 1,', 2, INTENTS) == [None, None]
+    assert parse_batch_intents('{"labels": "greeting"}', 1, INTENTS) == [None]
+
+
+def test_format_batch_messages_numbers_single_lines():
+    assert format_batch_messages(["Merhaba", "iki\nsatır  mesaj"]) == "Mesajlar:\n[1] Merhaba\n[2] iki satır mesaj"
+
+
+# --- parse_intent_reply ---
+
+def test_reply_plain_json():
+    raw = '{"intent": "greeting", "reply": "Hoş geldiniz!"}'
+    assert parse_intent_reply(raw, INTENTS) == ("Hoş geldiniz!", "greeting")
+
+
+def test_reply_fenced_json_and_normalized_intent():
+    raw = '```json\n{"intent": " Order_Dessert ", "reply": "  Siparişiniz alındı.  "}\n```'
+    assert parse_intent_reply(raw, INTENTS) == ("Siparişiniz alındı.", "order_dessert")
+
+
+def test_reply_rejects_unknown_intent_or_empty_reply():
+    assert parse_intent_reply('{"intent": "complaint", "reply": "Üzgünüz"}', INTENTS) is None
+    assert parse_intent_reply('{"intent": "greeting", "reply": "   "}', INTENTS) is None
+    assert parse_intent_reply('{"intent": "greeting"}', INTENTS) is None
+
+
+def test_reply_invalid_output():
+    assert parse_intent_reply(None, INTENTS) is None
+    assert parse_intent_reply("", INTENTS) is None
+    assert parse_intent_reply("Merhaba, nasıl yardımcı olabilirim?", INTENTS) is None
+    assert parse_intent_reply('{"intent": "greeting", "reply": ', INTENTS) is None
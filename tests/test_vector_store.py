@@ -0,0 +1,155 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("faiss")
+
+from models.embeddings import EmbeddingBackend
+from models.vector_store import VectorStore
+
+DIMENSION = 16
+
+
+class FakeEmbeddingBackend(EmbeddingBackend):
+    """Metnin crc32'sinden türetilen deterministik vektörler; encode edilen metinleri kaydeder."""
+
+    name = "fake"
+
+    def __init__(self):
+        super().__init__("fake-model")
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.encoded.extend(texts)
+        return np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIMENSION)
+            for text in texts
+        ]).astype("float32")
+
+
+def _frame(n, start=0):
+    intents = ["greeting", "order_dessert", "goodbye"]
+    return pd.DataFrame({
+        "text": [f"örnek mesaj {i}" for i in range(start, start + n)],
+        "intent": [intents[i % 3] for i in range(start, start + n)],
+    })
+
+
+def _build(df, metric="l2"):
+    return VectorStore.build(df, FakeEmbeddingBackend(), "fake-model", {"type": "flat", "metric": metric})
+
+
+def _snapshot(store):
+    return (len(store), store.fingerprint, store.index.ntotal, store.examples.texts(),
+            np.array(store.embeddings, copy=True))
+
+
+def _assert_unchanged(store, snapshot):
+    length, fingerprint, ntotal, texts, embeddings = snapshot
+    assert (len(store), store.fingerprint, store.index.ntotal, store.examples.texts()) == \
+           (length, fingerprint, ntotal, texts)
+    np.testing.assert_array_equal(store.embeddings, embeddings)
+
+
+def _assert_matches_fresh(store, df, metric="l2"):
+    fresh = _build(df, metric)
+    assert store.fingerprint == fresh.fingerprint
+    assert store.examples.texts() == fresh.examples.texts()
+    assert store.examples.intents() == fresh.examples.intents()
+    queries = FakeEmbeddingBackend().encode([f"örnek mesaj {i}" for i in range(0, 40, 3)] + ["yeni bir soru"])
+    distances, indices = store.search(queries, 5)
+    fresh_distances, fresh_indices = fresh.search(queries, 5)
+    np.testing.assert_array_equal(indices, fresh_indices)
+    np.testing.assert_allclose(distances, fresh_distances, rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("metric", ["l2", "ip"])
+def test_with_added_encodes_only_new_texts(metric):
+    store = _build(_frame(30), metric)
+    before = _snapshot(store)
+    backend = FakeEmbeddingBackend()
+    new = _frame(5, start=30)
+
+    updated = store.with_added(new["text"], new["intent"], backend)
+
+    assert backend.encoded == new["text"].tolist()
+    assert updated is not store
+    _assert_unchanged(store, before)
+    _assert_matches_fresh(updated, pd.concat([_frame(30), new], ignore_index=True), metric)
+
+
+def test_with_added_nothing_returns_same_store():
+    store = _build(_frame(10))
+    assert store.with_added([], [], FakeEmbeddingBackend()) is store
+
+
+@pytest.mark.parametrize("metric", ["l2", "ip"])
+def test_without_removes_rows_without_encoding(metric):
+    df = _frame(30)
+    store = _build(df, metric)
+    before = _snapshot(store)
+    backend = FakeEmbeddingBackend()
+
+    updated = store.without([0, 7, 29])
+
+    assert backend.encoded == []
+    assert len(updated) == 27
+    _assert_unchanged(store, before)
+    _assert_matches_fresh(updated, df.drop(index=[0, 7, 29]).reset_index(drop=True), metric)
+
+
+def test_without_all_rows_is_rejected():
+    store = _build(_frame(3))
+    with pytest.raises(ValueError):
+        store.without(range(3))
+
+
+def test_synced_unchanged_dataset_is_noop():
+    df = _frame(20)
+    store = _build(df)
+    backend = FakeEmbeddingBackend()
+
+    updated, stats = store.synced(df, backend)
+
+    assert updated is store
+    assert backend.encoded == []
+    assert stats == {'added': 0, 'removed': 0, 'encoded': 0, 'rebuilt': False}
+
+
+def test_synced_append_only_reuses_index():
+    df = _frame(20)
+    store = _build(df)
+    before = _snapshot(store)
+    backend = FakeEmbeddingBackend()
+    grown = pd.concat([df, _frame(4, start=20)], ignore_index=True)
+
+    updated, stats = store.synced(grown, backend)
+
+    assert stats['encoded'] == 4 and stats['added'] == 4 and not stats['rebuilt']
+    assert backend.encoded == grown["text"].tolist()[20:]
+    _assert_unchanged(store, before)
+    _assert_matches_fresh(updated, grown)
+
+
+@pytest.mark.parametrize("metric", ["l2", "ip"])
+def test_synced_mixed_changes_encode_only_unseen_texts(metric):
+    df = _frame(30, start=0)
+    store = _build(df, metric)
+    before = _snapshot(store)
+    backend = FakeEmbeddingBackend()
+
+    # Satır sil, sırayı değiştir, bir etiketi düzelt, yeni metinler ekle
+    edited = df.drop(index=[3, 4, 5]).iloc[::-1].reset_index(drop=True)
+    edited.loc[0, "intent"] = "goodbye" if edited.loc[0, "intent"] != "goodbye" else "greeting"
+    new = _frame(3, start=100)
+    edited = pd.concat([edited, new], ignore_index=True)
+
+    updated, stats = store.synced(edited, backend)
+
+    assert stats['encoded'] == 3 and stats['rebuilt']
+    assert sorted(backend.encoded) == sorted(new["text"].tolist())
+    assert stats['removed'] == 4 and stats['added'] == 4
+    _assert_unchanged(store, before)
+    _assert_matches_fresh(updated, edited, metric)